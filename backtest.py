@@ -0,0 +1,124 @@
+import argparse
+import asyncio
+import contextlib
+import csv
+import json
+import os
+import time
+import engine
+import headless
+from replay import replay
+from result_cache import ResultCache, result_key, sessions_fingerprint
+
+LEDGER_FIELDS = ("mint", "enter_condition", "exit_condition", "enter_time", "exit_time", "enter_mcap", "exit_mcap",
+                 "sol_spent", "sol_received", "pnl", "sol_balance")
+
+
+class _QuietLoggers:
+    """Drops the per-trade log lines, the backtest reports through the ledger instead."""
+
+    @staticmethod
+    def log_general_message(msg):
+        pass
+
+    @staticmethod
+    def log_transaction_message(msg):
+        pass
+
+
+def backtest(strategy, sessions, seed: int = 7, loggers=None):
+    """
+    Run a strategy over recorded session files as fast as possible and return its results.
+
+    The frames go through the live `subscribe`/`processor` path, including the simulated trade finalization, on a
+    virtual clock, so the result is what paper trading would have done during the recorded sessions.
+    """
+    enter_conditions, exit_conditions = headless.validate_strategy(strategy)
+    cfg = headless.build_config(strategy)
+    # the engine prints its websocket bookkeeping, only worth seeing along with the verbose logs
+    with contextlib.ExitStack() as quiet:
+        if loggers is None:
+            quiet.enter_context(contextlib.redirect_stdout(quiet.enter_context(open(os.devnull, "w"))))
+        start = time.perf_counter()
+        socket = asyncio.run(replay(sessions, enter_conditions, exit_conditions, cfg, loggers or _QuietLoggers, 0,
+                                    seed))
+        elapsed = time.perf_counter() - start
+
+    sol_balance = cfg.sol_balance_widget.value()
+    statistics = engine.strategy_statistics()
+    statistics.update({
+        "pnl": ((sol_balance - strategy["sol_balance"]) / strategy["sol_balance"]) * 100,
+        "sol_balance": sol_balance,
+        "session_duration": socket.clock.time() - socket.start_time,
+        "events": socket.delivered + socket.skipped,
+        "events_per_minute": (socket.delivered + socket.skipped) / elapsed * 60,
+    })
+    return {"strategy_transcript": dict(engine.strategy_transcript),
+            "statistics": statistics,
+            "ledger": list(engine.trade_ledger)}
+
+
+def write_results(results, directory):
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "transcript.json"), "w", encoding="utf-8") as f:
+        json.dump(results["strategy_transcript"], f, indent=4)
+    with open(os.path.join(directory, "statistics.json"), "w", encoding="utf-8") as f:
+        json.dump(results["statistics"], f, indent=4)
+    with open(os.path.join(directory, "ledger.csv"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=LEDGER_FIELDS)
+        writer.writeheader()
+        writer.writerows(results["ledger"])
+
+
+def print_results(results):
+    stats = results["statistics"]
+    print(f"PnL: {stats['pnl']:+.2f}% (final balance {stats['sol_balance']:.4f} SOL)")
+    print(f"Session duration: {round(stats['session_duration'], 2)}s")
+    print(f"No. of tokens created since bot initiation: {stats['tokens_created']}")
+    print(f"No. of tokens evaluated: {stats['tokens_evaluated']}")
+    print(f"No. of trades taken: {stats['trades']}")
+    print(f"No. of profitable trades: {stats['profitable_trades']}")
+    print(f"Average PnL per trade: {round(stats['avg_pnl'], 2)}%")
+    print(f"Average time in trade: {round(stats['avg_time_in_trade'], 2)}s")
+    print(f"Replayed {stats['events']:,} events ({stats['events_per_minute']:,.0f} events/minute)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest a Gem-Finder strategy on recorded sessions")
+    parser.add_argument("--strategy", help="Strategy JSON exported from the GUI", required=True, type=str)
+    parser.add_argument("--sessions", help="Session files recorded with --record", required=True, nargs="+", type=str)
+    parser.add_argument("--seed", help="Seed of the simulated trade finalization times", default=7, type=int)
+    parser.add_argument("--output", help="Write transcript.json, statistics.json and ledger.csv into this directory",
+                        default=None, type=str)
+    parser.add_argument("--verbose", help="Log every trade and exit evaluation like the headless mode",
+                        action="store_true")
+    parser.add_argument("--results_cache", help="Reuse the results of identical backtests stored in this directory",
+                        default=None, type=str)
+    args = parser.parse_args()
+
+    strategy = headless.load_strategy(args.strategy)
+    loggers = None
+    if args.verbose:
+        headless.setup_logging()
+        loggers = headless.loggers
+    results = None
+    if args.results_cache:
+        results_cache = ResultCache(args.results_cache)
+        fingerprint = sessions_fingerprint(args.sessions)
+        key = result_key(strategy, fingerprint, args.seed)
+        if not args.verbose:  # the logs are only written by an actual run
+            results = results_cache.get(fingerprint, key)
+            if results is not None:
+                print("Results found in the cache")
+    if results is None:
+        try:
+            results = backtest(strategy, args.sessions, args.seed, loggers)
+        except ValueError as e:
+            print(f"Warning: Invalid strategy! {e}")
+            raise SystemExit(1)
+        if args.results_cache:
+            results_cache.put(fingerprint, key, results)
+    print_results(results)
+    if args.output:
+        write_results(results, args.output)
+        print(f"Results written to {args.output}")
@@ -1,7 +1,76 @@
 import asyncio
+import heapq
+import itertools
 import time
+from array import array
 from collections import deque
 
+MCAP_LOG_CAPACITY = 1024  # max. mcap samples in the rolling slope window of a token, the oldest go first beyond it
+RING_BUFFER_MIN_ALLOCATION = 16  # samples allocated by the first append, doubled as a buffer fills up to its capacity
+TRADE_WINDOW = 10.0  # seconds covered by the rolling buys/sells/volume indicators
+SLOPE_WINDOW = 30.0  # seconds covered by the rolling mcap slope
+
+
+class SystemClock:
+    """Wall clock, used when trading live."""
+
+    def time(self) -> float:
+        return time.time()
+
+    async def sleep(self, seconds: float):
+        await asyncio.sleep(seconds)
+
+
+class VirtualClock:
+    """
+    Clock that only moves when `advance` is called, used to replay recorded sessions faster than real time.
+
+    Sleepers are woken in deadline order, each with the clock set to its own deadline, so timers interleave with the
+    replayed frames exactly as they would have live. After `run_free` every new sleep returns at once after moving the
+    clock forward, which lets the engine shut down once the replay is over.
+    """
+
+    def __init__(self, start: float = 0.0):
+        self.now = start
+        self.sleepers = []
+        self.sequence = itertools.count()  # keeps sleepers with the same deadline in FIFO order
+        self.running_free = False
+
+    def time(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float):
+        deadline = self.now + max(0.0, seconds)
+        if self.running_free:
+            self.now = deadline
+            await asyncio.sleep(0)
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.sleepers, (deadline, next(self.sequence), future))
+        await future
+
+    async def advance(self, to: float):
+        """Move the clock to `to`, letting every sleeper due by then run first."""
+        while self.sleepers and self.sleepers[0][0] <= to:
+            deadline, _, future = heapq.heappop(self.sleepers)
+            self.now = max(self.now, deadline)
+            if not future.done():  # the sleeping task may have been cancelled
+                future.set_result(None)
+                await asyncio.sleep(0)
+        self.now = max(self.now, to)
+
+    def run_free(self):
+        """Stop driving the clock, the sleepers still pending stay asleep as the replay has no data past them."""
+        self.running_free = True
+
+
+clock = SystemClock()  # the clock the whole engine reads, swapped by `set_clock` for replays
+
+
+def set_clock(new_clock):
+    global clock
+    clock = new_clock
+
 
 async def keepalive_ping(websocket):
     """Send pings periodically to keep the WebSocket connection alive."""
@@ -9,10 +78,29 @@ async def keepalive_ping(websocket):
         while True:
             await websocket.ping()
             # print("Sent keepalive ping.")
-            await asyncio.sleep(30)  # Send a ping every 30 seconds
+            await clock.sleep(30)  # Send a ping every 30 seconds
     except asyncio.CancelledError:
         print("Ping task cancelled.")
 
+
+class SolBalance:
+    """
+    Plain SOL balance holder with the `value()`/`setValue()` interface of the GUI's balance spin box, so the engine
+    can run without Qt.
+    """
+
+    __slots__ = ("balance",)
+
+    def __init__(self, balance: float = 0):
+        self.balance = balance
+
+    def value(self):
+        return self.balance
+
+    def setValue(self, balance: float):
+        self.balance = balance
+
+
 class PumpTrade:
 
     __slots__ = ("pool", "sol_price", "mint", "trader", "type", "token_amount", "sol_amount", "usd_amount",
@@ -32,32 +120,293 @@ class PumpTrade:
         self.token_price = self.market_cap_usd / 1000000000
 
 
-class RequestRateCounter:
-    def __init__(self, window_size=1.0):
-        self.timestamps = deque()
-        self.window_size = window_size  # in seconds
+class RateMeter:
+    """
+    Events per second over a sliding window, counted in a fixed number of time buckets.
+
+    Memory is constant whatever the traffic, and stale buckets are cleared both when recording and when reading,
+    so a token that went silent decays to 0 instead of reporting its last burst forever.
+    """
+
+    __slots__ = ("window", "buckets_per_second", "buckets", "counts", "last_bucket")
+
+    def __init__(self, window: float = 1.0, buckets: int = 10):
+        self.window = window
+        self.buckets_per_second = buckets / window
+        self.buckets = buckets
+        self.counts = [0] * buckets
+        self.last_bucket = None
+
+    def _roll(self, bucket: int):
+        """Move the current bucket forward to `bucket`, clearing the ones that fell out of the window."""
+        if self.last_bucket is None or bucket - self.last_bucket >= self.buckets:
+            self.counts = [0] * self.buckets
+            self.last_bucket = bucket
+        elif bucket > self.last_bucket:
+            counts = self.counts
+            for b in range(self.last_bucket + 1, bucket + 1):
+                counts[b % self.buckets] = 0
+            self.last_bucket = bucket
+
+    def record(self, now: float | None = None):
+        if now is None:
+            now = clock.time()
+        bucket = int(now * self.buckets_per_second)
+        if bucket != self.last_bucket:
+            self._roll(bucket)
+        self.counts[self.last_bucket % self.buckets] += 1
+
+    def rate(self, now: float | None = None) -> float:
+        if now is None:
+            now = clock.time()
+        bucket = int(now * self.buckets_per_second)
+        if bucket != self.last_bucket:
+            self._roll(bucket)
+        return sum(self.counts) / self.window
+
+
+class RingBuffer:
+    """
+    Fixed-capacity circular buffer of floats backed by an `array('d')`.
+
+    The array is allocated on the first append and doubled as the buffer fills, so the many tokens that only trade a
+    few times stay small. Once full, appending overwrites the oldest value and the memory used stays constant. Items
+    are indexed from the oldest (0) to the newest (-1) and can be read in place without copying the buffer.
+    """
+
+    __slots__ = ("data", "capacity", "start", "size")
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError(f"RingBuffer capacity must be positive, got {capacity}")
+        self.data = array("d")
+        self.capacity = capacity
+        self.start = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index: int) -> float:
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError("RingBuffer index out of range")
+        return self.data[(self.start + index) % len(self.data)]
+
+    def __iter__(self):
+        data, start, allocated = self.data, self.start, len(self.data)
+        for i in range(self.size):
+            yield data[(start + i) % allocated]
+
+    def _grow(self):
+        allocated = min(self.capacity, max(RING_BUFFER_MIN_ALLOCATION, 2 * len(self.data)))
+        data = array("d", self)  # oldest first, so that `start` is back to 0
+        data.extend(array("d", [0.0]) * (allocated - self.size))
+        self.data = data
+        self.start = 0
+
+    def append(self, value: float):
+        if self.size == len(self.data) and self.size < self.capacity:
+            self._grow()
+        if self.size == self.capacity:
+            self.data[self.start] = value
+            self.start = (self.start + 1) % self.capacity
+        else:
+            self.data[(self.start + self.size) % len(self.data)] = value
+            self.size += 1
+
+    def popleft(self) -> float:
+        if self.size == 0:
+            raise IndexError("pop from an empty RingBuffer")
+        value = self.data[self.start]
+        self.start = (self.start + 1) % len(self.data)
+        self.size -= 1
+        return value
 
-    def record_request(self):
-        now = time.time()
-        self.timestamps.append(now)
+    def clear(self):
+        self.start = 0
+        self.size = 0
 
-        # Remove timestamps outside the time window
-        while self.timestamps and self.timestamps[0] < now - self.window_size:
-            self.timestamps.popleft()
 
-    def get_rps(self):
-        # Requests in the current window
-        return len(self.timestamps)
+def _welford_add(state, x, y):
+    """Add the point (x, y) to a (n, mean_x, mean_y, m2_x, m2_y, c_xy) running state."""
+    n, mean_x, mean_y, m2_x, m2_y, c_xy = state
+    n += 1
+    dx = x - mean_x
+    dy = y - mean_y
+    mean_x += dx / n
+    mean_y += dy / n
+    m2_x += dx * (x - mean_x)
+    m2_y += dy * (y - mean_y)
+    c_xy += dx * (y - mean_y)
+    return n, mean_x, mean_y, m2_x, m2_y, c_xy
+
+
+def _welford_remove(state, x, y):
+    """Inverse of `_welford_add`, used to drop a point that was previously added."""
+    n, mean_x, mean_y, m2_x, m2_y, c_xy = state
+    if n <= 1:
+        return 0, 0.0, 0.0, 0.0, 0.0, 0.0
+    prev_mean_x = (n * mean_x - x) / (n - 1)
+    prev_mean_y = (n * mean_y - y) / (n - 1)
+    m2_x -= (x - prev_mean_x) * (x - mean_x)
+    m2_y -= (y - prev_mean_y) * (y - mean_y)
+    c_xy -= (x - prev_mean_x) * (y - mean_y)
+    return n - 1, prev_mean_x, prev_mean_y, m2_x, m2_y, c_xy
+
+
+class TrendRegression:
+    """
+    Incremental least-squares fit of mcap over time.
+
+    Keeps Welford-style running moments so that every new sample is O(1) while `slope` and `r_squared` give the
+    same numbers as `scipy.stats.linregress` over all the samples added so far. Timestamps are taken relative to
+    the first sample to keep the moments well conditioned.
+    """
+
+    __slots__ = ("base_time", "last_x", "last_y", "state")
+
+    def __init__(self):
+        self.base_time = None
+        self.last_x = 0.0
+        self.last_y = 0.0
+        self.state = (0, 0.0, 0.0, 0.0, 0.0, 0.0)
+
+    def __len__(self):
+        return self.state[0]
+
+    def add(self, timestamp: float, value: float):
+        if self.base_time is None:
+            self.base_time = timestamp
+        self.last_x = timestamp - self.base_time
+        self.last_y = value
+        self.state = _welford_add(self.state, self.last_x, value)
+
+    def remove(self, timestamp: float, value: float):
+        self.state = _welford_remove(self.state, timestamp - self.base_time, value)
+
+    def _fit_state(self):
+        state = self.state
+        if state[3] <= 0 and state[0] > 1:
+            # All samples share the same timestamp: mimic the old behaviour of shifting the last sample by 1s
+            state = _welford_remove(state, self.last_x, self.last_y)
+            state = _welford_add(state, self.last_x + 1, self.last_y)
+        return state
+
+    @property
+    def slope(self) -> float:
+        n, _, _, m2_x, _, c_xy = self._fit_state()
+        if n < 2 or m2_x <= 0:
+            return 0.0
+        return c_xy / m2_x
+
+    @property
+    def r_squared(self) -> float:
+        n, _, _, m2_x, m2_y, c_xy = self._fit_state()
+        if n < 2 or m2_x <= 0 or m2_y <= 0:
+            return 0.0
+        r = c_xy / (m2_x * m2_y) ** 0.5
+        r = min(1.0, max(-1.0, r))
+        return r * r
+
+
+class RollingTrendRegression:
+    """
+    `TrendRegression` restricted to the samples of the last `window` seconds, and to the last `capacity` of them.
+
+    The samples are kept in two `RingBuffer`s, the mcap history of the token, so a token trading for hours keeps a
+    constant memory. The fit is updated in place as samples come in and expire.
+    """
+
+    __slots__ = ("window", "timestamps", "values", "trend")
+
+    def __init__(self, window: float, capacity: int = MCAP_LOG_CAPACITY):
+        self.window = window
+        self.timestamps = RingBuffer(capacity)
+        self.values = RingBuffer(capacity)
+        self.trend = TrendRegression()
+
+    def add(self, timestamp: float, value: float):
+        if len(self.timestamps) == self.timestamps.capacity:  # the oldest sample is overwritten
+            self.trend.remove(self.timestamps.popleft(), self.values.popleft())
+        self.timestamps.append(timestamp)
+        self.values.append(value)
+        self.trend.add(timestamp, value)
+        self.expire(timestamp)
+
+    def expire(self, now: float):
+        oldest_allowed = now - self.window
+        timestamps, values = self.timestamps, self.values
+        if not timestamps or timestamps[0] >= oldest_allowed:
+            return
+        while timestamps and timestamps[0] < oldest_allowed:
+            self.trend.remove(timestamps.popleft(), values.popleft())
+        if not timestamps or timestamps[0] == timestamps[-1]:
+            # The removals leave rounding residue in the moments, refit so that `TrendRegression` still sees
+            # samples sharing one timestamp as exactly degenerate
+            self.trend = TrendRegression()
+            for sample in zip(timestamps, values):
+                self.trend.add(*sample)
+
+    @property
+    def slope(self) -> float:
+        return self.trend.slope if len(self.trend) > 2 else 0.0
+
+
+class RollingTradeWindow:
+    """Buys, sells and buy volume of the trades made in the last `window` seconds, kept with running sums."""
+
+    __slots__ = ("window", "trades", "buys", "sells", "buy_volume")
+
+    def __init__(self, window: float):
+        self.window = window
+        self.trades = deque()
+        self.buys = 0
+        self.sells = 0
+        self.buy_volume = 0.0
+
+    def add(self, timestamp: float, is_buy: bool, sol_amount: float):
+        self.trades.append((timestamp, is_buy, sol_amount))
+        if is_buy:
+            self.buys += 1
+            self.buy_volume += sol_amount
+        else:
+            self.sells += 1
+        self.expire(timestamp)
+
+    def expire(self, now: float):
+        oldest_allowed = now - self.window
+        trades = self.trades
+        while trades and trades[0][0] < oldest_allowed:
+            _, is_buy, sol_amount = trades.popleft()
+            if is_buy:
+                self.buys -= 1
+                self.buy_volume -= sol_amount
+            else:
+                self.sells -= 1
+        if self.buys == 0:
+            self.buy_volume = 0.0  # drop the accumulated rounding error
+
+    @property
+    def avg_buy_amount(self) -> float:
+        return self.buy_volume / self.buys if self.buys != 0 else 0
+
+    @property
+    def buys_sells_ratio(self) -> float:
+        return self.buys / self.sells if self.sells != 0 else 1
 
 
 class TokenStats:
 
+    counter: RateMeter
     buys: int
     sells: int
-    tx_sec: int
     dev_sold: bool
     entering_time: float
     entering_mcap: float
+    entering_condition: int
+    entering_sol: float
     entering_price: float
     token_amount: float
     buys_sells_ratio: float
@@ -69,22 +418,26 @@ class TokenStats:
     avg_buy_amount: float
     total_buy_volume: float
     last_trade_time: float
-    mcap_logs: list[float]
-    mcap_timestamp_logs: list[float]
+    trend: TrendRegression
     slope: float
     trend_strength: float
+    trade_window: RollingTradeWindow
+    slope_window: RollingTrendRegression
     first_five_buys: list[float]
     executing_order: bool
     pool: str
+    virtual_sol_reserves: float
+    virtual_token_reserves: float
 
     def __init__(self):
-        self.counter = RequestRateCounter()
+        self.counter = RateMeter()
         self.buys = 0
         self.sells = 0
-        self.tx_sec = 0
         self.dev_sold = False
         self.entering_time = 0
         self.entering_mcap = 0
+        self.entering_condition = 0
+        self.entering_sol = 0  # SOL spent on the entry, fees included
         self.entering_price = 0
         self.token_amount = 0
         self.buys_sells_ratio = 1
@@ -96,10 +449,48 @@ class TokenStats:
         self.avg_buy_amount = 0
         self.total_buy_volume = 0
         self.last_trade_time = 0
-        self.mcap_logs = []
-        self.mcap_timestamp_logs = []
+        self.trend = TrendRegression()
         self.slope = 0
         self.trend_strength = 0
+        self.trade_window = RollingTradeWindow(TRADE_WINDOW)
+        self.slope_window = RollingTrendRegression(SLOPE_WINDOW)
         self.first_five_buys = []
         self.executing_order = False
         self.pool = "auto"
+        self.virtual_sol_reserves = 0  # of the bonding curve, the price the local builder trades at
+        self.virtual_token_reserves = 0
+
+    @property
+    def tx_sec(self) -> float:
+        """Current transactions per second, decayed to the time of reading."""
+        return self.counter.rate()
+
+    def _recent_trades(self) -> RollingTradeWindow:
+        self.trade_window.expire(clock.time())
+        return self.trade_window
+
+    @property
+    def buys_10s(self) -> int:
+        """Buys of the last `TRADE_WINDOW` seconds, expired to the time of reading like the indicators below."""
+        return self._recent_trades().buys
+
+    @property
+    def sells_10s(self) -> int:
+        return self._recent_trades().sells
+
+    @property
+    def buy_volume_10s(self) -> float:
+        return self._recent_trades().buy_volume
+
+    @property
+    def avg_buy_amount_10s(self) -> float:
+        return self._recent_trades().avg_buy_amount
+
+    @property
+    def buys_sells_ratio_10s(self) -> float:
+        return self._recent_trades().buys_sells_ratio
+
+    @property
+    def slope_30s(self) -> float:
+        self.slope_window.expire(clock.time())
+        return self.slope_window.slope
@@ -0,0 +1,911 @@
+import argparse
+import asyncio
+import base64
+import contextlib
+import gzip
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import deque
+
+import base
+from base import SLOPE_WINDOW, TRADE_WINDOW, TrendRegression, RateMeter, TokenStats, VirtualClock
+from helper import evaluate_conditions, CompiledConditions, props
+from recorder import SessionRecorder, read_session, SESSION_FORMAT
+
+REPO_DIRECTORY = os.path.dirname(os.path.abspath(__file__))  # the scripts run by the benchmarks
+
+
+def _synthetic_trades(n: int, seed: int = 7):
+    """Generate `n` (timestamp, mcap) pairs resembling a busy pump.fun token."""
+    rng = random.Random(seed)
+    t = 1_700_000_000.0
+    mcap = 28.0
+    trades = []
+    for _ in range(n):
+        t += rng.expovariate(50)  # ~50 trades per second
+        mcap = max(1.0, mcap + rng.gauss(0.02, 0.5))
+        trades.append((t, mcap))
+    return trades
+
+
+def _linregress_full_history(trades):
+    """The previous `update_values` approach: rebuild x and call linregress over the whole history per trade."""
+    from scipy.stats import linregress
+
+    mcap_logs = []
+    mcap_timestamp_logs = []
+    slope = trend_strength = 0
+    for t, mcap in trades:
+        mcap_logs.append(mcap)
+        mcap_timestamp_logs.append(t)
+        if len(mcap_logs) > 2:
+            base_time = mcap_timestamp_logs[0]
+            x = [ts - base_time for ts in mcap_timestamp_logs]
+            if len(set(x)) == 1 and len(x) > 1:
+                x[-1] = x[-2] + 1
+            result = linregress(x, mcap_logs)
+            slope = result.slope
+            trend_strength = result.rvalue ** 2
+    return slope, trend_strength
+
+
+def _incremental(trades):
+    trend = TrendRegression()
+    slope = trend_strength = 0
+    for t, mcap in trades:
+        trend.add(t, mcap)
+        if len(trend) > 2:
+            slope = trend.slope
+            trend_strength = trend.r_squared
+    return slope, trend_strength
+
+
+def bench_trend(trades_per_token: int):
+    trades = _synthetic_trades(trades_per_token)
+
+    start = time.perf_counter()
+    slope, strength = _incremental(trades)
+    elapsed = time.perf_counter() - start
+    print(f"incremental regression: {trades_per_token / elapsed:,.0f} events/sec "
+          f"({elapsed * 1e6 / trades_per_token:.2f} us/event)")
+
+    try:
+        from scipy.stats import linregress
+    except ImportError:
+        print("scipy is not installed, skipping the linregress comparison.")
+        return
+
+    result = linregress([t - trades[0][0] for t, _ in trades], [m for _, m in trades])
+    print(f"final slope diff vs linregress: {abs(slope - result.slope):.3e}, "
+          f"r^2 diff: {abs(strength - result.rvalue ** 2):.3e}")
+
+    start = time.perf_counter()
+    _linregress_full_history(trades)
+    elapsed = time.perf_counter() - start
+    print(f"full-history linregress: {trades_per_token / elapsed:,.0f} events/sec "
+          f"({elapsed * 1e6 / trades_per_token:.2f} us/event)")
+
+
+class _DequeRateCounter:
+    """The previous `RequestRateCounter`, taking the timestamp as an argument so bursts can be replayed."""
+
+    def __init__(self, window_size=1.0):
+        self.timestamps = deque()
+        self.window_size = window_size
+
+    def record_request(self, now):
+        self.timestamps.append(now)
+        while self.timestamps and self.timestamps[0] < now - self.window_size:
+            self.timestamps.popleft()
+
+    def get_rps(self):
+        return len(self.timestamps)
+
+
+def _burst_timestamps(tx_per_sec: float, seconds: float, seed: int = 7):
+    rng = random.Random(seed)
+    t = 1_700_000_000.0
+    end = t + seconds
+    timestamps = []
+    while t < end:
+        t += rng.expovariate(tx_per_sec)
+        timestamps.append(t)
+    return timestamps
+
+
+def bench_rate(tokens: int, tx_per_sec: float, seconds: float):
+    timestamps = _burst_timestamps(tx_per_sec, seconds)
+    events = tokens * len(timestamps)
+
+    def run(make_counter, record):
+        counters = [make_counter() for _ in range(tokens)]
+        for counter in counters:
+            for t in timestamps:
+                record(counter, t)
+        return counters
+
+    def run_timed(make_counter, record):
+        start = time.perf_counter()
+        counters = run(make_counter, record)
+        elapsed = time.perf_counter() - start
+        tracemalloc.start()
+        run(make_counter, record)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return elapsed, peak, counters
+
+    for name, make_counter, record, read in (
+            ("deque counter", _DequeRateCounter, _DequeRateCounter.record_request, _DequeRateCounter.get_rps),
+            ("bucketed meter", RateMeter, RateMeter.record, lambda m: m.rate(timestamps[-1]))):
+        elapsed, peak, counters = run_timed(make_counter, record)
+        print(f"{name:>15}: {elapsed * 1e9 / events:7.1f} ns/record | peak memory {peak / 1024:9.1f} KiB "
+              f"for {tokens} tokens | rate at end {read(counters[0]):g} tx/s")
+
+
+def _random_strategy(conditions: int, subconditions: int, seed: int = 7):
+    rng = random.Random(seed)
+    prop_names = [name for name in props if name not in ("PnL", "time elapsed")]
+    return [[(rng.choice(prop_names), rng.choice([">", ">=", "<", "<="]), round(rng.uniform(0, 50), 2))
+             for _ in range(subconditions)]
+            for _ in range(conditions)]
+
+
+def _random_token(seed: int = 7, now: float = 0.0):
+    """A token with random indicators, the rolling ones filled with trades of the windows ending at `now`."""
+    rng = random.Random(seed)
+    token = TokenStats()
+    for name, attr in props.items():
+        if name not in ("PnL", "time elapsed") and not isinstance(getattr(TokenStats, attr, None), property):
+            setattr(token, attr, rng.uniform(0, 50))
+    for _ in range(rng.randint(0, 50)):
+        token.trade_window.add(now - rng.uniform(0, TRADE_WINDOW), rng.random() < 0.5, rng.uniform(0, 2))
+    for timestamp in sorted(now - rng.uniform(0, SLOPE_WINDOW) for _ in range(rng.randint(0, 50))):
+        token.slope_window.add(timestamp, rng.uniform(20, 100))
+    return token
+
+
+def _nearly_satisfied_strategy(conditions: int, subconditions: int, seed: int = 7):
+    """Conditions whose first sub-conditions hold and whose last one fails, the worst order to check them in."""
+    rng = random.Random(seed)
+    passing = [("buys", ">", -1), ("total trades", ">", -1), ("mcap", ">", -1), ("sells", ">=", 0)]
+    failing = [("buys", ">", 10 ** 6), ("sells", ">", 10 ** 6), ("mcap", ">", 10 ** 6)]
+    return [[rng.choice(passing) for _ in range(subconditions - 1)] + [rng.choice(failing)]
+            for _ in range(conditions)]
+
+
+def bench_conditions(conditions: int, subconditions: int, evaluations: int):
+    previous_clock = base.clock
+    base.set_clock(VirtualClock(1000.0))  # frozen, so the rolling windows keep their trades for the whole run
+    try:
+        tokens = [_random_token(seed, now=1000.0) for seed in range(100)]
+        for label, strategy in (("random thresholds", _random_strategy(conditions, subconditions)),
+                                ("nearly satisfied", _nearly_satisfied_strategy(conditions, subconditions))):
+            compiled = CompiledConditions(strategy)
+            in_order = CompiledConditions(strategy, profile_every=0)  # never profiled, so never reordered
+            for token in tokens:
+                expected = evaluate_conditions(token, strategy, pnl=1, time_elapsed=1)
+                assert compiled.evaluate(token, pnl=1, time_elapsed=1) == expected
+                assert in_order.evaluate(token, pnl=1, time_elapsed=1) == expected
+
+            for name, evaluate in (("evaluate_conditions",
+                                    lambda t: evaluate_conditions(t, strategy, pnl=1, time_elapsed=1)),
+                                   ("compiled, in order", lambda t: in_order.evaluate(t, pnl=1, time_elapsed=1)),
+                                   ("compiled, reordered", lambda t: compiled.evaluate(t, pnl=1, time_elapsed=1))):
+                start = time.perf_counter()
+                for i in range(evaluations):
+                    evaluate(tokens[i % len(tokens)])
+                elapsed = time.perf_counter() - start
+                print(f"{label:>17} | {name:>19}: {elapsed * 1e6 / evaluations:.2f} us/evaluation "
+                      f"({conditions} conditions x {subconditions} sub-conditions)")
+    finally:
+        base.set_clock(previous_clock)
+
+
+def _wall_time(cmd, runs):
+    """Best wall-clock time of `runs` fresh interpreter processes running `cmd`, or the error of the first failure."""
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        # the GUI reads its images and instructions relative to the working directory
+        result = subprocess.run(cmd, capture_output=True, text=True, cwd=REPO_DIRECTORY,
+                                env={**os.environ, "QT_QPA_PLATFORM": "offscreen"})
+        elapsed = time.perf_counter() - start
+        if result.returncode != 0:
+            return None, result.stderr.strip().splitlines()[-1]
+        best = min(best, elapsed)
+    return best, None
+
+
+def bench_cold_start(runs: int):
+    strategy = {"sol_balance": 5, "buy_size": 0.3, "enter_conditions": [[["buys", ">", 5]]],
+                "exit_conditions": [[["PnL", ">", 20]]]}
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+        json.dump(strategy, f)
+    try:
+        headless_script = os.path.join(REPO_DIRECTORY, "headless.py")
+        gui_script = os.path.join(REPO_DIRECTORY, "gem-finder.py")
+        for name, cmd in (("headless", [sys.executable, headless_script, "--strategy", f.name, "--check"]),
+                          ("GUI", [sys.executable, "-c", f"import runpy; runpy.run_path({gui_script!r})"])):
+            elapsed, error = _wall_time(cmd, runs)
+            if elapsed is None:
+                print(f"{name:>8}: could not start ({error})")
+            else:
+                print(f"{name:>8}: {elapsed * 1000:.0f} ms from process launch until ready to subscribe")
+    finally:
+        os.remove(f.name)
+
+
+def _synthetic_frames(n: int, seed: int = 7):
+    """Raw PumpPortal trade frames, as received by `receiver`."""
+    rng = random.Random(seed)
+    mints = [f"{rng.getrandbits(160):040x}pump" for _ in range(50)]
+    frames = []
+    for _ in range(n):
+        frames.append(json.dumps({
+            "signature": f"{rng.getrandbits(512):0128x}", "mint": rng.choice(mints),
+            "traderPublicKey": f"{rng.getrandbits(176):044x}", "txType": rng.choice(["buy", "sell"]),
+            "tokenAmount": rng.uniform(1e4, 1e7), "solAmount": rng.uniform(0.01, 3),
+            "newTokenBalance": rng.uniform(1e4, 1e7), "bondingCurveKey": f"{rng.getrandbits(176):044x}",
+            "vTokensInBondingCurve": rng.uniform(1e8, 1e9), "vSolInBondingCurve": rng.uniform(30, 80),
+            "marketCapSol": rng.uniform(28, 400), "pool": "pump"}))
+    return frames
+
+
+def bench_record(msgs_per_sec: float, seconds: float):
+    frames = _synthetic_frames(10_000)
+    total = int(msgs_per_sec * seconds)
+    with tempfile.TemporaryDirectory() as directory:
+        recorder = SessionRecorder(directory).start()
+        hot_path = 0
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        for i in range(total):
+            # pace the frames like a websocket delivering `msgs_per_sec`
+            delay = wall_start + i / msgs_per_sec - time.perf_counter()
+            if delay > 0.001:
+                time.sleep(delay)
+            start = time.perf_counter()
+            recorder.record(frames[i % len(frames)])
+            hot_path += time.perf_counter() - start
+        recorder.close()
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+
+        read_back = sum(sum(1 for _ in read_session(path)[1]) for path in recorder.files)
+        size = sum(os.path.getsize(path) for path in recorder.files)
+        raw_size = sum(len(frames[i % len(frames)]) for i in range(total))
+        print(f"recorded {recorder.recorded:,} of {total:,} frames at {msgs_per_sec:,.0f} msgs/sec "
+              f"({recorder.dropped} dropped, {read_back:,} read back)")
+        print(f"record() on the event loop: {hot_path * 1e9 / total:.0f} ns/frame")
+        print(f"CPU used: {cpu / wall * 100:.0f}% of one core for {wall:.1f}s (producer included)")
+        print(f"written: {size / 1024:,.0f} KiB for {raw_size / 1024:,.0f} KiB of frames "
+              f"({raw_size / max(size, 1):.1f}x compression)")
+
+
+def write_synthetic_session(path: str, seconds: float, seed: int = 7):
+    """
+    Write a session file in the recorder's format with `seconds` of synthetic PumpPortal traffic.
+
+    A token is created every second on average and trades for about a minute, most of them slowly and a few in
+    bursts, with a random walk mcap. The trades of every token are included, as if all of them were subscribed to.
+    Returns the number of frames written.
+    """
+    rng = random.Random(seed)
+    events = []
+    t = 0.0
+    while t < seconds:
+        t += rng.expovariate(1.0)
+        mint = f"{rng.getrandbits(160):040x}pump"
+        dev = f"{rng.getrandbits(176):044x}"
+        mcap = 28 + rng.uniform(0, 5)
+        events.append((t, {"mint": mint, "traderPublicKey": dev, "txType": "create", "marketCapSol": mcap,
+                           "solAmount": 0, "pool": "pump"}))
+        hot = rng.random() < 0.1
+        trade_rate = rng.uniform(5, 20) if hot else rng.uniform(0.2, 2)
+        drift = rng.gauss(0.05 if hot else -0.01, 0.05)
+        end = min(seconds, t + rng.expovariate(1 / 60))
+        trade_time = t
+        while True:
+            trade_time += rng.expovariate(trade_rate)
+            if trade_time >= end:
+                break
+            is_buy = rng.random() < (0.6 if drift > 0 else 0.45)
+            sol = rng.uniform(0.05, 2)
+            mcap = max(1.0, mcap + (sol if is_buy else -sol) * 0.9 + rng.gauss(drift, 0.3))
+            trader = dev if not is_buy and rng.random() < 0.01 else f"{rng.getrandbits(176):044x}"
+            events.append((trade_time, {"mint": mint, "traderPublicKey": trader, "txType": "buy" if is_buy else "sell",
+                                        "marketCapSol": mcap, "solAmount": sol, "pool": "pump"}))
+    events.sort(key=lambda e: e[0])
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        f.write(f"# {json.dumps({'format': SESSION_FORMAT, 'wall_time': 1_700_000_000.0, 'monotonic': 0.0})}\n")
+        for ts, data in events:
+            f.write(f"{ts:.6f}\t{json.dumps(data)}\n")
+    return len(events)
+
+
+_REPLAY_STRATEGY = {"sol_balance": 10, "max_slippage": 30, "priority_fee": 0.0001, "buy_size": 0.3,
+                    "batch_reset_size": 10, "inactivity_reset_time": 4,
+                    "enter_conditions": [[["buys", ">", 8], ["buy/sell ratio", ">", 1.5]],
+                                         [["mcap slope", ">", 0.3], ["trend strength", ">", 0.6]]],
+                    "exit_conditions": [[["PnL", ">", 25]], [["PnL", "<", -10]], [["time elapsed", ">", 20]]]}
+
+
+def bench_replay(minutes: float, speed: float):
+    import engine
+    import headless
+    from replay import replay
+
+    enter_conditions, exit_conditions = headless.validate_strategy(headless.parse_strategy(_REPLAY_STRATEGY))
+    quiet = type("Loggers", (), {"log_general_message": staticmethod(lambda msg: None),
+                                 "log_transaction_message": staticmethod(lambda msg: None)})
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "session.log.gz")
+        frames = write_synthetic_session(path, minutes * 60)
+        transcripts = []
+        for run_speed in (0, speed) if speed else (0,):
+            cfg = headless.build_config(headless.parse_strategy(_REPLAY_STRATEGY))
+            start = time.perf_counter()
+            socket = asyncio.run(replay([path], enter_conditions, exit_conditions, cfg, quiet, run_speed, seed=7))
+            elapsed = time.perf_counter() - start
+            transcripts.append((dict(engine.strategy_transcript), round(cfg.sol_balance_widget.value(), 9)))
+            label = "max speed" if run_speed == 0 else f"{run_speed:g}x"
+            print(f"{label:>9}: {minutes:g} min of data ({frames:,} frames, {socket.delivered:,} subscribed) "
+                  f"in {elapsed:.2f}s | {len(transcripts[-1][0])} trades | balance {transcripts[-1][1]:.4f} SOL")
+        if len(transcripts) == 2:
+            print(f"identical decisions: {transcripts[0] == transcripts[1]}")
+
+
+def bench_vector(minutes: float, runs: int):
+    import headless
+    from backtest import backtest
+    from vector_backtest import Dataset, compare_results, vector_backtest
+
+    strategy = headless.parse_strategy(_REPLAY_STRATEGY)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "session.log.gz")
+        frames = write_synthetic_session(path, minutes * 60)
+        start = time.perf_counter()
+        reference = backtest(strategy, [path])
+        event_driven = time.perf_counter() - start
+
+        start = time.perf_counter()
+        Dataset.from_sessions([path]).save(os.path.join(directory, "dataset"))
+        parsing = time.perf_counter() - start
+        start = time.perf_counter()
+        dataset = Dataset.load(os.path.join(directory, "dataset"))
+        loading = time.perf_counter() - start
+        vectorized = float("inf")
+        for _ in range(runs):
+            start = time.perf_counter()
+            results = vector_backtest(strategy, dataset)
+            vectorized = min(vectorized, time.perf_counter() - start)
+        differences = compare_results(results, reference)
+
+    print(f"{minutes:g} min of data ({frames:,} frames), {reference['statistics']['trades']} trades")
+    print(f"event-driven backtest: {event_driven:.3f}s")
+    print(f"vectorized backtest:   {vectorized:.3f}s ({event_driven / vectorized:.1f}x faster), best of {runs}")
+    print(f"dataset: parsed and saved once in {parsing:.3f}s, loaded in {loading * 1000:.1f} ms")
+    print(f"identical results: {not differences}")
+    for difference in differences:
+        print(f"  {difference}")
+
+
+def bench_sweep(minutes: float, configurations: int):
+    from sweep import random_search, sweep
+    from vector_backtest import Dataset
+
+    template = json.loads(json.dumps(_REPLAY_STRATEGY))
+    template["enter_conditions"][0][0][2] = "$min_buys"
+    template["enter_conditions"][1][0][2] = "$min_slope"
+    template["exit_conditions"][0][0][2] = "$take_profit"
+    parameters = {"min_buys": {"min": 2, "max": 20}, "min_slope": {"min": 0.05, "max": 1.0},
+                  "take_profit": {"min": 5.0, "max": 60.0}}
+    cores = os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "session.log.gz")
+        frames = write_synthetic_session(path, minutes * 60)
+        Dataset.from_sessions([path]).save(os.path.join(directory, "dataset"))
+        print(f"{minutes:g} min of data ({frames:,} frames), {configurations} random configurations, {cores} cores")
+        single = None
+        for workers in sorted({1, 2, 4, cores} & set(range(1, cores + 1))):
+            start = time.perf_counter()
+            results = list(sweep(template, random_search(parameters, configurations, seed=7),
+                                 os.path.join(directory, "dataset"), workers))
+            elapsed = time.perf_counter() - start
+            single = single or elapsed
+            print(f"{workers:>3} workers: {elapsed:.2f}s ({len(results) / elapsed:.1f} configurations/s), "
+                  f"{single / elapsed:.2f}x the single worker ({single / elapsed / workers * 100:.0f}% efficiency)")
+
+
+class _FrameCounter:
+    """Stands in for the session recorder to count the frames the engine receives."""
+
+    def __init__(self):
+        self.recorded = 0
+
+    def record(self, frame):
+        self.recorded += 1
+
+
+def bench_feed(create_rate: float, trades_per_token: float, batch: int, seconds: float):
+    import engine
+    import headless
+
+    with socket.socket() as probe:  # a free port for the mock feed
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server = subprocess.Popen([sys.executable, os.path.join(REPO_DIRECTORY, "mock_pumpportal.py"), "--port", str(port),
+                               "--create_rate", str(create_rate), "--trades_per_token", str(trades_per_token)],
+                              stdout=subprocess.DEVNULL)
+    strategy = headless.parse_strategy(dict(_REPLAY_STRATEGY, batch_reset_size=batch))
+    enter_conditions, exit_conditions = headless.validate_strategy(strategy)
+    quiet = type("Loggers", (), {"log_general_message": staticmethod(lambda msg: None),
+                                 "log_transaction_message": staticmethod(lambda msg: None)})
+
+    async def run():
+        engine.reset_globals()
+        counter = _FrameCounter()
+        cfg = headless.build_config(strategy)
+        task = asyncio.create_task(engine.subscribe(enter_conditions, exit_conditions, quiet, cfg,
+                                                    recorder=counter, uri=f"ws://127.0.0.1:{port}"))
+        last_received, last_time = 0, time.perf_counter()
+        peak_rate = peak_backlog = 0
+        for second in range(int(seconds)):
+            await asyncio.sleep(1)
+            if task.done():
+                break
+            now, backlog = time.perf_counter(), engine.queue.qsize()
+            rate = (counter.recorded - last_received) / (now - last_time)
+            processed = counter.recorded - backlog
+            print(f"{second + 1:>4}s: received {rate:>8,.0f} msgs/sec | processed {processed:>9,} | "
+                  f"backlog {backlog:>7,} | {len(engine.tokens):>5} tokens subscribed", file=sys.stderr)
+            peak_rate, peak_backlog = max(peak_rate, rate), max(peak_backlog, backlog)
+            last_received, last_time = counter.recorded, now
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+        return counter.recorded, peak_rate, peak_backlog
+
+    try:
+        time.sleep(1)  # let the server start listening
+        # the engine prints its subscriptions
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            received, peak_rate, peak_backlog = asyncio.run(run())
+    finally:
+        server.terminate()
+        server.wait()
+    print(f"{received:,} frames received, peak {peak_rate:,.0f} msgs/sec, peak backlog {peak_backlog:,} frames "
+          f"({'keeping up' if peak_backlog < peak_rate else 'falling behind'})")
+
+
+def bench_orders(orders: int, latency: str, max_in_flight: int):
+    from mock_solana import Endpoint, start_mock
+    trade_url, rpc_url, *_ = start_mock(trade=Endpoint("trade", latency), rpc=Endpoint("rpc", latency))
+    os.environ.update(GEM_FINDER_TRADE_URL=trade_url, GEM_FINDER_RPC_URL=rpc_url)  # read by rpc_calls
+    from solders.keypair import Keypair
+    from order_executor import OrderExecutor
+    from rpc_calls import complete_official_transaction
+
+    keypair = Keypair()
+    mints = [str(Keypair().pubkey()) for _ in range(orders)]
+    quiet = type("Loggers", (), {"log_general_message": staticmethod(lambda msg: None),
+                                 "log_transaction_message": staticmethod(lambda msg: None)})
+
+    def order(mint):
+        return complete_official_transaction("buy", mint, keypair, 20, 0.0001, "true", "pump", 0.1, "", quiet)
+
+    async def stalls(done):
+        """Longest time the event loop could not run a 1ms ticker, as a websocket read would wait."""
+        longest, last = 0.0, time.perf_counter()
+        while not done.is_set():
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            longest, last = max(longest, now - last), now
+        return longest
+
+    async def inline():
+        done = asyncio.Event()
+        ticker = asyncio.create_task(stalls(done))
+        await asyncio.sleep(0)
+        for mint in mints:
+            order(mint)  # what `processor` did with a real wallet
+            await asyncio.sleep(0)
+        done.set()
+        return await ticker
+
+    async def executor():
+        done = asyncio.Event()
+        ticker = asyncio.create_task(stalls(done))
+        orders_executor = OrderExecutor(max_in_flight)
+        for mint in mints:
+            orders_executor.submit(mint, lambda mint=mint: order(mint), lambda retries: None, lambda e: None)
+        await orders_executor.drain()
+        orders_executor.close()
+        done.set()
+        return await ticker
+
+    for name, run in (("inline", inline), (f"executor ({max_in_flight} in flight)", executor)):
+        start = time.perf_counter()
+        longest = asyncio.run(run())
+        elapsed = time.perf_counter() - start
+        print(f"{name:>24}: {orders} orders in {elapsed:.2f}s, longest event loop stall {longest * 1000:,.0f} ms")
+
+
+def bench_http(orders: int, latency: str, tls: bool):
+    import requests
+    import http_pool
+    from mock_solana import Endpoint, self_signed_certificate, start_mock
+    certificate = self_signed_certificate(tempfile.mkdtemp(prefix="bench-http-")) if tls else None
+    trade_url, rpc_url, *_ = start_mock(trade=Endpoint("trade", latency), rpc=Endpoint("rpc", latency),
+                                        certificate=certificate)
+    os.environ.update(GEM_FINDER_TRADE_URL=trade_url, GEM_FINDER_RPC_URL=rpc_url)  # read by rpc_calls
+    if certificate is not None:
+        os.environ["REQUESTS_CA_BUNDLE"] = certificate[0]
+    from solders.keypair import Keypair
+    from rpc_calls import complete_official_transaction
+
+    keypair = Keypair()
+    quiet = type("Loggers", (), {"log_general_message": staticmethod(lambda msg: None),
+                                 "log_transaction_message": staticmethod(lambda msg: None)})
+
+    def per_order():
+        times = []
+        for _ in range(orders):
+            start = time.perf_counter()
+            complete_official_transaction("buy", str(Keypair().pubkey()), keypair, 20, 0.0001, "true", "pump", 0.1,
+                                          "", quiet)
+            times.append(time.perf_counter() - start)
+        return sorted(times)
+
+    pooled_post = http_pool.post
+    http_pool.post = requests.post  # the previous path, a new connection for every request
+    try:
+        unpooled = per_order()
+    finally:
+        http_pool.post = pooled_post
+    start = time.perf_counter()
+    http_pool.warm_up([trade_url, rpc_url])
+    warm_up = time.perf_counter() - start
+    pooled = per_order()
+
+    scheme = "HTTPS" if tls else "HTTP"
+    print(f"{orders} orders over {scheme}, endpoint latency {latency}, pool warmed up in {warm_up * 1000:.1f} ms")
+    for name, times in (("new connections", unpooled), ("pooled", pooled)):
+        print(f"{name:>16}: median {times[len(times) // 2] * 1000:7.1f} ms/order, "
+              f"p90 {times[int(len(times) * 0.9)] * 1000:7.1f} ms/order")
+    saved = (sum(unpooled) - sum(pooled)) / orders
+    # locally a handshake costs CPU only, against a remote endpoint it also waits for TCP's and TLS's round trips
+    print(f"Saved {saved * 1000:.1f} ms per order (2 requests each), plus {4 if tls else 2} round trips to the "
+          f"endpoints when they are remote")
+
+
+def bench_hedge(orders: int, latencies, error_rates):
+    import http_pool
+    from mock_solana import Chain, Endpoint, start_mock, start_rpc
+    from rpc_endpoints import RpcEndpoints
+    from solders.commitment_config import CommitmentLevel
+    from solders.keypair import Keypair
+    from solders.rpc.config import RpcSendTransactionConfig
+    from solders.rpc.requests import SendVersionedTransaction
+    from solders.transaction import VersionedTransaction
+
+    if len(error_rates) != len(latencies):
+        raise SystemExit("Give one error rate per RPC latency")
+    chain = Chain()
+    trade_url, *_ = start_mock(chain=chain)
+    urls = [start_rpc(chain, Endpoint(f"rpc{i}", latency, error_rate, seed=i))[0]
+            for i, (latency, error_rate) in enumerate(zip(latencies, error_rates))]
+    http_pool.warm_up([trade_url, *urls], 4)
+    keypair = Keypair()
+    config = RpcSendTransactionConfig(preflight_commitment=CommitmentLevel.Confirmed)
+
+    def signed_transaction():
+        response = http_pool.post(trade_url, data={
+            "publicKey": str(keypair.pubkey()), "action": "buy", "mint": str(Keypair().pubkey()), "amount": 0.1,
+            "denominatedInSol": "true", "slippage": 20, "priorityFee": 0.0001, "pool": "pump"})
+        tx = VersionedTransaction(VersionedTransaction.from_bytes(response.content).message, [keypair])
+        return SendVersionedTransaction(tx, config).to_json()
+
+    def time_to_accept(endpoints, fanout):
+        times, rejected = [], 0
+        for _ in range(orders):
+            payload = signed_transaction()
+            start = time.perf_counter()
+            try:
+                accepted = "result" in endpoints.send_transaction(payload, fanout)
+            except Exception:
+                accepted = False
+            if accepted:
+                times.append(time.perf_counter() - start)
+            else:
+                rejected += 1  # the order would be retried after 3 seconds
+        return sorted(times), rejected
+
+    print(f"{orders} orders, RPC endpoints: " + ", ".join(f"{latency} ({error_rate:.0%} errors)"
+                                                             for latency, error_rate in zip(latencies, error_rates)))
+    runs = [("1st endpoint only", urls[:1], 0)] + [(f"fastest {fanout}", urls, fanout)
+                                                   for fanout in range(1, len(urls))] + [("all", urls, 0)]
+    for name, run_urls, fanout in runs:
+        endpoints = RpcEndpoints(run_urls)
+        times, rejected = time_to_accept(endpoints, fanout)
+        median = times[len(times) // 2] * 1000 if times else float("nan")
+        p90 = times[int(len(times) * 0.9)] * 1000 if times else float("nan")
+        print(f"{name:>18}: time to accept median {median:6.1f} ms, p90 {p90:6.1f} ms, {rejected} not accepted")
+        if name == "all":
+            for line in endpoints.summary():
+                print(f"{'':>20}{line}")
+
+def bench_prefetch(orders: int, trade_latency: str, rpc_latency: str, lead: float):
+    from mock_solana import Endpoint, start_mock
+    trade_url, rpc_url, *_ = start_mock(trade=Endpoint("trade", trade_latency), rpc=Endpoint("rpc", rpc_latency))
+    os.environ.update(GEM_FINDER_TRADE_URL=trade_url, GEM_FINDER_RPC_URL=rpc_url)  # read by rpc_calls
+    from functools import partial
+    import http_pool
+    from prefetch import TransactionPrefetcher
+    from rpc_calls import build_transaction, complete_official_transaction
+    from solders.keypair import Keypair
+
+    http_pool.warm_up([trade_url, rpc_url], 2)
+    keypair = Keypair()
+    quiet = type("Loggers", (), {"log_general_message": staticmethod(lambda msg: None),
+                                 "log_transaction_message": staticmethod(lambda msg: None)})
+    buy_args = (keypair, 20, 0.0001, "true", "pump", 0.1)
+
+    def condition_to_send(prefetcher):
+        times = []
+        for _ in range(orders):
+            mint = str(Keypair().pubkey())
+            if prefetcher is not None:  # armed `lead` seconds before the enter condition holds
+                prefetcher.prefetch(mint, partial(build_transaction, "buy", mint, *buy_args))
+                time.sleep(lead)
+            start = time.perf_counter()
+            tx = prefetcher.take(mint) if prefetcher is not None else None
+            complete_official_transaction("buy", mint, *buy_args, "", quiet, 0, tx)
+            times.append(time.perf_counter() - start)
+        return sorted(times)
+
+    print(f"{orders} buys, trade-local latency {trade_latency}, RPC latency {rpc_latency}, armed {lead * 1000:.0f} ms "
+          f"before the enter condition holds")
+    prefetcher = TransactionPrefetcher()
+    for name, run_prefetcher in (("built on condition", None), ("prefetched", prefetcher)):
+        times = condition_to_send(run_prefetcher)
+        print(f"{name:>20}: condition to send median {times[len(times) // 2] * 1000:6.1f} ms, "
+              f"p90 {times[int(len(times) * 0.9)] * 1000:6.1f} ms")
+    print(prefetcher.summary())
+    prefetcher.close()
+
+def bench_builder(orders: int, trade_latency: str):
+    from mock_solana import Chain, Endpoint, start_mock
+    chain = Chain()
+    trade_url, rpc_url, *_ = start_mock(trade=Endpoint("trade", trade_latency), chain=chain)
+    os.environ.update(GEM_FINDER_TRADE_URL=trade_url, GEM_FINDER_RPC_URL=rpc_url)  # read by rpc_calls
+    import http_pool
+    from pump_transactions import BlockhashCache, LocalBuilder, LAMPORTS_PER_SOL, TOKEN_UNITS
+    from rpc_calls import build_transaction
+    from solders.keypair import Keypair
+    from solders.pubkey import Pubkey
+
+    http_pool.warm_up([trade_url, rpc_url], 2)
+    keypair = Keypair()
+
+    def send(tx):
+        payload = {"jsonrpc": "2.0", "id": 1, "method": "sendTransaction",
+                   "params": [base64.b64encode(bytes(tx)).decode(), {"encoding": "base64"}]}
+        return http_pool.post(rpc_url, json=payload).json()["result"]
+
+    def reserves(mint):  # in SOL and tokens, as in the feed
+        virtual_sol_reserves, virtual_token_reserves = chain.curve(Pubkey.from_string(mint))
+        return virtual_sol_reserves / LAMPORTS_PER_SOL, virtual_token_reserves / TOKEN_UNITS
+
+    blockhashes = BlockhashCache(rpc_url).start()
+    builder = LocalBuilder(keypair, blockhashes)
+    blockhashes.get()
+    remote_times, local_times, failed = [], [], 0
+    for _ in range(orders):
+        mint = str(Keypair().pubkey())
+        start = time.perf_counter()
+        build_transaction("buy", mint, keypair, 20, 0.0001, "true", "pump", 0.1)
+        remote_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        tx = builder.buy(mint, 0.1, 20, 0.0001, *reserves(mint))
+        local_times.append(time.perf_counter() - start)
+        send(tx)
+        builder.bought(mint, tx)
+        failed += chain.status(send(builder.sell(mint, 20, 0.0001, *reserves(mint))))["err"] is not None
+    blockhashes.close()
+    remote_times.sort()
+    local_times.sort()
+    print(f"{orders} buys, trade-local latency {trade_latency}")
+    print(f"{'trade-local':>20}: build and sign median {remote_times[len(remote_times) // 2] * 1000:8.3f} ms, "
+          f"p90 {remote_times[int(len(remote_times) * 0.9)] * 1000:8.3f} ms")
+    print(f"{'local builder':>20}: build and sign median {local_times[len(local_times) // 2] * 1000:8.3f} ms, "
+          f"p90 {local_times[int(len(local_times) * 0.9)] * 1000:8.3f} ms")
+    print(f"{orders - failed}/{orders} locally built sells of the locally built buys executed")
+
+
+def bench_confirm(orders: int, rpc_latency: str, timeout: float):
+    import http_pool
+    from confirmations import ConfirmationTracker, CONFIRMED, EXPIRED, FAILED
+    from mock_solana import Chain, Endpoint, start_rpc
+    from pump_transactions import INITIAL_VIRTUAL_SOL_RESERVES, INITIAL_VIRTUAL_TOKEN_RESERVES, trade_transaction
+    from solders.keypair import Keypair
+    from solders.transaction import VersionedTransaction
+
+    chain = Chain()
+    rpc_url, _ = start_rpc(chain, Endpoint("rpc", rpc_latency))
+    http_pool.warm_up([rpc_url], 4)
+    keypair = Keypair()
+
+    def send_orders():
+        """Signatures of the transactions sent, by expected outcome: 80% land, 10% fail, 10% are dropped."""
+        expected = {CONFIRMED: [], FAILED: [], EXPIRED: []}
+        for i in range(orders):
+            outcome = {8: FAILED, 9: EXPIRED}.get(i % 10, CONFIRMED)
+            if outcome == FAILED:  # a sell without the tokens
+                tx = trade_transaction(keypair.pubkey(), Keypair().pubkey(), "sell", 1000, False, 20, 0.0001,
+                                       chain.blockhash(), INITIAL_VIRTUAL_SOL_RESERVES, INITIAL_VIRTUAL_TOKEN_RESERVES)
+            else:
+                tx = trade_transaction(keypair.pubkey(), Keypair().pubkey(), "buy", 0.1, True, 20, 0.0001,
+                                       chain.blockhash(), INITIAL_VIRTUAL_SOL_RESERVES, INITIAL_VIRTUAL_TOKEN_RESERVES)
+            tx = VersionedTransaction(tx.message, [keypair])
+            if outcome != EXPIRED:
+                chain.receive(tx)  # as sendTransaction does
+            expected[outcome].append(str(tx.signatures[0]))
+        return expected
+
+    def run(trackers_for):
+        expected = send_orders()
+        start = time.perf_counter()
+        trackers, futures = dict(), dict()
+        for outcome, signatures in expected.items():
+            for signature in signatures:
+                tracker = trackers_for(signature, trackers)
+                futures[signature] = (outcome, tracker.track(signature))
+        wrong = sum(future.result()[0] != outcome for outcome, future in futures.values())
+        elapsed = time.perf_counter() - start
+        for tracker in trackers.values():
+            tracker.close()
+        return elapsed, sum(tracker.requests for tracker in trackers.values()), wrong
+
+    def per_order(signature, trackers):
+        trackers[signature] = ConfirmationTracker(rpc_url, timeout=timeout).start()
+        return trackers[signature]
+
+    def batched(signature, trackers):
+        if not trackers:
+            trackers[None] = ConfirmationTracker(rpc_url, timeout=timeout).start()
+        return trackers[None]
+
+    print(f"{orders} transactions tracked at once, RPC latency {rpc_latency}, 10% failing and 10% never landing "
+          f"(expired after {timeout:.0f} s)")
+    for name, trackers_for in (("polled per order", per_order), ("batched", batched)):
+        elapsed, requests, wrong = run(trackers_for)
+        print(f"{name:>18}: {requests:6,} getSignatureStatuses requests in {elapsed:5.1f} s "
+              f"({requests / elapsed:7.1f}/s), {wrong} wrong outcomes")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the gem-finder trading engine")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    trend_parser = subparsers.add_parser("trend", help="Trend regression cost per trade")
+    trend_parser.add_argument("--trades", help="Trades per token", default=10_000, type=int)
+
+    rate_parser = subparsers.add_parser("rate", help="Transaction rate meter memory and CPU under bursts")
+    rate_parser.add_argument("--tokens", help="Number of tokens", default=100, type=int)
+    rate_parser.add_argument("--tx_per_sec", help="Burst intensity", default=500, type=float)
+    rate_parser.add_argument("--seconds", help="Burst duration", default=10, type=float)
+
+    conditions_parser = subparsers.add_parser("conditions", help="Per-evaluation latency of strategy conditions")
+    conditions_parser.add_argument("--conditions", help="Number of conditions", default=10, type=int)
+    conditions_parser.add_argument("--subconditions", help="Sub-conditions per condition", default=5, type=int)
+    conditions_parser.add_argument("--evaluations", help="Number of evaluations", default=200_000, type=int)
+
+    cold_start_parser = subparsers.add_parser("cold-start", help="Start-up time of the headless vs. GUI entry point")
+    cold_start_parser.add_argument("--runs", help="Process launches per entry point", default=5, type=int)
+
+    record_parser = subparsers.add_parser("record", help="Session recorder throughput and hot-path cost")
+    record_parser.add_argument("--msgs_per_sec", help="Frames per second", default=5000, type=float)
+    record_parser.add_argument("--seconds", help="Recording duration", default=5, type=float)
+
+    replay_parser = subparsers.add_parser("replay", help="Replay of a synthetic session through the engine")
+    replay_parser.add_argument("--minutes", help="Minutes of synthetic market data", default=60, type=float)
+    replay_parser.add_argument("--speed", help="Also replay at this speed and compare the decisions", default=0,
+                               type=float)
+
+    vector_parser = subparsers.add_parser("vector", help="Vectorized vs. event-driven backtest of a synthetic session")
+    vector_parser.add_argument("--minutes", help="Minutes of synthetic market data", default=60, type=float)
+    vector_parser.add_argument("--runs", help="Vectorized backtest runs, the fastest is reported", default=5, type=int)
+
+    sweep_parser = subparsers.add_parser("sweep", help="Parameter sweep throughput for 1 worker up to all the cores")
+    sweep_parser.add_argument("--minutes", help="Minutes of synthetic market data", default=20, type=float)
+    sweep_parser.add_argument("--configurations", help="Random configurations per run", default=64, type=int)
+
+    feed_parser = subparsers.add_parser("feed", help="Engine throughput against the mock PumpPortal feed")
+    feed_parser.add_argument("--create_rate", help="Tokens created per second", default=20, type=float)
+    feed_parser.add_argument("--trades_per_token", help="Average trades per token", default=500, type=float)
+    feed_parser.add_argument("--batch", help="Tokens subscribed at once (the strategy's batch reset size)",
+                             default=200, type=int)
+    feed_parser.add_argument("--seconds", help="Duration of the run", default=20, type=float)
+
+    orders_parser = subparsers.add_parser("orders", help="Real-trade orders inline vs. through the order executor")
+    orders_parser.add_argument("--orders", help="Orders to send", default=20, type=int)
+    orders_parser.add_argument("--latency", help="Latency of the mocked endpoints (see mock_solana.py)",
+                               default="lognormal:100,0.4", type=str)
+    orders_parser.add_argument("--max_in_flight", help="Orders in flight at once", default=4, type=int)
+
+    http_parser = subparsers.add_parser("http", help="Per-order latency with a new connection per request vs. pooled")
+    http_parser.add_argument("--orders", help="Orders to send, one at a time", default=50, type=int)
+    http_parser.add_argument("--latency", help="Latency of the mocked endpoints (see mock_solana.py)",
+                             default="fixed:20", type=str)
+    http_parser.add_argument("--plain", help="Use plain HTTP, without the TLS handshakes", action="store_true")
+
+    hedge_parser = subparsers.add_parser("hedge", help="Time to accept a transaction with 1 vs. several RPC endpoints")
+    hedge_parser.add_argument("--orders", help="Transactions to send per run", default=50, type=int)
+    hedge_parser.add_argument("--latencies", help="Latency of each mocked RPC endpoint (see mock_solana.py)",
+                              default=["lognormal:150,0.8", "lognormal:80,0.5", "exp:100"], nargs="+", type=str)
+    hedge_parser.add_argument("--error_rates", help="Error rate of each mocked RPC endpoint",
+                              default=[0.1, 0.02, 0.02], nargs="+", type=float)
+
+    prefetch_parser = subparsers.add_parser("prefetch", help="Condition-to-send latency of a buy with and without "
+                                                             "prefetching its transaction")
+    prefetch_parser.add_argument("--orders", help="Buys to send per run", default=30, type=int)
+    prefetch_parser.add_argument("--trade_latency", help="Latency of the mocked trade-local (see mock_solana.py)",
+                                 default="lognormal:120,0.4", type=str)
+    prefetch_parser.add_argument("--rpc_latency", help="Latency of the mocked RPC", default="lognormal:80,0.5",
+                                 type=str)
+    prefetch_parser.add_argument("--lead", help="Seconds between the token getting armed and its enter condition "
+                                                "holding", default=0.3, type=float)
+
+    builder_parser = subparsers.add_parser("builder", help="Local vs. trade-local transaction building, checked "
+                                                           "byte for byte against the mock")
+    builder_parser.add_argument("--orders", help="Tokens traded per run", default=30, type=int)
+    builder_parser.add_argument("--trade_latency", help="Latency of the mocked trade-local (see mock_solana.py)",
+                                default="lognormal:120,0.4", type=str)
+
+    confirm_parser = subparsers.add_parser("confirm", help="RPC requests to confirm transactions polled one by one "
+                                                           "vs. in batches")
+    confirm_parser.add_argument("--orders", help="Transactions tracked at once", default=300, type=int)
+    confirm_parser.add_argument("--rpc_latency", help="Latency of the mocked RPC (see mock_solana.py)",
+                                default="lognormal:80,0.5", type=str)
+    confirm_parser.add_argument("--timeout", help="Seconds after which a transaction not seen is expired", default=5,
+                                type=float)
+
+    args = parser.parse_args()
+    if args.benchmark == "trend":
+        bench_trend(args.trades)
+    elif args.benchmark == "rate":
+        bench_rate(args.tokens, args.tx_per_sec, args.seconds)
+    elif args.benchmark == "conditions":
+        bench_conditions(args.conditions, args.subconditions, args.evaluations)
+    elif args.benchmark == "cold-start":
+        bench_cold_start(args.runs)
+    elif args.benchmark == "record":
+        bench_record(args.msgs_per_sec, args.seconds)
+    elif args.benchmark == "replay":
+        bench_replay(args.minutes, args.speed)
+    elif args.benchmark == "vector":
+        bench_vector(args.minutes, args.runs)
+    elif args.benchmark == "sweep":
+        bench_sweep(args.minutes, args.configurations)
+    elif args.benchmark == "feed":
+        bench_feed(args.create_rate, args.trades_per_token, args.batch, args.seconds)
+    elif args.benchmark == "orders":
+        bench_orders(args.orders, args.latency, args.max_in_flight)
+    elif args.benchmark == "http":
+        bench_http(args.orders, args.latency, not args.plain)
+    elif args.benchmark == "hedge":
+        bench_hedge(args.orders, args.latencies, args.error_rates)
+    elif args.benchmark == "prefetch":
+        bench_prefetch(args.orders, args.trade_latency, args.rpc_latency, args.lead)
+    elif args.benchmark == "builder":
+        bench_builder(args.orders, args.trade_latency)
+    elif args.benchmark == "confirm":
+        bench_confirm(args.orders, args.rpc_latency, args.timeout)
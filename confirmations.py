@@ -0,0 +1,110 @@
+import threading
+import time
+from concurrent.futures import Future
+import requests
+import http_pool
+
+CONFIRMATION_INTERVAL = 0.4  # seconds between two polls, about a slot
+CONFIRMATION_TIMEOUT = 90.0  # a transaction cannot land once its blockhash is 150 slots old, about 60 to 80 seconds
+MAX_SIGNATURES_PER_REQUEST = 256  # limit of getSignatureStatuses
+CONFIRMED = "confirmed"
+FAILED = "failed"
+EXPIRED = "expired"
+
+
+class ConfirmationTracker:
+    """
+    Follows the transactions sent until they land: every `interval` seconds, the signatures still pending are looked
+    up with one batched `getSignatureStatuses` (per 256 of them), on a background thread.
+
+    `track` returns a future resolved with `(outcome, error)`: `CONFIRMED` once the transaction is confirmed,
+    `FAILED` with its error if it landed but failed (e.g. beyond its slippage bound), `EXPIRED` if it was not seen
+    within `timeout` seconds, it can no longer land by then.
+    """
+
+    def __init__(self, rpc_url, interval: float = CONFIRMATION_INTERVAL, timeout: float = CONFIRMATION_TIMEOUT):
+        self.rpc_url = rpc_url  # an url or a callable returning one, e.g. the best ranked endpoint
+        self.interval = interval
+        self.timeout = timeout
+        self._pending = dict()  # signature -> (expiry, future)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.tracked = 0
+        self.confirmed = 0
+        self.failed = 0
+        self.expired = 0
+        self.requests = 0
+        self.request_errors = 0
+
+    def track(self, signature: str) -> Future:
+        """The future outcome of the transaction `signature`, the same one if it is already tracked."""
+        with self._lock:
+            if signature not in self._pending:
+                self._pending[signature] = (time.monotonic() + self.timeout, Future())
+                self.tracked += 1
+            return self._pending[signature][1]
+
+    def _statuses(self, signatures):
+        rpc_url = self.rpc_url() if callable(self.rpc_url) else self.rpc_url
+        response = http_pool.post(rpc_url, json={"jsonrpc": "2.0", "id": 1, "method": "getSignatureStatuses",
+                                                 "params": [signatures]})
+        return response.json()["result"]["value"]
+
+    def _resolve(self, signature, outcome, error=None):
+        with self._lock:
+            entry = self._pending.pop(signature, None)
+            if entry is None:  # closed meanwhile
+                return
+            setattr(self, outcome, getattr(self, outcome) + 1)
+        entry[1].set_result((outcome, error))
+
+    def poll(self):
+        """Look the pending signatures up once, resolve the ones that landed or expired."""
+        with self._lock:
+            pending = list(self._pending.items())
+        signatures = [signature for signature, _ in pending]
+        for start in range(0, len(signatures), MAX_SIGNATURES_PER_REQUEST):
+            batch = signatures[start:start + MAX_SIGNATURES_PER_REQUEST]
+            self.requests += 1
+            try:
+                statuses = self._statuses(batch)
+            except (requests.RequestException, ValueError, KeyError, TypeError):
+                self.request_errors += 1  # looked up again at the next poll
+                continue
+            for signature, status in zip(batch, statuses):
+                if status is None:
+                    continue
+                if status.get("err") is not None:
+                    self._resolve(signature, FAILED, status["err"])
+                elif status.get("confirmationStatus") in ("confirmed", "finalized"):
+                    self._resolve(signature, CONFIRMED)
+        now = time.monotonic()
+        for signature, (expiry, future) in pending:
+            if expiry <= now and not future.done():
+                self._resolve(signature, EXPIRED)
+
+    def _poll_forever(self):
+        while not self._stop.is_set():
+            if self._pending:
+                self.poll()
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._poll_forever, name="confirmations", daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self):
+        """Stop polling, the futures still pending are cancelled."""
+        self._stop.set()
+        with self._lock:
+            for _, future in self._pending.values():
+                future.cancel()
+            self._pending = dict()
+
+    def summary(self):
+        return (f"Tracked {self.tracked} transactions: {self.confirmed} confirmed, {self.failed} failed, "
+                f"{self.expired} expired, in {self.requests} getSignatureStatuses requests "
+                f"({self.request_errors} failed)")
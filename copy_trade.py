@@ -1,7 +1,7 @@
 import argparse
 import asyncio
 
-import requests
+import http_pool
 from solders.transaction import VersionedTransaction
 from solders.keypair import Keypair
 from solders.commitment_config import CommitmentLevel
@@ -10,6 +10,7 @@ from solders.rpc.config import RpcSendTransactionConfig
 import websockets
 import json
 from base import PumpTrade, keepalive_ping
+from rpc_calls import default_rpc_url, trade_url
 import time
 
 queue = asyncio.Queue()
@@ -40,6 +41,8 @@ async def processor(args, keypair):
 async def subscribe(args):
     uri = "wss://pumpportal.fun/api/data"
     keypair = Keypair.from_base58_string(args.private_key)
+    # the first copied trade should not wait for the handshakes
+    asyncio.get_running_loop().run_in_executor(None, http_pool.warm_up, [args.trade_url, args.rpc_url])
     async with websockets.connect(uri) as websocket:
         payload = {
             "method": "subscribeAccountTrade",
@@ -57,7 +60,7 @@ def complete_official_transaction(action: str, mint: str, args, denominated_in_s
     global test_wallet_holdings
     if amount is None:
         amount = args.amount
-    response = requests.post(url="https://pumpportal.fun/api/trade-local", data={
+    response = http_pool.post(url=args.trade_url, data={
         "publicKey": args.public_key,
         "action": action,  # "buy" or "sell"
         "mint": mint,  # contract address of the token you want to trade
@@ -69,8 +72,8 @@ def complete_official_transaction(action: str, mint: str, args, denominated_in_s
     })
     tx = VersionedTransaction(VersionedTransaction.from_bytes(response.content).message, [private_key])
     config = RpcSendTransactionConfig(preflight_commitment=CommitmentLevel.Confirmed)
-    response = requests.post(
-        url="https://api.mainnet-beta.solana.com/", # https://mainnet.helius-rpc.com/?api-key=<your-api-key>  // better with helius
+    response = http_pool.post(
+        url=args.rpc_url, # https://mainnet.helius-rpc.com/?api-key=<your-api-key>  // better with helius
         headers={"Content-Type": "application/json"},
         data=SendVersionedTransaction(tx, config).to_json()
     )
@@ -112,4 +115,6 @@ if __name__ == "__main__":
     parser.add_argument("--amount", help="Amount you wish to buy per trade (in SOL)", required=True, type=float)
     parser.add_argument("--slippage", help="Slippage in %, e.g. 20 (means 20%)", default=20, type=float)
     parser.add_argument("--priority_fee", help="Priority fee in SOL", default=0, type=float)
+    parser.add_argument("--rpc_url", help="RPC endpoint sending the transactions", default=default_rpc_url(), type=str)
+    parser.add_argument("--trade_url", help="Endpoint building the transactions", default=trade_url(), type=str)
     asyncio.run(subscribe(parser.parse_args()))
@@ -0,0 +1,595 @@
+import json
+import os
+import asyncio
+from datetime import datetime
+from functools import partial
+import websockets
+import base
+from base import TokenStats, keepalive_ping
+from helper import simulate_trade_finalization_time, CompiledConditions, UpdatePlan
+import http_pool
+from confirmations import ConfirmationTracker
+from order_executor import OrderExecutor, loop_loggers
+from prefetch import TransactionPrefetcher
+from pump_transactions import BlockhashCache, LocalBuilder
+from rpc_calls import build_transaction, complete_official_transaction, rpc_urls, trade_url
+from rpc_endpoints import rpc_endpoints
+
+MAX_LINES = 1000
+TRANSACTION_FEE = 0.000005  # sol
+PUMPPORTAL_URI = "wss://pumpportal.fun/api/data"
+WS_URI_VARIABLE = "GEM_FINDER_WS_URI"  # points the engine at another feed, e.g. mock_pumpportal.py
+
+first_response = True
+queue = asyncio.Queue()
+devs = dict()
+tokens = dict()
+subbed_tokens_count = 0
+records_of_current_subbed_tokens = list()
+strategy_transcript = dict()
+trade_ledger = list()  # one entry per closed trade, see `exit_trade`
+order_executor = None  # runs the real trades off the event loop, see `submit_order`
+prefetcher = None  # buy transactions of the tokens about to be bought, see `prefetch_buy`
+local_builder = None  # builds the bonding-curve trades without the trade-local API, see `submit_order`
+confirmation_tracker = None  # a real trade is only entered or exited once its transaction is confirmed
+
+# statistics
+time_in_trade_sum = 0
+tokens_created_since_start = 0
+tokens_evaluated_since_start = 0
+total_trades_record = 0
+pnl_sum = 0
+profitable_trades = 0
+
+
+def reset_globals():
+    global first_response
+    global queue
+    global devs
+    global tokens
+    global subbed_tokens_count
+    global records_of_current_subbed_tokens
+    global strategy_transcript
+    global trade_ledger
+    global order_executor
+    global prefetcher
+    global local_builder
+    global confirmation_tracker
+    global time_in_trade_sum
+    global tokens_created_since_start
+    global tokens_evaluated_since_start
+    global total_trades_record
+    global pnl_sum
+    global profitable_trades
+
+    first_response = True
+    queue = asyncio.Queue()
+    devs = dict()
+    tokens = dict()
+    subbed_tokens_count = 0
+    records_of_current_subbed_tokens = list()
+    strategy_transcript = dict()
+    trade_ledger = list()
+    order_executor = None
+    prefetcher = None
+    local_builder = None
+    confirmation_tracker = None
+    time_in_trade_sum = 0
+    tokens_created_since_start = 0
+    tokens_evaluated_since_start = 0
+    total_trades_record = 0
+    pnl_sum = 0
+    profitable_trades = 0
+
+
+# === Async logic ===
+
+async def receiver(ws, recorder=None):
+    global first_response
+    while True:
+        response = await ws.recv()
+        if recorder is not None:
+            recorder.record(response)
+        data = json.loads(response)
+        # sometimes the creation call comes before the token trade successful subscription message, therefore this check
+        if first_response and "txType" not in data.keys():
+            print(data)
+            print("\n")
+            first_response = False
+        else:
+            await queue.put(data)
+
+
+async def sub_token_trade(ws, token):
+    global first_response
+    first_response = True
+    payload = {
+        "method": "subscribeTokenTrade",
+        "keys": [token]
+    }
+    print(token)
+
+    await ws.send(json.dumps(payload))
+
+
+def enter_trade(token: TokenStats, condition_no: int, buy_amount: float, sol_balance_widget, loggers, fees: float,
+                use_imported_wallet: bool = False, cfg=None, retries=None):
+
+    if use_imported_wallet:
+        if retries is None:  # not sent through `submit_order` yet
+            retries = complete_official_transaction("buy", token.mint, cfg.keypair, cfg.max_slippage,
+                                                    cfg.priority_fee, "true", token.pool, buy_amount, cfg.rpc_url,
+                                                    loggers, cfg.rpc_fanout, confirmations=confirmation_tracker)
+        sol_spent = buy_amount + TRANSACTION_FEE + cfg.priority_fee + (retries * (cfg.priority_fee + TRANSACTION_FEE))
+    else:
+        sol_spent = buy_amount + TRANSACTION_FEE + fees
+    sol_balance = sol_balance_widget.value()
+    token.trade_entered = True
+    token.entering_time = base.clock.time()
+    token.last_trade_time = base.clock.time()
+    token.entering_mcap = token.current_mcap
+    token.entering_condition = condition_no
+    token.entering_sol = sol_spent
+    token.entering_price = token.current_mcap / 1000000000
+    token.token_amount = buy_amount / token.entering_price
+    sol_balance -= sol_spent
+    sol_balance_widget.setValue(sol_balance)
+
+    timestamp = datetime.fromtimestamp(base.clock.time()).strftime('%Y-%m-%d %H:%M:%S')
+    action = f"<span style='color: green;'>BUY</span>"
+    amount = f"Amount: {token.token_amount:.2f}"
+    token_mint = f"Token: {token.mint}"
+    mcap = f"Mcap: {round(token.current_mcap, 2)}"
+    sol_value = f"SOL value: {round(sol_spent, 6)}"
+    new_balance = f"New balance: {round(sol_balance, 2)}"
+    condition = f"Enter condition: {condition_no}"
+    msg = f"{timestamp:<19} | {action:<10} | {amount:<25} | {token_mint:<100} | {mcap:<25} | {sol_value:<21} | {new_balance:<25} | {condition:<20}"
+
+    loggers.log_transaction_message(msg)
+    return token
+
+
+def exit_trade(token: TokenStats, condition_no: int, buy_amount: float, sol_balance_widget, loggers, fees: float = 0,
+               use_imported_wallet: bool = False, cfg=None, retries=None):
+    global total_trades_record
+    global time_in_trade_sum
+    global pnl_sum
+    global profitable_trades
+
+    if use_imported_wallet:
+        if retries is None:  # not sent through `submit_order` yet
+            retries = complete_official_transaction("sell", token.mint, cfg.keypair, cfg.max_slippage,
+                                                    cfg.priority_fee, "false", token.pool, "100%", cfg.rpc_url,
+                                                    loggers, cfg.rpc_fanout, confirmations=confirmation_tracker)
+        current_price = token.current_mcap / 1000000000
+        profit = (token.token_amount * current_price) - (TRANSACTION_FEE + cfg.priority_fee +
+                                                         (retries * (cfg.priority_fee + TRANSACTION_FEE)))
+    else:
+        current_price = (token.current_mcap + buy_amount) / 1000000000  # adding 'buy_amount' just to simulate our trade
+        profit = (token.token_amount * current_price) - (TRANSACTION_FEE + fees)
+
+    sol_balance = sol_balance_widget.value()
+    sol_balance += profit
+    sol_balance_widget.setValue(sol_balance)
+    pnl = ((token.current_mcap - token.entering_mcap) / token.entering_mcap) * 100
+    token.exhausted = True
+    token.trade_entered = False
+
+    exit_time = base.clock.time()
+    total_trades_record += 1
+    time_in_trade_sum += exit_time - token.entering_time
+    pnl_sum += pnl
+    if pnl > 0:
+        profitable_trades += 1
+    trade_ledger.append({"mint": token.mint,
+                         "enter_condition": token.entering_condition, "exit_condition": condition_no,
+                         "enter_time": token.entering_time, "exit_time": exit_time,
+                         "enter_mcap": token.entering_mcap, "exit_mcap": token.current_mcap,
+                         "sol_spent": token.entering_sol, "sol_received": profit, "pnl": pnl,
+                         "sol_balance": sol_balance})
+
+    timestamp = datetime.fromtimestamp(base.clock.time()).strftime('%Y-%m-%d %H:%M:%S')
+    action = "<span style='color: red;'>SELL</span>"
+    amount = f"Amount: {token.token_amount:.2f}"
+    token_mint = f"Token: {token.mint}"
+    mcap = f"Mcap: {round(token.current_mcap, 2)}"
+    sol_value = f"SOL value: {round(profit, 6)}"
+    new_balance = f"New balance: {round(sol_balance, 2)}"
+    condition = f"Exit condition: {condition_no}"
+    pnl_color = "#50C878" if pnl >= 0 else "#ff8080"
+    msg = f"{timestamp:<19} | {action:<10} | {amount:<30} | {token_mint:<100} | {mcap:<25} | {sol_value:<21} | {new_balance:<25} | {condition:<20} | PnL: <span style='color: {pnl_color};'>{pnl:+.2f}%</span>"
+
+    loggers.log_transaction_message(msg)
+    return token
+
+
+FULL_UPDATE_PLAN = UpdatePlan()
+
+
+def update_values(token: TokenStats, data, plan: UpdatePlan = FULL_UPDATE_PLAN):
+    now = base.clock.time()
+    token.counter.record(now)
+    token.current_mcap = data["marketCapSol"]
+    if plan.trend:
+        token.trend.add(now, token.current_mcap)
+        if len(token.trend) > 2:
+            # Measure the trend slope (units per second) and the trend strength
+            token.slope = token.trend.slope
+            token.trend_strength = token.trend.r_squared
+    if plan.slope_window:
+        token.slope_window.add(now, token.current_mcap)
+    if data["txType"] == "buy":
+        token.buys += 1
+        token.total_buy_volume += data["solAmount"]
+        token.avg_buy_amount = token.total_buy_volume / token.buys
+    elif data["txType"] == "sell":
+        token.sells += 1
+    else:
+        print(data)
+    if plan.trade_window and data["txType"] in ("buy", "sell"):
+        token.trade_window.add(now, data["txType"] == "buy", data["solAmount"])
+    if data["traderPublicKey"] == devs[token.mint] and data["txType"] == "sell":
+        token.dev_sold = True
+    try:
+        token.pool = data["pool"]
+    except KeyError:
+        pass
+    if "vSolInBondingCurve" in data:
+        token.virtual_sol_reserves = data["vSolInBondingCurve"]
+        token.virtual_token_reserves = data["vTokensInBondingCurve"]
+    token.total_trades = token.buys + token.sells
+    token.buys_sells_ratio = token.buys / token.sells if token.sells != 0 else 1
+    token.last_trade_time = base.clock.time()
+
+    return token
+
+
+def submit_order(operation, token: TokenStats, cond_no, cfg, loggers):
+    """
+    Send a real buy or sell through `order_executor` and enter or exit the trade once the transaction went through.
+
+    The HTTP calls run on a worker thread while the event loop keeps processing the market data, the trade is
+    entered or exited back on the loop, like `simulate_trade_finalization` does for paper trades. The caller sets
+    `token.executing_order`, it is cleared when the order completes or fails. With a `confirmation_tracker`, the
+    order completes once its transaction is confirmed, so the trade is only entered or exited if it landed.
+    """
+    mint = token.mint
+    # a bonding-curve trade can be built locally at the price of the latest trade seen
+    builder = local_builder if token.pool == "pump" and token.virtual_token_reserves else None
+    reserves = (token.virtual_sol_reserves, token.virtual_token_reserves)
+    if operation == "buy":
+        buy = partial(complete_official_transaction, "buy", mint, cfg.keypair, cfg.max_slippage, cfg.priority_fee,
+                      "true", token.pool, cfg.buy_size, cfg.rpc_url, loop_loggers(loggers), cfg.rpc_fanout,
+                      confirmations=confirmation_tracker)
+        buy_prefetcher = prefetcher
+
+        def order():
+            if builder is not None:
+                tx = builder.buy(mint, cfg.buy_size, cfg.max_slippage, cfg.priority_fee, *reserves)
+                retries = buy(tx=tx)  # raises if the buy failed, nothing is recorded then
+                if not retries:  # otherwise bought through the trade-local API, the exact amount is unknown
+                    builder.bought(mint, tx)
+                return retries
+            return buy(tx=buy_prefetcher.take(mint) if buy_prefetcher is not None else None)
+    else:
+        sell = partial(complete_official_transaction, "sell", mint, cfg.keypair, cfg.max_slippage, cfg.priority_fee,
+                       "false", token.pool, "100%", cfg.rpc_url, loop_loggers(loggers), cfg.rpc_fanout,
+                       confirmations=confirmation_tracker)
+
+        def order():
+            # the tokens not bought through the local builder are sold by the trade-local API
+            retries = sell(tx=builder.sell(mint, cfg.max_slippage, cfg.priority_fee, *reserves)
+                           if builder is not None else None)
+            if builder is not None:  # sold, a failed sell raises and keeps the holdings for the next one
+                builder.forget(mint)
+            return retries
+
+    def on_done(retries):
+        if operation == "buy":
+            enter_trade(token, cond_no, cfg.buy_size, cfg.sol_balance_widget, loggers, 0, True, cfg, retries)
+            strategy_transcript[mint] = (cond_no, 0)  # store enter and exit condition for backtracking
+        else:
+            exit_trade(token, cond_no, cfg.buy_size, cfg.sol_balance_widget, loggers, 0, True, cfg, retries)
+            strategy_transcript[mint] = (strategy_transcript[mint][0], cond_no)
+        token.executing_order = False
+
+    def on_error(e):
+        loggers.log_general_message(f"Error during trade {'entry' if operation == 'buy' else 'exit'} "
+                                    f"for token {mint}: {e}")
+        token.executing_order = False
+
+    if not order_executor.submit(mint, order, on_done, on_error):
+        loggers.log_general_message(f"An order for token {mint} is already in flight, skipping the {operation}.")
+        token.executing_order = False
+
+
+def prefetch_buy(token: TokenStats, cfg):
+    """Build and sign the buy of an armed token ahead of time, `submit_order` sends it if the buy comes soon enough."""
+    prefetcher.prefetch(token.mint, partial(build_transaction, "buy", token.mint, cfg.keypair, cfg.max_slippage,
+                                            cfg.priority_fee, "true", token.pool, cfg.buy_size))
+
+
+async def simulate_trade_finalization(operation, mcap, mint, cond_no, cfg, loggers):
+    global tokens
+    global strategy_transcript
+
+    delay, fees = simulate_trade_finalization_time(priority_fee=cfg.priority_fee)
+
+    await base.clock.sleep(delay)  # simulate transaction execution time (network latency, inclusion time, retries, etc.)
+
+    current_mcap = tokens[mint].current_mcap
+    token = tokens[mint]
+    price_movement = ((current_mcap - mcap) / current_mcap) * 100
+
+    if operation == "buy":
+        if price_movement < cfg.max_slippage:
+            tokens[mint] = enter_trade(token, cond_no, cfg.buy_size, cfg.sol_balance_widget, loggers, fees)
+            strategy_transcript[mint] = (cond_no, 0)  # store enter and exit condition for backtracking
+            token.trade_entered = True
+            token.executing_order = False
+        else:
+            token.executing_order = False
+    elif operation == "sell":
+        if -1 * price_movement < cfg.max_slippage:
+            tokens[mint] = exit_trade(tokens[mint], cond_no, cfg.buy_size, cfg.sol_balance_widget, loggers, fees)
+            strategy_transcript[mint] = (strategy_transcript[mint][0], cond_no)
+        else:
+            token.executing_order = False
+
+
+async def processor(websocket, enter_conditions: CompiledConditions, exit_conditions: CompiledConditions, cfg,
+                    use_imported_wallet, loggers):
+    global devs
+    global first_response
+    global subbed_tokens_count
+    global tokens
+    global records_of_current_subbed_tokens
+    global strategy_transcript
+    global tokens_created_since_start
+    global tokens_evaluated_since_start
+
+    plan = UpdatePlan.from_conditions(enter_conditions, exit_conditions)
+    while True:
+        data = await queue.get()
+        try:
+            try_to_access_data = data["txType"]
+        except KeyError:
+            continue
+        if data["txType"] == "create":  # on token creation search for tokens to subscribe to
+            tokens_created_since_start += 1
+            try:
+                mint = data['mint']
+            except KeyError as e:
+                print(f"KeyError with: {data}")
+                print(e)
+                exit(1)
+            if subbed_tokens_count < cfg.batch_reset_size:
+                subbed_tokens_count += 1
+                tokens_evaluated_since_start += 1
+                devs[data["mint"]] = data["traderPublicKey"]
+                records_of_current_subbed_tokens.append(mint)
+                await sub_token_trade(websocket, mint)
+
+        else:
+            mint = data["mint"]
+            if mint not in tokens:
+                tokens[mint] = TokenStats()
+                tokens[mint].mint = mint
+                tokens[mint] = update_values(tokens[mint], data, plan)
+            elif not tokens[mint].exhausted:
+                tokens[mint] = update_values(tokens[mint], data, plan)
+                token = tokens[mint]
+                if not token.trade_entered:
+                    # ===== TRADE ENTER =====
+                    any_cond_satisfied, cond_no = enter_conditions.evaluate(token)
+                    if any_cond_satisfied and not token.executing_order:
+                        if cfg.sol_balance_widget.value() > cfg.buy_size:
+                            token.executing_order = True
+                            if not use_imported_wallet:
+                                asyncio.create_task(simulate_trade_finalization("buy", token.current_mcap, mint, cond_no, cfg, loggers))
+                            else:
+                                submit_order("buy", token, cond_no, cfg, loggers)
+                        else:
+                            loggers.log_general_message(f"Insufficient SOL balance to enter trade for token {mint}."
+                                                        f" Needed: {cfg.buy_size}, "
+                                                        f"Available: {cfg.sol_balance_widget.value()}")
+                    elif prefetcher is not None and not token.executing_order and not prefetcher.armed(mint):
+                        # armed: an enter condition nearly holds, the buy transaction is prepared in case it does
+                        if enter_conditions.near_miss(token, cfg.arm_proximity) is not None:
+                            prefetch_buy(token, cfg)
+
+                else:
+                    # ===== TRADE EXIT =====
+                    mcap = token.current_mcap
+                    entering_mcap = token.entering_mcap
+                    time_elapsed = base.clock.time() - token.entering_time
+                    tx_sec = token.tx_sec
+                    pnl = ((mcap - entering_mcap) / entering_mcap) * 100
+                    pnl_str = f"{pnl:+.2f}%"
+
+                    any_cond_satisfied, cond_no = exit_conditions.evaluate(token, pnl=pnl, time_elapsed=time_elapsed)
+                    if any_cond_satisfied and not token.executing_order:
+                        token.executing_order = True
+                        if not use_imported_wallet:
+                            asyncio.create_task(simulate_trade_finalization("sell", mcap, mint, cond_no, cfg, loggers))
+                        else:
+                            submit_order("sell", token, cond_no, cfg, loggers)
+                        continue
+
+                    loggers.log_general_message(f"token: {mint} | tx/sec: {tx_sec:g} | buys/sells: {token.buys} / {token.sells} | "
+                                                f"mcap: {round(mcap, 2)} | avg_buy: {round(token.avg_buy_amount, 2)} | "
+                                                f"slope: {round(token.slope, 2)} | strength: {round(token.trend_strength, 2)} | "
+                                                f"PnL: {pnl_str} | time_elapsed: {round(time_elapsed, 2)} | dev_sold: {token.dev_sold}")
+
+
+async def discard_current_batch(websocket, batch_reset_size, loggers):
+    global subbed_tokens_count
+    global first_response
+    global tokens
+    global records_of_current_subbed_tokens
+    try:
+        while True:
+            if subbed_tokens_count >= batch_reset_size:
+                trade_active = False
+                mints = list()
+                for mint, token in tokens.items():
+                    mints.append(mint)
+                    # a buy still in flight needs the token too (a finished sell leaves executing_order set)
+                    if token.trade_entered or (token.executing_order and not token.exhausted):
+                        trade_active = True
+                if not trade_active:
+                    payload = {
+                        "method": "unsubscribeTokenTrade",
+                        "keys": mints
+                    }
+                    first_response = True
+                    await websocket.send(json.dumps(payload))
+                    tokens = dict()
+                    subbed_tokens_count = 0
+                    loggers.log_general_message("* Discarded old batch, looking for new tokens... *")
+                    records_of_current_subbed_tokens = list(set(records_of_current_subbed_tokens) - set(mints))
+            await base.clock.sleep(30)
+    except asyncio.CancelledError:
+        print("Discarding token batches task canceled.")
+
+
+async def sell_stale_tokens(threshold, buy_amount, sol_balance_widget, use_imported_wallet, cfg, loggers):
+    global tokens
+    try:
+        while True:
+            for mint, token in tokens.items():
+                if token.trade_entered:
+                    inactive = base.clock.time() - token.last_trade_time >= threshold and token.tx_sec == 0
+                    if inactive and not token.executing_order:
+                        if use_imported_wallet:
+                            token.executing_order = True
+                            submit_order("sell", token, 101, cfg, loggers)
+                            continue
+                        else:
+                            # no delay is added to this trade because this token is supposed to have no activity
+                            # by the time we want to sell and there is a very low chance that a transaction will
+                            # happen during the time our exit trade finalizes.
+                            tokens[mint] = exit_trade(token, 101, buy_amount, sol_balance_widget, loggers)
+                        strategy_transcript[mint] = (strategy_transcript[mint][0], 101)
+            await base.clock.sleep(1)
+    except asyncio.CancelledError:
+        print("Canceled stale token selling task.")
+
+
+def strategy_statistics():
+    """Summary of the current run, as shown in the GUI report."""
+    return {
+        "tokens_created": tokens_created_since_start,
+        "tokens_evaluated": tokens_evaluated_since_start,
+        "trades": total_trades_record,
+        "profitable_trades": profitable_trades,
+        "avg_pnl": pnl_sum / total_trades_record if total_trades_record else 0,
+        "avg_time_in_trade": time_in_trade_sum / total_trades_record if total_trades_record else 0,
+    }
+
+
+def exit_trades(cfg, use_imported_wallet, loggers):
+    """Sell every open trade. The real sells are queued on `order_executor`, the caller waits for them to drain."""
+    global tokens
+    for mint, token in tokens.items():
+        if token.trade_entered and not token.executing_order:
+            if use_imported_wallet:
+                token.executing_order = True
+                submit_order("sell", token, 100, cfg, loggers)
+            else:
+                tokens[mint] = exit_trade(token, 100, cfg.buy_size, cfg.sol_balance_widget, loggers)
+                strategy_transcript[mint] = (strategy_transcript[mint][0], 100)
+
+
+def feed_uri():
+    """The websocket URI of the data feed, PumpPortal's unless overridden by the GEM_FINDER_WS_URI variable."""
+    return os.environ.get(WS_URI_VARIABLE) or PUMPPORTAL_URI
+
+
+async def subscribe(enter_conditions: CompiledConditions, exit_conditions: CompiledConditions, loggers, cfg,
+                    use_imported_wallet: bool = False, recorder=None, connect=websockets.connect, uri=None):
+    """
+    Run the engine on the PumpPortal data feed until cancelled.
+
+    `connect(uri)` opens the feed, it can be swapped for a replay source (see replay.py) to run recorded sessions.
+    `uri` defaults to `feed_uri()`.
+    """
+    global records_of_current_subbed_tokens
+    global strategy_transcript
+    global order_executor
+    global prefetcher
+    global local_builder
+    global confirmation_tracker
+    uri = uri or feed_uri()
+    probed_endpoints = None
+    if use_imported_wallet:
+        order_executor = OrderExecutor(cfg.max_orders_in_flight)
+        if cfg.local_builder:
+            blockhashes = BlockhashCache(lambda: rpc_endpoints(rpc_urls(cfg.rpc_url)).best()).start()
+            local_builder = LocalBuilder(cfg.keypair, blockhashes)
+        elif cfg.prefetch:  # a local build is faster than taking a prefetched transaction
+            prefetcher = TransactionPrefetcher()
+        if cfg.confirm_trades:
+            confirmation_tracker = ConfirmationTracker(lambda: rpc_endpoints(rpc_urls(cfg.rpc_url)).best()).start()
+        # connect to the trade and RPC endpoints in the background, the first order should not wait for the handshakes
+        asyncio.get_running_loop().run_in_executor(None, http_pool.warm_up,
+                                                   [trade_url(), *rpc_urls(cfg.rpc_url)],
+                                                   cfg.max_orders_in_flight)
+        # rank the RPC endpoints while trading, unless the GUI already does
+        endpoints = rpc_endpoints(rpc_urls(cfg.rpc_url))
+        if endpoints.start_probing():
+            probed_endpoints = endpoints
+    async with connect(uri) as websocket:
+        payload = {"method": "subscribeNewToken"}
+        await websocket.send(json.dumps(payload))
+        tasks = [
+            asyncio.ensure_future(receiver(websocket, recorder)),
+            asyncio.ensure_future(processor(websocket, enter_conditions, exit_conditions, cfg, use_imported_wallet,
+                                            loggers)),
+            asyncio.ensure_future(keepalive_ping(websocket)),
+            asyncio.ensure_future(discard_current_batch(websocket, cfg.batch_reset_size, loggers)),
+            asyncio.ensure_future(sell_stale_tokens(cfg.inactivity_reset_time, cfg.buy_size, cfg.sol_balance_widget,
+                                                    use_imported_wallet, cfg, loggers))
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        # except asyncio.CancelledError:
+        except Exception as e:
+            print(f"Error: {e}")
+            raise
+        finally:
+            for task in tasks:  # a failing task does not stop the others on its own
+                task.cancel()
+            if order_executor is not None:
+                await order_executor.drain()  # the buys still in flight are sold below
+            exit_trades(cfg, use_imported_wallet, loggers)
+            if order_executor is not None:
+                await order_executor.drain()
+                order_executor.close()
+                order_executor = None
+            if probed_endpoints is not None:
+                probed_endpoints.stop_probing()
+            if prefetcher is not None:
+                prefetcher.close()
+                loggers.log_general_message(prefetcher.summary())
+                prefetcher = None
+            if local_builder is not None:
+                local_builder.blockhashes.close()
+                loggers.log_general_message(f"Built {local_builder.built} transactions locally")
+                local_builder = None
+            if confirmation_tracker is not None:
+                confirmation_tracker.close()
+                loggers.log_general_message(confirmation_tracker.summary())
+                confirmation_tracker = None
+            payload = {
+                "method": "unsubscribeNewToken",
+            }
+            await websocket.send(json.dumps(payload))
+            print("Unsubscribed from new token event")
+            await base.clock.sleep(1)
+            payload = {
+                "method": "unsubscribeTokenTrade",
+                "keys": records_of_current_subbed_tokens
+            }
+            await websocket.send(json.dumps(payload))
+            print("Unsubscribed from tokens: {}".format(records_of_current_subbed_tokens))
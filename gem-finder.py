@@ -3,439 +3,32 @@ import json
 import asyncio
 from collections import Counter
 from copy import copy
-from datetime import datetime
-import websockets
+from functools import partial
 import time
 from types import SimpleNamespace
 import requests
-from PyQt6.QtCore import Qt, QSize, QSettings, QUrl
+from PyQt6.QtCore import Qt, QSize, QSettings, QTimer, QUrl
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QPushButton, QLabel, QHBoxLayout, QToolBar, QMainWindow, QTextEdit,
     QDialog, QDoubleSpinBox, QSpinBox, QComboBox, QScrollArea, QSizePolicy, QFormLayout, QFrame,
-    QStackedWidget, QTextBrowser, QFileDialog, QMessageBox, QGroupBox, QCheckBox
+    QStackedWidget, QTextBrowser, QFileDialog, QMessageBox, QGroupBox, QCheckBox, QTableWidget, QTableWidgetItem,
+    QHeaderView
 )
 from qasync import QEventLoop, asyncSlot
 from PyQt6.QtGui import QAction, QIcon, QActionGroup
 import markdown
 from PyQt6.QtCharts import QChart, QChartView, QPieSeries
-from scipy.stats import linregress
-from base import TokenStats, keepalive_ping
 from PyQt6.QtWebEngineWidgets import QWebEngineView
-from helper import resource_path, format_duration, simulate_trade_finalization_time, evaluate_conditions
+from helper import resource_path, format_duration, CompiledConditions
 from keypair_import import KeypairImportWidget
-from rpc_calls import get_balance, complete_official_transaction
-
-MAX_LINES = 1000
-TRANSACTION_FEE = 0.000005  # sol
-
-first_response = True
-queue = asyncio.Queue()
-devs = dict()
-tokens = dict()
-subbed_tokens_count = 0
-records_of_current_subbed_tokens = list()
-strategy_transcript = dict()
-
-# statistics
-time_in_trade_sum = 0
-tokens_created_since_start = 0
-tokens_evaluated_since_start = 0
-total_trades_record = 0
-pnl_sum = 0
-profitable_trades = 0
-
-
-def reset_globals():
-    global first_response
-    global devs
-    global tokens
-    global subbed_tokens_count
-    global records_of_current_subbed_tokens
-    global strategy_transcript
-    global time_in_trade_sum
-    global tokens_created_since_start
-    global tokens_evaluated_since_start
-    global total_trades_record
-    global pnl_sum
-    global profitable_trades
-
-    first_response = True
-    devs = dict()
-    tokens = dict()
-    subbed_tokens_count = 0
-    records_of_current_subbed_tokens = list()
-    strategy_transcript = dict()
-    time_in_trade_sum = 0
-    tokens_created_since_start = 0
-    tokens_evaluated_since_start = 0
-    total_trades_record = 0
-    pnl_sum = 0
-    profitable_trades = 0
-
-
-# === Async logic ===
-
-async def receiver(ws):
-    global first_response
-    while True:
-        response = await ws.recv()
-        data = json.loads(response)
-        # sometimes the creation call comes before the token trade successful subscription message, therefore this check
-        if first_response and "txType" not in data.keys():
-            print(data)
-            print("\n")
-            first_response = False
-        else:
-            await queue.put(data)
-
-
-async def sub_token_trade(ws, token):
-    global first_response
-    first_response = True
-    payload = {
-        "method": "subscribeTokenTrade",
-        "keys": [token]
-    }
-    print(token)
-
-    await ws.send(json.dumps(payload))
-
-
-def enter_trade(token: TokenStats, condition_no: int, buy_amount: float, sol_balance_widget, loggers, fees: float,
-                use_imported_wallet: bool = False, cfg=None):
-
-    if use_imported_wallet:
-        retries = complete_official_transaction("buy", token.mint, cfg.keypair, cfg.max_slippage, cfg.priority_fee,
-                                                "true", token.pool, buy_amount, cfg.rpc_url, loggers)
-        sol_spent = buy_amount + TRANSACTION_FEE + cfg.priority_fee + (retries * (cfg.priority_fee + TRANSACTION_FEE))
-    else:
-        sol_spent = buy_amount + TRANSACTION_FEE + fees
-    sol_balance = sol_balance_widget.value()
-    token.trade_entered = True
-    token.entering_time = time.time()
-    token.last_trade_time = time.time()
-    token.entering_mcap = token.current_mcap
-    token.entering_price = token.current_mcap / 1000000000
-    token.token_amount = buy_amount / token.entering_price
-    sol_balance -= sol_spent
-    sol_balance_widget.setValue(sol_balance)
-
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    action = f"<span style='color: green;'>BUY</span>"
-    amount = f"Amount: {token.token_amount:.2f}"
-    token_mint = f"Token: {token.mint}"
-    mcap = f"Mcap: {round(token.current_mcap, 2)}"
-    sol_value = f"SOL value: {round(sol_spent, 6)}"
-    new_balance = f"New balance: {round(sol_balance, 2)}"
-    condition = f"Enter condition: {condition_no}"
-    msg = f"{timestamp:<19} | {action:<10} | {amount:<25} | {token_mint:<100} | {mcap:<25} | {sol_value:<21} | {new_balance:<25} | {condition:<20}"
-
-    loggers.log_transaction_message(msg)
-    return token
-
-
-def exit_trade(token: TokenStats, condition_no: int, buy_amount: float, sol_balance_widget, loggers, fees: float = 0,
-               use_imported_wallet: bool = False, cfg=None):
-    global total_trades_record
-    global time_in_trade_sum
-    global pnl_sum
-    global profitable_trades
-
-    if use_imported_wallet:
-        retries = complete_official_transaction("sell", token.mint, cfg.keypair, cfg.max_slippage, cfg.priority_fee,
-                                                "false", token.pool, "100%", cfg.rpc_url, loggers)
-        current_price = token.current_mcap / 1000000000
-        profit = (token.token_amount * current_price) - (TRANSACTION_FEE + cfg.priority_fee +
-                                                         (retries * (cfg.priority_fee + TRANSACTION_FEE)))
-    else:
-        current_price = (token.current_mcap + buy_amount) / 1000000000  # adding 'buy_amount' just to simulate our trade
-        profit = (token.token_amount * current_price) - (TRANSACTION_FEE + fees)
-
-    sol_balance = sol_balance_widget.value()
-    sol_balance += profit
-    sol_balance_widget.setValue(sol_balance)
-    pnl = ((token.current_mcap - token.entering_mcap) / token.entering_mcap) * 100
-    token.exhausted = True
-    token.trade_entered = False
-
-    total_trades_record += 1
-    time_in_trade_sum += time.time() - token.entering_time
-    pnl_sum += pnl
-    if pnl > 0:
-        profitable_trades += 1
-
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    action = "<span style='color: red;'>SELL</span>"
-    amount = f"Amount: {token.token_amount:.2f}"
-    token_mint = f"Token: {token.mint}"
-    mcap = f"Mcap: {round(token.current_mcap, 2)}"
-    sol_value = f"SOL value: {round(profit, 6)}"
-    new_balance = f"New balance: {round(sol_balance, 2)}"
-    condition = f"Exit condition: {condition_no}"
-    pnl_color = "#50C878" if pnl >= 0 else "#ff8080"
-    msg = f"{timestamp:<19} | {action:<10} | {amount:<30} | {token_mint:<100} | {mcap:<25} | {sol_value:<21} | {new_balance:<25} | {condition:<20} | PnL: <span style='color: {pnl_color};'>{pnl:+.2f}%</span>"
-
-    loggers.log_transaction_message(msg)
-    return token
-
-
-def update_values(token: TokenStats, data):
-    token.counter.record_request()
-    token.tx_sec = token.counter.get_rps()
-    token.current_mcap = data["marketCapSol"]
-    token.mcap_logs.append(token.current_mcap)
-    token.mcap_timestamp_logs.append(time.time())
-    if len(token.mcap_logs) > 2:
-        # Measure the trend slope (units per second) and the trend strength
-        base_time = token.mcap_timestamp_logs[0]
-        x = [t - base_time for t in token.mcap_timestamp_logs]
-        if len(set(x)) == 1 and len(x) > 1:
-            x[-1] = x[-2] + 1
-        y = token.mcap_logs
-        slope, intercept, r_value, p_value, std_err = linregress(x, y)
-        token.slope = slope
-        token.trend_strength = r_value**2
-    if data["txType"] == "buy":
-        token.buys += 1
-        token.total_buy_volume += data["solAmount"]
-        token.avg_buy_amount = token.total_buy_volume / token.buys
-    elif data["txType"] == "sell":
-        token.sells += 1
-    else:
-        print(data)
-    if data["traderPublicKey"] == devs[token.mint] and data["txType"] == "sell":
-        token.dev_sold = True
-    try:
-        token.pool = data["pool"]
-    except KeyError:
-        pass
-    token.total_trades = token.buys + token.sells
-    token.buys_sells_ratio = token.buys / token.sells if token.sells != 0 else 1
-    token.last_trade_time = time.time()
-
-    return token
-
-
-async def simulate_trade_finalization(operation, mcap, mint, cond_no, cfg, loggers):
-    global tokens
-    global strategy_transcript
-
-    delay, fees = simulate_trade_finalization_time(priority_fee=cfg.priority_fee)
-
-    await asyncio.sleep(delay)  # simulate transaction execution time (network latency, inclusion time, retries, etc.)
-
-    current_mcap = tokens[mint].current_mcap
-    token = tokens[mint]
-    price_movement = ((current_mcap - mcap) / current_mcap) * 100
-
-    if operation == "buy":
-        if price_movement < cfg.max_slippage:
-            tokens[mint] = enter_trade(token, cond_no, cfg.buy_size, cfg.sol_balance_widget, loggers, fees)
-            strategy_transcript[mint] = (cond_no, 0)  # store enter and exit condition for backtracking
-            token.trade_entered = True
-            token.executing_order = False
-        else:
-            token.executing_order = False
-    elif operation == "sell":
-        if -1 * price_movement < cfg.max_slippage:
-            tokens[mint] = exit_trade(tokens[mint], cond_no, cfg.buy_size, cfg.sol_balance_widget, loggers, fees)
-            strategy_transcript[mint] = (strategy_transcript[mint][0], cond_no)
-        else:
-            token.executing_order = False
-
-
-async def processor(websocket, enter_conditions, exit_conditions, cfg, use_imported_wallet, loggers):
-    global devs
-    global first_response
-    global subbed_tokens_count
-    global tokens
-    global records_of_current_subbed_tokens
-    global strategy_transcript
-    global tokens_created_since_start
-    global tokens_evaluated_since_start
-
-    while True:
-        data = await queue.get()
-        try:
-            try_to_access_data = data["txType"]
-        except KeyError:
-            continue
-        if data["txType"] == "create":  # on token creation search for tokens to subscribe to
-            tokens_created_since_start += 1
-            try:
-                mint = data['mint']
-            except KeyError as e:
-                print(f"KeyError with: {data}")
-                print(e)
-                exit(1)
-            if subbed_tokens_count < cfg.batch_reset_size:
-                subbed_tokens_count += 1
-                tokens_evaluated_since_start += 1
-                devs[data["mint"]] = data["traderPublicKey"]
-                records_of_current_subbed_tokens.append(mint)
-                await sub_token_trade(websocket, mint)
-
-        else:
-            mint = data["mint"]
-            if mint not in tokens:
-                tokens[mint] = TokenStats()
-                tokens[mint].mint = mint
-                tokens[mint] = update_values(tokens[mint], data)
-            elif not tokens[mint].exhausted:
-                tokens[mint] = update_values(tokens[mint], data)
-                token = tokens[mint]
-                if not token.trade_entered:
-                    # ===== TRADE ENTER =====
-                    any_cond_satisfied, cond_no = evaluate_conditions(token, enter_conditions)
-                    if any_cond_satisfied and not token.executing_order:
-                        if cfg.sol_balance_widget.value() > cfg.buy_size:
-                            token.executing_order = True
-                            if not use_imported_wallet:
-                                asyncio.create_task(simulate_trade_finalization("buy", token.current_mcap, mint, cond_no, cfg, loggers))
-                            else:
-                                try:
-                                    tokens[mint] = enter_trade(token, cond_no, cfg.buy_size, cfg.sol_balance_widget, loggers,
-                                                               0, use_imported_wallet, cfg)
-                                    strategy_transcript[mint] = (cond_no, 0)  # store enter and exit condition for backtracking
-                                    token.trade_entered = True
-                                    token.executing_order = False
-                                except Exception as e:
-                                    loggers.log_general_message(f"Error during trade entry for token {mint}: {e}")
-                                    token.executing_order = False
-                        else:
-                            loggers.log_general_message(f"Insufficient SOL balance to enter trade for token {mint}."
-                                                        f" Needed: {cfg.buy_size}, "
-                                                        f"Available: {cfg.sol_balance_widget.value()}")
-
-                else:
-                    # ===== TRADE EXIT =====
-                    mcap = token.current_mcap
-                    entering_mcap = token.entering_mcap
-                    time_elapsed = time.time() - token.entering_time
-                    tx_sec = token.tx_sec
-                    pnl = ((mcap - entering_mcap) / entering_mcap) * 100
-                    pnl_str = f"{pnl:+.2f}%"
-
-                    any_cond_satisfied, cond_no = evaluate_conditions(token, exit_conditions, pnl=pnl,
-                                                                      time_elapsed=time_elapsed)
-                    if any_cond_satisfied and not token.executing_order:
-                        token.executing_order = True
-                        if not use_imported_wallet:
-                            asyncio.create_task(simulate_trade_finalization("sell", mcap, mint, cond_no, cfg, loggers))
-                        else:
-                            try:
-                                tokens[mint] = exit_trade(tokens[mint], cond_no, cfg.buy_size, cfg.sol_balance_widget,
-                                                          loggers, 0, use_imported_wallet, cfg)
-                                strategy_transcript[mint] = (strategy_transcript[mint][0], cond_no)
-                                token.executing_order = False
-                            except Exception as e:
-                                loggers.log_general_message(f"Error during trade exit for token {mint}: {e}")
-                                token.executing_order = False
-                        continue
-
-                    loggers.log_general_message(f"token: {mint} | tx/sec: {tx_sec} | buys/sells: {token.buys} / {token.sells} | "
-                                                f"mcap: {round(mcap, 2)} | avg_buy: {round(token.avg_buy_amount, 2)} | "
-                                                f"slope: {round(token.slope, 2)} | strength: {round(token.trend_strength, 2)} | "
-                                                f"PnL: {pnl_str} | time_elapsed: {round(time_elapsed, 2)} | dev_sold: {token.dev_sold}")
-
-
-async def discard_current_batch(websocket, batch_reset_size, loggers):
-    global subbed_tokens_count
-    global first_response
-    global tokens
-    global records_of_current_subbed_tokens
-    try:
-        while True:
-            if subbed_tokens_count >= batch_reset_size:
-                trade_active = False
-                mints = list()
-                for mint, token in tokens.items():
-                    mints.append(mint)
-                    if token.trade_entered:
-                        trade_active = True
-                if not trade_active:
-                    payload = {
-                        "method": "unsubscribeTokenTrade",
-                        "keys": mints
-                    }
-                    first_response = True
-                    await websocket.send(json.dumps(payload))
-                    tokens = dict()
-                    subbed_tokens_count = 0
-                    loggers.log_general_message("* Discarded old batch, looking for new tokens... *")
-                    records_of_current_subbed_tokens = list(set(records_of_current_subbed_tokens) - set(mints))
-            await asyncio.sleep(30)
-    except asyncio.CancelledError:
-        print("Discarding token batches task canceled.")
-
-
-async def sell_stale_tokens(threshold, buy_amount, sol_balance_widget, use_imported_wallet, cfg, loggers):
-    global tokens
-    try:
-        while True:
-            for mint, token in tokens.items():
-                if token.trade_entered:
-                    if time.time() - token.last_trade_time >= threshold and not token.executing_order:
-                        if use_imported_wallet:
-                            tokens[mint] = exit_trade(token, 101, buy_amount, sol_balance_widget,
-                                                      loggers, 0, use_imported_wallet, cfg)
-                        else:
-                            # no delay is added to this trade because this token is supposed to have no activity
-                            # by the time we want to sell and there is a very low chance that a transaction will
-                            # happen during the time our exit trade finalizes.
-                            tokens[mint] = exit_trade(token, 101, buy_amount, sol_balance_widget, loggers)
-                        strategy_transcript[mint] = (strategy_transcript[mint][0], 101)
-            await asyncio.sleep(1)
-    except asyncio.CancelledError:
-        print("Canceled stale token selling task.")
-
-
-def exit_trades(cfg, use_imported_wallet, loggers):
-    global tokens
-    for mint, token in tokens.items():
-        if token.trade_entered and not token.executing_order:
-            if use_imported_wallet:
-                tokens[mint] = exit_trade(token, 100, cfg.buy_size, cfg.sol_balance_widget, loggers, 0,
-                                          use_imported_wallet, cfg)
-            else:
-                tokens[mint] = exit_trade(token, 100, cfg.buy_size, cfg.sol_balance_widget, loggers)
-            strategy_transcript[mint] = (strategy_transcript[mint][0], 100)
-
-
-async def subscribe(enter_conditions, exit_conditions, loggers, cfg, use_imported_wallet: bool = False):
-    global records_of_current_subbed_tokens
-    global strategy_transcript
-    uri = "wss://pumpportal.fun/api/data"
-    async with websockets.connect(uri) as websocket:
-        payload = {"method": "subscribeNewToken"}
-        await websocket.send(json.dumps(payload))
-        try:
-            await asyncio.gather(
-                receiver(websocket),
-                processor(websocket, enter_conditions, exit_conditions, cfg, use_imported_wallet, loggers),
-                keepalive_ping(websocket),
-                discard_current_batch(websocket, cfg.batch_reset_size, loggers),
-                sell_stale_tokens(cfg.inactivity_reset_time, cfg.buy_size, cfg.sol_balance_widget,
-                                  use_imported_wallet, cfg, loggers)
-            )
-        # except asyncio.CancelledError:
-        except Exception as e:
-            print(f"Error: {e}")
-            raise
-        finally:
-            exit_trades(cfg, use_imported_wallet, loggers)
-            payload = {
-                "method": "unsubscribeNewToken",
-            }
-            await websocket.send(json.dumps(payload))
-            print("Unsubscribed from new token event")
-            time.sleep(1)
-            payload = {
-                "method": "unsubscribeTokenTrade",
-                "keys": records_of_current_subbed_tokens
-            }
-            await websocket.send(json.dumps(payload))
-            print("Unsubscribed from tokens: {}".format(records_of_current_subbed_tokens))
+import http_pool
+from order_executor import MAX_ORDERS_IN_FLIGHT
+from prefetch import ARM_PROXIMITY
+from recorder import RECORDINGS_DIRECTORY, SessionRecorder
+from rpc_calls import get_balance
+from rpc_endpoints import parse_rpc_urls, release_rpc_endpoints, rpc_endpoints
+import engine
+from engine import reset_globals, subscribe
 
 
 # --- PyQt UI ---
@@ -454,6 +47,8 @@ class SubConditionRow(QWidget):
             self.properties.addItems(["total trades", "transaction/sec", "buys", "sells", "buy/sell ratio", "mcap", "mcap slope", "trend strength", "avg buy amount"])
         else:  # exit condition
             self.properties.addItems(["PnL", "time elapsed", "total trades", "transaction/sec", "buys", "sells", "buy/sell ratio", "mcap", "mcap slope", "trend strength", "avg buy amount"])
+        self.properties.addItems(["buys (last 10s)", "sells (last 10s)", "buy volume (last 10s)",
+                                  "avg buy amount (last 10s)", "buy/sell ratio (last 10s)", "mcap slope (last 30s)"])
 
         self.value_input = QDoubleSpinBox()
         self.value_input.setMinimum(-100)
@@ -614,6 +209,8 @@ class MainWindow(QMainWindow):
         self.report_layout = None
         self.loggers = None
         self.cfg = None
+        self.compiled_enter_conditions = None
+        self.compiled_exit_conditions = None
         self.setWindowTitle("Gem Finder")
         self.setWindowIcon(QIcon(resource_path("images/tourmaline.png")))
         self.stacked = QStackedWidget()
@@ -798,25 +395,47 @@ class MainWindow(QMainWindow):
         sww_layout.addWidget(self.keypair_widget)
 
         # ---------------------------------------- RPC URL ------------------------------------------
-        rpc_url_title = QLabel("<hr><br>RPC Endpoint (optional)")
+        rpc_url_title = QLabel("<hr><br>RPC Endpoints (optional)")
         rpc_url_title.setStyleSheet("font-size: 16px; font-weight: bold; margin-bottom: 5px;")
         self.rpc_url = QTextEdit()
         self.rpc_url.setPlaceholderText("E.g.: https://mainnet.helius-rpc.com/?api-key=<your-api-key>")
         self.rpc_url.textChanged.connect(self.validate_rpc_url)
         rpc_url_label = QLabel("By default the bot uses the public Solana RPC endpoint which is not very reliable.<br>"
-                               "You can enter here a custom RPC endpoint (e.g. helius) to improve the performance.")
+                               "You can enter here a custom RPC endpoint (e.g. helius) to improve the performance.<br>"
+                               "Enter several, one per line, to send every transaction to all of them at once: the "
+                               "first one accepting it wins.")
         rpc_url_label.setWordWrap(True)
         rpc_url_label.setStyleSheet("font-family: monospace; padding: 2px;")
         rpc_url_label.setMaximumWidth(600)
-        self.rpc_url.setMaximumHeight(30)
+        self.rpc_url.setMaximumHeight(60)
         self.rpc_url.setMaximumWidth(600)
         self.rpc_url_validation_label = QLabel("")
         self.rpc_url_validation_label.setStyleSheet("color: red; font-size: 12px;")
         self.rpc_url_validation_label.setMaximumWidth(600)
+        # live ranking of the endpoints, probed in the background, the best one is used for the balance and trades
+        self.rpc_endpoints = None
+        self.rpc_ranking = QTableWidget(0, 5)
+        self.rpc_ranking.setHorizontalHeaderLabels(["Endpoint", "Latency (ms)", "Failed probes", "Slots behind",
+                                                    "Txs accepted"])
+        self.rpc_ranking.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self.rpc_ranking.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.rpc_ranking.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.rpc_ranking.setMaximumWidth(600)
+        self.rpc_ranking.setMaximumHeight(150)
+        self.rpc_ranking.setVisible(False)
+        self.rpc_prober_timer = QTimer(self)  # probe once the urls stop changing
+        self.rpc_prober_timer.setSingleShot(True)
+        self.rpc_prober_timer.setInterval(1000)
+        self.rpc_prober_timer.timeout.connect(self.update_rpc_prober)
+        self.rpc_url.textChanged.connect(self.rpc_prober_timer.start)
+        self.rpc_ranking_timer = QTimer(self)
+        self.rpc_ranking_timer.timeout.connect(self.refresh_rpc_ranking)
+        self.rpc_ranking_timer.start(1000)
         sww_layout.addWidget(rpc_url_title)
         sww_layout.addWidget(rpc_url_label)
         sww_layout.addWidget(self.rpc_url)
         sww_layout.addWidget(self.rpc_url_validation_label)
+        sww_layout.addWidget(self.rpc_ranking)
         sww_layout.addStretch()
 
         # ====================================== SNIPER WIDGET SETUP ======================================
@@ -860,6 +479,22 @@ class MainWindow(QMainWindow):
         self.use_imported_wallet.setToolTip("When checked, this will enable real trading using the imported wallet. Be aware of the risks!")
         self.use_imported_wallet.toggled.connect(self.use_imported_wallet_changed)
         self.general_inputs.addRow("<b>Use imported wallet:</b>", self.use_imported_wallet)
+        self.prefetch_transactions = QCheckBox()
+        self.prefetch_transactions.setToolTip("Build the buy transaction of a token once an enter condition nearly "
+                                              "holds, so the buy only has to send it.")
+        self.general_inputs.addRow("<b>Prefetch buy transactions:</b>", self.prefetch_transactions)
+        self.local_builder = QCheckBox()
+        self.local_builder.setToolTip("Build and sign the bonding-curve trades locally instead of through "
+                                      "PumpPortal's trade-local API.")
+        self.general_inputs.addRow("<b>Build transactions locally:</b>", self.local_builder)
+        self.confirm_trades = QCheckBox()
+        self.confirm_trades.setToolTip("Only count a real trade once its transaction is confirmed, the failed "
+                                       "ones are retried.")
+        self.general_inputs.addRow("<b>Wait for confirmations:</b>", self.confirm_trades)
+        self.record_session = QCheckBox()
+        self.record_session.setToolTip(f"Record the raw data feed into the '{RECORDINGS_DIRECTORY}' directory, to "
+                                       "replay or backtest strategies on it later.")
+        self.general_inputs.addRow("<b>Record the session:</b>", self.record_session)
 
 
 
@@ -1001,17 +636,16 @@ class MainWindow(QMainWindow):
 
     def validate_rpc_url(self):
         """Validate the RPC URL and provide visual feedback"""
-        url_text = self.rpc_url.toPlainText().strip()
+        urls = [QUrl(url_text) for url_text in parse_rpc_urls(self.rpc_url.toPlainText())]
 
         # If empty, it's valid (optional field)
-        if not url_text:
+        if not urls:
             self.rpc_url.setStyleSheet("")
             self.rpc_url_validation_label.setText("")
             return True
 
-        # Check if URL is valid
-        url = QUrl(url_text)
-        if url.isValid() and url.scheme() in ['http', 'https'] and url.host():
+        # Check if every URL is valid
+        if all(url.isValid() and url.scheme() in ['http', 'https'] and url.host() for url in urls):
             # Valid URL
             self.rpc_url.setStyleSheet("")
             self.rpc_url_validation_label.setText("")
@@ -1023,6 +657,38 @@ class MainWindow(QMainWindow):
             self.rpc_url_validation_label.setStyleSheet("color: red; font-size: 12px;")
             return False
 
+    def update_rpc_prober(self):
+        """Probe the endpoints entered in the Wallet tab in the background, instead of the previous ones."""
+        urls = parse_rpc_urls(self.rpc_url.toPlainText()) if self.validate_rpc_url() else []
+        endpoints = rpc_endpoints(urls) if urls else None
+        if endpoints is self.rpc_endpoints:
+            return
+        if self.rpc_endpoints is not None:
+            # the threads and statistics of the previous endpoints would otherwise stay around for good
+            release_rpc_endpoints(self.rpc_endpoints)
+        self.rpc_endpoints = endpoints
+        if endpoints is not None:
+            endpoints.start_probing()
+        self.rpc_ranking.setVisible(endpoints is not None)
+        self.refresh_rpc_ranking()
+
+    def refresh_rpc_ranking(self):
+        """Show the endpoints best first, with what their probes and the transactions sent to them measured."""
+        if self.rpc_endpoints is None:
+            return
+        ranked = self.rpc_endpoints.ranked()
+        self.rpc_ranking.setRowCount(len(ranked))
+        for row, url in enumerate(ranked):
+            stats = self.rpc_endpoints.stats[url]
+            slot_lag = self.rpc_endpoints.slot_lag(url)
+            values = [url,
+                      "-" if stats.probe_latency is None else f"{stats.probe_latency * 1000:.0f}",
+                      f"{stats.probe_errors}/{stats.probes}",
+                      "-" if slot_lag is None else slot_lag,
+                      f"{stats.accepted}/{stats.sent}"]
+            for column, value in enumerate(values):
+                self.rpc_ranking.setItem(row, column, QTableWidgetItem(str(value)))
+
     async def test_rpc_endpoint(self, url: str) -> bool:
         """Test if the RPC endpoint is actually working by making a simple call"""
         try:
@@ -1038,8 +704,9 @@ class MainWindow(QMainWindow):
                 "Content-Type": "application/json"
             }
 
-            # Make the request with a 5-second timeout
-            response = requests.post(url, json=payload, headers=headers, timeout=5)
+            # Make the request with a 5-second timeout off the event loop, the connection stays open for the trades
+            response = await asyncio.get_running_loop().run_in_executor(
+                None, partial(http_pool.post, url, json=payload, headers=headers, timeout=5))
 
             # Check if response is successful
             if response.status_code == 200:
@@ -1155,6 +822,10 @@ class MainWindow(QMainWindow):
         self.batch_reset_size.setEnabled(True)
         self.inactivity_reset_time.setEnabled(True)
         self.use_imported_wallet.setEnabled(True)
+        self.prefetch_transactions.setEnabled(True)
+        self.local_builder.setEnabled(True)
+        self.confirm_trades.setEnabled(True)
+        self.record_session.setEnabled(True)
         self.enter_scroll_container.setEnabled(True)
         self.exit_scroll_container.setEnabled(True)
         self.add_enter_condition_button.setEnabled(True)
@@ -1170,6 +841,10 @@ class MainWindow(QMainWindow):
         self.batch_reset_size.setEnabled(False)
         self.inactivity_reset_time.setEnabled(False)
         self.use_imported_wallet.setEnabled(False)
+        self.prefetch_transactions.setEnabled(False)
+        self.local_builder.setEnabled(False)
+        self.confirm_trades.setEnabled(False)
+        self.record_session.setEnabled(False)
         self.enter_scroll_container.setEnabled(False)
         self.exit_scroll_container.setEnabled(False)
         self.add_enter_condition_button.setEnabled(False)
@@ -1197,10 +872,17 @@ class MainWindow(QMainWindow):
             self.log_general_message("Please define at least one enter and one exit condition before starting.")
             return
 
+        try:
+            self.compiled_enter_conditions = CompiledConditions(self.interpretable_enter_conditions)
+            self.compiled_exit_conditions = CompiledConditions(self.interpretable_exit_conditions)
+        except ValueError as e:
+            self.log_general_message(f"Warning: Invalid strategy conditions! {e}")
+            return
+
         if self.use_imported_wallet.isChecked():
             # Validate RPC URL if provided
-            rpc_url_text = self.rpc_url.toPlainText().strip()
-            if rpc_url_text:
+            rpc_urls = parse_rpc_urls(self.rpc_url.toPlainText())
+            if rpc_urls:
                 # First check format
                 if not self.validate_rpc_url():
                     self.log_general_message("Warning: Invalid RPC URL format! Please enter a valid HTTP/HTTPS URL "
@@ -1209,10 +891,11 @@ class MainWindow(QMainWindow):
 
                 # Then test the endpoint connection
                 self.log_general_message("Testing RPC endpoint...")
-                if not await self.test_rpc_endpoint(rpc_url_text):
-                    self.log_general_message("Warning: RPC endpoint is not working or unreachable. "
-                                             "Please check the URL or remove it to use the default endpoint.")
-                    return
+                for rpc_url in rpc_urls:
+                    if not await self.test_rpc_endpoint(rpc_url):
+                        self.log_general_message(f"Warning: RPC endpoint {rpc_url} is not working or unreachable. "
+                                                 f"Please check the URL or remove it to use the default endpoint.")
+                        return
 
         self.status_label.setText("Status: Connecting...")
 
@@ -1225,11 +908,11 @@ class MainWindow(QMainWindow):
         self.uptime = time.time()
         self.enter_conditions_for_report = copy(self.interpretable_enter_conditions)
         self.exit_conditions_for_report = copy(self.interpretable_exit_conditions)
-        self.task = asyncio.create_task(self.run_subscription(self.interpretable_enter_conditions,
-                                                              self.interpretable_exit_conditions))
+        self.task = asyncio.create_task(self.run_subscription(self.compiled_enter_conditions,
+                                                              self.compiled_exit_conditions))
 
     async def run_subscription(self, enter_conditions, exit_conditions):
-        global records_of_current_subbed_tokens
+        recorder = None
         try:
             self.cfg = SimpleNamespace(sol_balance_widget=self.sol_balance,
                                        max_slippage=self.max_slippage.value(),
@@ -1238,13 +921,21 @@ class MainWindow(QMainWindow):
                                        batch_reset_size=self.batch_reset_size.value(),
                                        inactivity_reset_time=self.inactivity_reset_time.value(),
                                        keypair=self.current_keypair,
-                                       rpc_url=self.rpc_url.toPlainText()
+                                       rpc_url=self.rpc_url.toPlainText(),
+                                       rpc_fanout=0,
+                                       max_orders_in_flight=MAX_ORDERS_IN_FLIGHT,
+                                       prefetch=self.prefetch_transactions.isChecked(),
+                                       arm_proximity=ARM_PROXIMITY,
+                                       local_builder=self.local_builder.isChecked(),
+                                       confirm_trades=self.confirm_trades.isChecked()
                                        )
             self.loggers = SimpleNamespace(log_general_message=self.log_general_message,
                                            log_transaction_message=self.log_transaction_message)
+            if self.record_session.isChecked():
+                recorder = SessionRecorder(RECORDINGS_DIRECTORY).start()
             self.log_general_message("Bot initiated successfully!")
             await subscribe(enter_conditions, exit_conditions, self.loggers, self.cfg,
-                            self.use_imported_wallet.isChecked())
+                            self.use_imported_wallet.isChecked(), recorder)
 
         except Exception as e:
             print(f"Error: {e}")
@@ -1252,10 +943,13 @@ class MainWindow(QMainWindow):
             self.log_general_message("Operation was cancelled due to an error!")
             self.build_report()
         finally:
-            exit_trades(self.cfg, self.use_imported_wallet, self.loggers)
+            if recorder is not None:
+                await asyncio.to_thread(recorder.close)  # writes the buffered frames without blocking the GUI
+                self.log_general_message(f"Recorded {recorder.recorded} frames ({recorder.dropped} dropped) "
+                                         f"into {', '.join(recorder.files)}")
             self.enable_interface()
             self.log_general_message("Operation was stopped!")
-            print(records_of_current_subbed_tokens)
+            print(engine.records_of_current_subbed_tokens)
             if not (len(self.enter_conditions) > 0 and len(self.exit_conditions) > 0):
                 self.status_label.setText("Status: Waiting for conditions")
             else:
@@ -1269,26 +963,20 @@ class MainWindow(QMainWindow):
             self.task.cancel()
             self.status_label.setText("Status: Cancelling...")
             self.uptime = time.time() - self.uptime
-            time.sleep(8) # give some time to properly exit trades that occur during cancellation
-            exit_trades(self.cfg, self.use_imported_wallet.isChecked(), self.loggers)
+            # `subscribe` exits the open trades while it is cancelled, without blocking the event loop
+            await asyncio.gather(self.task, return_exceptions=True)
             self.enable_interface()
             if self.use_imported_wallet.isChecked():
                 # reset the sol balance because the system might not be able to get it correctly after real trades
                 try:
-                    self.sol_balance.setValue(get_balance(self.current_keypair))
+                    self.sol_balance.setValue(await asyncio.get_running_loop().run_in_executor(
+                        None, get_balance, self.current_keypair, self.rpc_url.toPlainText()))
                 except Exception:
                     pass
                 self.sol_balance.setEnabled(False)
             self.build_report()
 
     def save_state(self):
-        global strategy_transcript
-        global tokens_created_since_start
-        global tokens_evaluated_since_start
-        global total_trades_record
-        global pnl_sum
-        global profitable_trades
-        global time_in_trade_sum
 
         self.settings.setValue("sol_balance", self.sol_balance.value())
         self.settings.setValue("max_slippage", self.max_slippage.value())
@@ -1296,6 +984,10 @@ class MainWindow(QMainWindow):
         self.settings.setValue("buy_size", self.buy_size.value())
         self.settings.setValue("batch_reset_size", self.batch_reset_size.value())
         self.settings.setValue("inactivity_reset_time", self.inactivity_reset_time.value())
+        self.settings.setValue("prefetch_transactions", self.prefetch_transactions.isChecked())
+        self.settings.setValue("local_builder", self.local_builder.isChecked())
+        self.settings.setValue("confirm_trades", self.confirm_trades.isChecked())
+        self.settings.setValue("record_session", self.record_session.isChecked())
         ent_conds = []
         for cond in self.enter_conditions:
             ent_conds.append(cond.condition)
@@ -1310,23 +1002,16 @@ class MainWindow(QMainWindow):
         self.settings.setValue("pnl_to_report", self.pnl_to_report)
         self.settings.setValue("enter_conditions_for_report", self.enter_conditions_for_report)
         self.settings.setValue("exit_conditions_for_report", self.exit_conditions_for_report)
-        # globals
-        self.settings.setValue("strategy_transcript", strategy_transcript)
-        self.settings.setValue("tokens_created_since_start", tokens_created_since_start)
-        self.settings.setValue("tokens_evaluated_since_start", tokens_evaluated_since_start)
-        self.settings.setValue("total_trades_record", total_trades_record)
-        self.settings.setValue("pnl_sum", round(pnl_sum, 4))
-        self.settings.setValue("profitable_trades", profitable_trades)
-        self.settings.setValue("time_in_trade_sum", time_in_trade_sum)
+        # engine statistics
+        self.settings.setValue("strategy_transcript", engine.strategy_transcript)
+        self.settings.setValue("tokens_created_since_start", engine.tokens_created_since_start)
+        self.settings.setValue("tokens_evaluated_since_start", engine.tokens_evaluated_since_start)
+        self.settings.setValue("total_trades_record", engine.total_trades_record)
+        self.settings.setValue("pnl_sum", round(engine.pnl_sum, 4))
+        self.settings.setValue("profitable_trades", engine.profitable_trades)
+        self.settings.setValue("time_in_trade_sum", engine.time_in_trade_sum)
 
     def load_state(self):
-        global strategy_transcript
-        global tokens_created_since_start
-        global tokens_evaluated_since_start
-        global total_trades_record
-        global pnl_sum
-        global profitable_trades
-        global time_in_trade_sum
         try:
             self.sol_balance.setValue(float(self.settings.value("sol_balance", 5)))
             self.max_slippage.setValue(float(self.settings.value("max_slippage", 30)))
@@ -1334,6 +1019,10 @@ class MainWindow(QMainWindow):
             self.buy_size.setValue(float(self.settings.value("buy_size", 0.3)))
             self.batch_reset_size.setValue(int(self.settings.value("batch_reset_size", 10)))
             self.inactivity_reset_time.setValue(float(self.settings.value("inactivity_reset_time", 4)))
+            self.prefetch_transactions.setChecked(self.settings.value("prefetch_transactions", False, type=bool))
+            self.local_builder.setChecked(self.settings.value("local_builder", False, type=bool))
+            self.confirm_trades.setChecked(self.settings.value("confirm_trades", False, type=bool))
+            self.record_session.setChecked(self.settings.value("record_session", False, type=bool))
             for cond in self.settings.value("enter_conditions", []):
                 self.add_condition_row(cond, True)
             self.interpretable_enter_conditions = self.settings.value("enter_conditions", [])
@@ -1346,14 +1035,14 @@ class MainWindow(QMainWindow):
             self.pnl_to_report = float(self.settings.value("pnl_to_report", 0))
             self.enter_conditions_for_report = self.settings.value("enter_conditions_for_report", [])
             self.exit_conditions_for_report = self.settings.value("exit_conditions_for_report", [])
-            # globals
-            strategy_transcript = self.settings.value("strategy_transcript", dict())
-            tokens_created_since_start = int(self.settings.value("tokens_created_since_start", 0))
-            tokens_evaluated_since_start = int(self.settings.value("tokens_evaluated_since_start", 0))
-            total_trades_record = int(self.settings.value("total_trades_record", 0))
-            pnl_sum = float(self.settings.value("pnl_sum", 0))
-            profitable_trades = int(self.settings.value("profitable_trades", 0))
-            time_in_trade_sum = float(self.settings.value("time_in_trade_sum", 0))
+            # engine statistics
+            engine.strategy_transcript = self.settings.value("strategy_transcript", dict())
+            engine.tokens_created_since_start = int(self.settings.value("tokens_created_since_start", 0))
+            engine.tokens_evaluated_since_start = int(self.settings.value("tokens_evaluated_since_start", 0))
+            engine.total_trades_record = int(self.settings.value("total_trades_record", 0))
+            engine.pnl_sum = float(self.settings.value("pnl_sum", 0))
+            engine.profitable_trades = int(self.settings.value("profitable_trades", 0))
+            engine.time_in_trade_sum = float(self.settings.value("time_in_trade_sum", 0))
             self.build_report()
         except Exception as e:
             print(e)
@@ -1368,6 +1057,10 @@ class MainWindow(QMainWindow):
         self.batch_reset_size.setValue(10)
         self.inactivity_reset_time.setValue(4)
         self.use_imported_wallet.setChecked(False)
+        self.prefetch_transactions.setChecked(False)
+        self.local_builder.setChecked(False)
+        self.confirm_trades.setChecked(False)
+        self.record_session.setChecked(False)
         for cond in list(self.enter_conditions):
             cond.remove_self()
         self.interpretable_enter_conditions = []
@@ -1447,7 +1140,8 @@ class MainWindow(QMainWindow):
             self.current_keypair = None
             print(f"Cleaned: {keypair.pubkey()}")
 
-    def use_imported_wallet_changed(self, checked: bool):
+    @asyncSlot(bool)
+    async def use_imported_wallet_changed(self, checked: bool):
         if checked:
             if self.status_label.text() == "Status: Running":
                 self.log_general_message("Cannot enable wallet usage while bot is running. Please stop the bot first.")
@@ -1456,12 +1150,17 @@ class MainWindow(QMainWindow):
                 self.use_imported_wallet.blockSignals(False)
                 return
             if self.current_keypair is not None:
+                # read off the event loop, the GUI stays responsive while the RPC endpoint answers
+                self.use_imported_wallet.setEnabled(False)
                 try:
-                    wallet_balance = get_balance(self.current_keypair)
+                    wallet_balance = await asyncio.get_running_loop().run_in_executor(
+                        None, get_balance, self.current_keypair, self.rpc_url.toPlainText())
                     wallet_balance = float(wallet_balance)
                 except Exception as e:
                     self.log_general_message(f"Could not fetch wallet balance: {e}")
                     return
+                finally:
+                    self.use_imported_wallet.setEnabled(self.start_button.isEnabled())  # not if started meanwhile
                 if wallet_balance == 0:
                     self.log_general_message("Warning: Your wallet balance is 0 SOL. Real trading cannot be performed.")
                     self.use_imported_wallet.blockSignals(True)
@@ -1490,11 +1189,11 @@ class MainWindow(QMainWindow):
 
 
     def build_report(self):
-        global strategy_transcript
-        if not len(strategy_transcript) > 0:
+        if not len(engine.strategy_transcript) > 0:
+            self.build_condition_profiles()
             return
         data = []
-        for k, v in strategy_transcript.items():
+        for k, v in engine.strategy_transcript.items():
             data.append(v)
         enter_counts = Counter([e[0] for e in data])
         exit_counts = Counter([e[1] for e in data])
@@ -1507,6 +1206,7 @@ class MainWindow(QMainWindow):
         self.report_layout_charts.addWidget(QChartView(enter_chart))
         self.report_layout_charts.addWidget(QChartView(exit_chart))
         self.report_layout_charts.addWidget(QChartView(enter_exit_chart))
+        self.build_condition_profiles()
 
         self.display_strategy_results()
 
@@ -1526,13 +1226,33 @@ class MainWindow(QMainWindow):
 
         return chart
 
+    def build_condition_profiles(self):
+        """Show the runtime profile of every sub-condition of the last run below the pie charts."""
+        for compiled, title, blocked_label in ((self.compiled_enter_conditions, "Enter Conditions", "Blocked entry"),
+                                               (self.compiled_exit_conditions, "Exit Conditions", "Blocked exit")):
+            if compiled is None or compiled.profiled_calls == 0:
+                continue
+            rows = compiled.profile_rows()
+            table = QTableWidget(len(rows), 6)
+            table.setHorizontalHeaderLabels(["Condition", "Sub-condition", "Evaluations", "Hit rate",
+                                             "Avg. time (µs)", blocked_label])
+            table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+            table.verticalHeader().setVisible(False)
+            table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+            for row, (cond_no, subcond, evaluations, pass_rate, avg_time_ns, blocked) in enumerate(rows):
+                values = [cond_no, subcond, evaluations, f"{pass_rate * 100:.1f}%", f"{avg_time_ns / 1000:.3f}",
+                          blocked]
+                for column, value in enumerate(values):
+                    table.setItem(row, column, QTableWidgetItem(str(value)))
+            table.setMinimumHeight(min(400, 40 + 30 * len(rows)))
+
+            title_label = QLabel(f"{title} Profile <span style='font-size: 12px;'>"
+                                 f"(sampled every {compiled.profile_every} evaluations)</span>")
+            title_label.setStyleSheet("font-size: 14px; font-weight: bold; margin-top: 8px;")
+            self.report_layout_charts.addWidget(title_label)
+            self.report_layout_charts.addWidget(table)
+
     def display_strategy_results(self):
-        global tokens_created_since_start
-        global tokens_evaluated_since_start
-        global total_trades_record
-        global pnl_sum
-        global profitable_trades
-        global time_in_trade_sum
 
         if self.use_imported_wallet.isChecked():
             self.report_layout_conditions_info.addWidget(QLabel("<b>Note:</b> Statistics shown here may be inaccurate "
@@ -1587,12 +1307,12 @@ class MainWindow(QMainWindow):
 
 
         self.add_report_label(f"Bot uptime: <b>{format_duration(self.uptime)}</b>")
-        self.add_report_label(f"No. of tokens created since bot initiation: <b>{tokens_created_since_start}</b>")
-        self.add_report_label(f"No. of tokens evaluated: <b>{tokens_evaluated_since_start}</b>")
-        self.add_report_label(f"No. of trades taken: <b>{total_trades_record}</b>")
-        self.add_report_label(f"No. of profitable trades: <b>{profitable_trades}</b>")
-        self.add_report_label(f"Average PnL per trade: <b>{round(pnl_sum/total_trades_record, 2)}%</b>")
-        self.add_report_label(f"Average time in trade: <b>{format_duration(time_in_trade_sum/total_trades_record)}</b>")
+        self.add_report_label(f"No. of tokens created since bot initiation: <b>{engine.tokens_created_since_start}</b>")
+        self.add_report_label(f"No. of tokens evaluated: <b>{engine.tokens_evaluated_since_start}</b>")
+        self.add_report_label(f"No. of trades taken: <b>{engine.total_trades_record}</b>")
+        self.add_report_label(f"No. of profitable trades: <b>{engine.profitable_trades}</b>")
+        self.add_report_label(f"Average PnL per trade: <b>{round(engine.pnl_sum/engine.total_trades_record, 2)}%</b>")
+        self.add_report_label(f"Average time in trade: <b>{format_duration(engine.time_in_trade_sum/engine.total_trades_record)}</b>")
 
         self.report_layout_conditions_info.addStretch()
 
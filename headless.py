@@ -0,0 +1,210 @@
+import time
+
+_process_start = time.perf_counter()  # measured before the engine imports so the cold-start time includes them
+
+import argparse
+import asyncio
+import json
+import logging
+import re
+import signal
+from types import SimpleNamespace
+import engine
+from base import SolBalance
+from helper import CompiledConditions
+from order_executor import MAX_ORDERS_IN_FLIGHT
+from prefetch import ARM_PROXIMITY
+from recorder import SessionRecorder
+
+logger = logging.getLogger("gem-finder")
+_html_tag = re.compile(r"<[^>]+>")
+
+
+def load_strategy(path):
+    """Read a strategy exported from the GUI (File > Export)."""
+    with open(path, "r", encoding="utf-8") as f:
+        return parse_strategy(json.load(f))
+
+
+def parse_strategy(state):
+    """Apply the GUI's defaults for the fields missing from an exported strategy."""
+    return {
+        "sol_balance": float(state.get("sol_balance", 5)),
+        "max_slippage": float(state.get("max_slippage", 30)),
+        "priority_fee": float(state.get("priority_fee", 0)),
+        "buy_size": float(state.get("buy_size", 0.3)),
+        "batch_reset_size": int(state.get("batch_reset_size", 10)),
+        "inactivity_reset_time": float(state.get("inactivity_reset_time", 4)),
+        "enter_conditions": state.get("enter_conditions", []),
+        "exit_conditions": state.get("exit_conditions", []),
+    }
+
+
+def validate_strategy(strategy):
+    """Same checks as `MainWindow.on_start`, raising ValueError instead of logging a warning."""
+    if strategy["sol_balance"] < strategy["buy_size"]:
+        raise ValueError("Sol balance cant be lower than the buy size!")
+    if strategy["buy_size"] <= 0:
+        raise ValueError("Buy size must be greater than 0!")
+    if strategy["sol_balance"] <= 0:
+        raise ValueError("Sol balance must be greater than 0!")
+    if strategy["batch_reset_size"] <= 0:
+        raise ValueError("Batch reset size must be greater than 0!")
+    if not (len(strategy["enter_conditions"]) > 0 and len(strategy["exit_conditions"]) > 0):
+        raise ValueError("Please define at least one enter and one exit condition.")
+    return CompiledConditions(strategy["enter_conditions"]), CompiledConditions(strategy["exit_conditions"])
+
+
+def setup_logging(log_file=None):
+    handler = logging.FileHandler(log_file, encoding="utf-8") if log_file else logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+
+def _plain(msg):
+    """The engine formats its messages for the GUI's rich-text logs, strip the markup."""
+    return _html_tag.sub("", msg)
+
+
+def log_general_message(msg):
+    logger.info(_plain(msg))
+
+
+def log_transaction_message(msg):
+    logger.info(_plain(msg))
+
+
+loggers = SimpleNamespace(log_general_message=log_general_message, log_transaction_message=log_transaction_message)
+
+
+def build_config(strategy, keypair=None, rpc_url="", max_orders_in_flight=MAX_ORDERS_IN_FLIGHT, rpc_fanout=0,
+                 prefetch=False, arm_proximity=ARM_PROXIMITY, local_builder=False, confirm_trades=False):
+    """
+    The engine configuration the GUI builds in `run_subscription`, with a plain SOL balance instead of the widget. The
+    trading options default to the GUI's unchecked boxes.
+    """
+    return SimpleNamespace(sol_balance_widget=SolBalance(strategy["sol_balance"]),
+                           max_slippage=strategy["max_slippage"],
+                           buy_size=strategy["buy_size"],
+                           priority_fee=strategy["priority_fee"],
+                           batch_reset_size=strategy["batch_reset_size"],
+                           inactivity_reset_time=strategy["inactivity_reset_time"],
+                           keypair=keypair,
+                           rpc_url=rpc_url,
+                           rpc_fanout=rpc_fanout,
+                           max_orders_in_flight=max_orders_in_flight,
+                           prefetch=prefetch,
+                           arm_proximity=arm_proximity,
+                           local_builder=local_builder,
+                           confirm_trades=confirm_trades)
+
+
+def report(sol_balance, entering_sol_balance, uptime):
+    stats = engine.strategy_statistics()
+    pnl = ((sol_balance.value() - entering_sol_balance) / entering_sol_balance) * 100
+    logger.info(f"PnL: {pnl:+.2f}%")
+    logger.info(f"Bot uptime: {round(uptime, 2)}s")
+    logger.info(f"No. of tokens created since bot initiation: {stats['tokens_created']}")
+    logger.info(f"No. of tokens evaluated: {stats['tokens_evaluated']}")
+    logger.info(f"No. of trades taken: {stats['trades']}")
+    logger.info(f"No. of profitable trades: {stats['profitable_trades']}")
+    logger.info(f"Average PnL per trade: {round(stats['avg_pnl'], 2)}%")
+    logger.info(f"Average time in trade: {round(stats['avg_time_in_trade'], 2)}s")
+
+
+async def run(strategy, enter_conditions, exit_conditions, keypair=None, rpc_url="", recorder=None, uri=None,
+              max_orders_in_flight=MAX_ORDERS_IN_FLIGHT, rpc_fanout=0, prefetch=False, arm_proximity=ARM_PROXIMITY,
+              local_builder=False, confirm_trades=False):
+    use_imported_wallet = keypair is not None
+    if use_imported_wallet:
+        from rpc_calls import get_balance
+        strategy["sol_balance"] = float(get_balance(keypair, rpc_url))
+    cfg = build_config(strategy, keypair, rpc_url, max_orders_in_flight, rpc_fanout, prefetch, arm_proximity,
+                       local_builder, confirm_trades)
+    task = asyncio.create_task(engine.subscribe(enter_conditions, exit_conditions, loggers, cfg,
+                                                use_imported_wallet, recorder, uri=uri))
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, task.cancel)
+        except (NotImplementedError, AttributeError):
+            pass  # Windows, Ctrl+C raises KeyboardInterrupt instead
+
+    uptime = time.time()
+    log_general_message("Bot initiated successfully!")
+    try:
+        await task
+    except asyncio.CancelledError:
+        log_general_message("Operation was stopped!")
+    except Exception as e:
+        log_general_message(f"Operation was cancelled due to an error! {e}")
+    finally:
+        report(cfg.sol_balance_widget, strategy["sol_balance"], time.time() - uptime)
+        if use_imported_wallet:
+            from rpc_calls import rpc_endpoints, rpc_urls
+            for line in rpc_endpoints(rpc_urls(rpc_url)).summary():
+                logger.info(f"RPC {line}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a Gem-Finder strategy without the GUI")
+    parser.add_argument("--strategy", help="Strategy JSON exported from the GUI", required=True, type=str)
+    parser.add_argument("--log_file", help="Write the logs to this file instead of stdout", default=None, type=str)
+    parser.add_argument("--sol_balance", help="Override the strategy's SOL balance", default=None, type=float)
+    parser.add_argument("--private_key", help="Base58 private key, trade for real with this wallet", default=None,
+                        type=str)
+    parser.add_argument("--rpc_url", help="Custom RPC endpoints for real trades, each transaction is sent to all of "
+                        "them", default=[], nargs="+", type=str)
+    parser.add_argument("--rpc_fanout", help="Only send each transaction to this many of the RPC endpoints, the "
+                        "fastest so far (default: all)", default=0, type=int)
+    parser.add_argument("--max_orders_in_flight", help="Real trades sent at the same time, the others wait",
+                        default=MAX_ORDERS_IN_FLIGHT, type=int)
+    parser.add_argument("--arm_proximity", help="Prepare the buy transaction of a token once this fraction of the "
+                        "sub-conditions of an enter condition hold (always when all but one do)",
+                        default=ARM_PROXIMITY, type=float)
+    parser.add_argument("--prefetch", help="Build the buy transactions of the tokens about to satisfy an enter "
+                        "condition ahead of time (off by default, like in the GUI)", action="store_true")
+    parser.add_argument("--local_builder", help="Build and sign the bonding-curve trades locally instead of through "
+                        "PumpPortal's trade-local API", action="store_true")
+    parser.add_argument("--confirm_trades", help="Only count a real trade once its transaction is confirmed (off by "
+                        "default, like in the GUI)", action="store_true")
+    parser.add_argument("--record", help="Record the raw websocket frames into this directory", default=None, type=str)
+    parser.add_argument("--record_max_mb", help="Rotate the session file after this many MB", default=64, type=float)
+    parser.add_argument("--record_max_minutes", help="Rotate the session file after this many minutes", default=60,
+                        type=float)
+    parser.add_argument("--uri", help="Websocket URI of the data feed (default: $GEM_FINDER_WS_URI or PumpPortal)",
+                        default=None, type=str)
+    parser.add_argument("--check", help="Only load and validate the strategy, then exit", action="store_true")
+    args = parser.parse_args()
+
+    setup_logging(args.log_file)
+    strategy = load_strategy(args.strategy)
+    if args.sol_balance is not None:
+        strategy["sol_balance"] = args.sol_balance
+    try:
+        enter_conditions, exit_conditions = validate_strategy(strategy)
+    except ValueError as e:
+        log_general_message(f"Warning: Invalid strategy! {e}")
+        raise SystemExit(1)
+
+    keypair = None
+    if args.private_key:
+        from solders.keypair import Keypair
+        keypair = Keypair.from_base58_string(args.private_key)
+
+    log_general_message(f"Cold start: {(time.perf_counter() - _process_start) * 1000:.1f} ms")
+    if not args.check:
+        recorder = None
+        if args.record:
+            recorder = SessionRecorder(args.record, max_bytes=int(args.record_max_mb * 1024 * 1024),
+                                       max_seconds=args.record_max_minutes * 60).start()
+        try:
+            asyncio.run(run(strategy, enter_conditions, exit_conditions, keypair, args.rpc_url, recorder, args.uri,
+                            args.max_orders_in_flight, args.rpc_fanout, args.prefetch, args.arm_proximity,
+                            args.local_builder, args.confirm_trades))
+        finally:
+            if recorder is not None:
+                recorder.close()
+                log_general_message(f"Recorded {recorder.recorded} frames ({recorder.dropped} dropped) "
+                                    f"into {', '.join(recorder.files)}")
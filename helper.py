@@ -2,6 +2,7 @@ import operator
 import os
 import sys
 import random
+import time
 from base import TokenStats
 
 
@@ -35,6 +36,12 @@ props = {"total trades": "total_trades",
          "mcap slope": "slope",
          "trend strength": "trend_strength",
          "avg buy amount": "avg_buy_amount",
+         "buys (last 10s)": "buys_10s",
+         "sells (last 10s)": "sells_10s",
+         "buy volume (last 10s)": "buy_volume_10s",
+         "avg buy amount (last 10s)": "avg_buy_amount_10s",
+         "buy/sell ratio (last 10s)": "buys_sells_ratio_10s",
+         "mcap slope (last 30s)": "slope_30s",
          "time elapsed": "time_elapsed",
          "PnL": "pnl"}
 
@@ -132,3 +139,220 @@ def evaluate_conditions(token_stats: TokenStats, conditions, **kwargs):
         if cond_satisfied:
             return True, cond_count_tracker
     return False, None
+
+
+time_dependent_props = ("pnl", "time_elapsed")  # passed to the evaluator instead of being read from TokenStats
+
+# optional indicators maintained by `update_values` and the props they feed
+indicator_props = {
+    "trend": ("slope", "trend_strength"),
+    "slope_window": ("slope_30s",),
+    "trade_window": ("buys_10s", "sells_10s", "buy_volume_10s", "avg_buy_amount_10s", "buys_sells_ratio_10s"),
+}
+
+
+class UpdatePlan:
+    """
+    The optional indicators `update_values` has to keep up to date for a strategy.
+
+    Indicators not referenced by any condition are skipped and keep their initial value. Without
+    `referenced_props` every indicator is computed.
+    """
+
+    __slots__ = tuple(indicator_props)
+
+    def __init__(self, referenced_props=None):
+        for indicator, indicator_attrs in indicator_props.items():
+            needed = referenced_props is None or any(attr in referenced_props for attr in indicator_attrs)
+            setattr(self, indicator, needed)
+
+    @classmethod
+    def from_conditions(cls, *compiled_conditions):
+        referenced_props = set()
+        for conditions in compiled_conditions:
+            referenced_props |= conditions.referenced_props
+        return cls(referenced_props)
+
+
+PROFILE_EVERY = 1024  # one in this many evaluations is profiled
+TIMING_EVERY = 8  # one in this many profiled evaluations also times every sub-condition
+REORDER_EVERY = 32  # profiled evaluations between two reorderings of the sub-conditions
+REORDER_MIN_SAMPLES = 32  # profiled evaluations needed before a sub-condition gets reordered
+REORDER_MIN_GAIN = 0.1  # relative drop of the expected evaluation cost needed to reorder a condition
+
+
+class SubconditionProfile:
+    """Runtime statistics of a sub-condition, gathered from the profiled evaluations."""
+
+    __slots__ = ("evaluations", "passes", "timings", "time_ns", "blocked")
+
+    def __init__(self):
+        self.evaluations = 0
+        self.passes = 0
+        self.timings = 0  # evaluations whose duration got measured
+        self.time_ns = 0
+        self.blocked = 0  # times it was the first failing sub-condition of its condition
+
+    @property
+    def pass_rate(self) -> float:
+        return self.passes / self.evaluations if self.evaluations else 0
+
+    @property
+    def avg_time_ns(self) -> float:
+        return self.time_ns / self.timings if self.timings else 0
+
+    def short_circuit_cost(self) -> float:
+        """Expected time spent on this sub-condition per failure it produces: lower means check it earlier."""
+        return self.avg_time_ns / max(1 - self.pass_rate, 1e-9)
+
+
+def _expected_cost(order, profiles) -> float:
+    """Expected time to evaluate a condition whose sub-conditions are checked in `order`, as ranked by
+    `SubconditionProfile.short_circuit_cost`."""
+    cost = 0
+    reach_probability = 1
+    for index in order:
+        profile = profiles[index]
+        cost += reach_probability * profile.avg_time_ns
+        reach_probability *= profile.pass_rate
+    return cost
+
+
+def _make_predicate(prop: str, op: str, value):
+    op = ops[op]
+    if prop == "pnl":
+        return lambda token, pnl, time_elapsed: op(pnl, value)
+    if prop == "time_elapsed":
+        return lambda token, pnl, time_elapsed: op(time_elapsed, value)
+    getter = operator.attrgetter(prop)
+    return lambda token, pnl, time_elapsed: op(getter(token), value)
+
+
+class CompiledConditions:
+    """
+    A list of conditions compiled once into Python functions.
+
+    Conditions are validated up front (raising `ValueError` on unknown properties or operators) and turned into
+    straight-line code where property lookups, operator dispatch and the pnl/time_elapsed branching are resolved
+    at compile time. `evaluate` returns the same `(bool, cond_no)` result as `evaluate_conditions`.
+
+    One in `profile_every` calls of `evaluate` also evaluates every sub-condition on its own to collect a
+    `SubconditionProfile`, which is used to periodically reorder the sub-conditions of each condition so the ones
+    most likely to fail cheaply are checked first. Condition numbers are not affected by the reordering.
+    """
+
+    def __init__(self, conditions, profile_every: int = PROFILE_EVERY):
+        self.conditions = [[tuple(subcond) for subcond in cond] for cond in conditions]
+        for cond_no, cond in enumerate(self.conditions, start=1):
+            for subcond in cond:
+                if len(subcond) != 3:
+                    raise ValueError(f"Malformed sub-condition in condition {cond_no}: {subcond}")
+                if subcond[0] not in props:
+                    raise ValueError(f"Unsupported property: {subcond[0]}")
+                if subcond[1] not in ops:
+                    raise ValueError(f"Unsupported operator: {subcond[1]}")
+        self.referenced_props = {props[subcond[0]] for cond in self.conditions for subcond in cond}
+        self.predicates = [[_make_predicate(props[prop_name], op, value) for prop_name, op, value in cond]
+                           for cond in self.conditions]
+        self.profiles = [[SubconditionProfile() for _ in cond] for cond in self.conditions]
+        self.order = [list(range(len(cond))) for cond in self.conditions]
+        self.profile_every = profile_every
+        self.calls = 0
+        self.profiled_calls = 0
+        self._compile()
+
+    def _compile(self):
+        self.source, namespace = self._generate_source()
+        exec(compile(self.source, "<compiled conditions>", "exec"), namespace)
+        self._evaluate = namespace["evaluate"]
+
+    def _generate_source(self):
+        namespace = dict()
+        lines = ["def evaluate(token, pnl=None, time_elapsed=None):"]
+        for cond_no, cond in enumerate(self.conditions, start=1):
+            checks = []
+            for index in self.order[cond_no - 1]:
+                prop_name, op, value = cond[index]
+                prop = props[prop_name]
+                value_name = f"v{len(namespace)}"
+                namespace[value_name] = value
+                operand = prop if prop in time_dependent_props else f"token.{prop}"
+                checks.append(f"{operand} {op} {value_name}")
+            lines.append(f"    if {' and '.join(checks) or 'True'}:")
+            lines.append(f"        return True, {cond_no}")
+        lines.append("    return False, None")
+        return "\n".join(lines) + "\n", namespace
+
+    def evaluate(self, token, pnl=None, time_elapsed=None):
+        """`(True, cond_no)` of the first condition `token` satisfies, else `(False, None)`."""
+        self.calls += 1
+        if self.profile_every and self.calls % self.profile_every == 0:
+            self.profile(token, pnl, time_elapsed)
+        return self._evaluate(token, pnl, time_elapsed)
+
+    def near_miss(self, token, proximity: float = 1.0, pnl=None, time_elapsed=None):
+        """
+        The number of the first condition `token` nearly satisfies, or None: all its sub-conditions hold but one, or
+        at least a `proximity` fraction of them. Conditions with a single sub-condition are never near misses.
+        """
+        for cond_no, (predicates, order) in enumerate(zip(self.predicates, self.order), start=1):
+            if len(predicates) < 2:
+                continue
+            allowed_failures = max(1, int(len(predicates) * (1 - proximity)))
+            failures = 0
+            for index in order:  # the likeliest failures first, to give up early
+                if not predicates[index](token, pnl, time_elapsed):
+                    failures += 1
+                    if failures > allowed_failures:
+                        break
+            else:
+                return cond_no
+        return None
+
+    def profile(self, token, pnl=None, time_elapsed=None):
+        """Evaluate every sub-condition on its own, updating their profiles, and reorder them when due."""
+        perf_counter_ns = time.perf_counter_ns
+        timed = self.profiled_calls % TIMING_EVERY == 0
+        for predicates, profiles, order in zip(self.predicates, self.profiles, self.order):
+            blocked = False
+            for index in order:
+                profile = profiles[index]
+                if timed:
+                    start = perf_counter_ns()
+                    passed = predicates[index](token, pnl, time_elapsed)
+                    profile.time_ns += perf_counter_ns() - start
+                    profile.timings += 1
+                else:
+                    passed = predicates[index](token, pnl, time_elapsed)
+                profile.evaluations += 1
+                if passed:
+                    profile.passes += 1
+                elif not blocked:
+                    profile.blocked += 1
+                    blocked = True
+        self.profiled_calls += 1
+        if self.profiled_calls % REORDER_EVERY == 0:
+            self.reorder()
+
+    def reorder(self):
+        """Sort the sub-conditions of every condition by their expected short-circuit cost."""
+        reordered = False
+        for cond_index, profiles in enumerate(self.profiles):
+            if any(profile.timings < REORDER_MIN_SAMPLES // TIMING_EVERY for profile in profiles):
+                continue
+            order = sorted(range(len(profiles)), key=lambda index: profiles[index].short_circuit_cost())
+            current_cost = _expected_cost(self.order[cond_index], profiles)
+            if _expected_cost(order, profiles) < current_cost * (1 - REORDER_MIN_GAIN):
+                self.order[cond_index] = order
+                reordered = True
+        if reordered:
+            self._compile()
+
+    def profile_rows(self):
+        """`(cond_no, sub-condition text, evaluations, pass rate, avg. time in ns, times blocked)` per sub-condition."""
+        rows = []
+        for cond_no, (cond, profiles) in enumerate(zip(self.conditions, self.profiles), start=1):
+            for (prop_name, op, value), profile in zip(cond, profiles):
+                rows.append((cond_no, f"{prop_name} {op} {value}", profile.evaluations, profile.pass_rate,
+                             profile.avg_time_ns, profile.blocked))
+        return rows
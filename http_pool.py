@@ -0,0 +1,66 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+
+POOL_HOSTS = 8  # hosts with a pool of kept-alive connections
+POOL_CONNECTIONS_PER_HOST = 8  # connections kept, and at most open at once, per host
+TIMEOUT = 10  # seconds
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def session() -> requests.Session:
+    """
+    The HTTP session shared by the trade and RPC calls.
+
+    Its connections are kept alive and reused, so only the first request to a host pays for the TCP and TLS
+    handshakes. Each host has its own pool of `POOL_CONNECTIONS_PER_HOST` connections, a request finding them all
+    busy waits for one instead of opening more, so a burst of orders does not get the wallet rate limited.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                new_session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_CONNECTIONS_PER_HOST,
+                                      pool_block=True)
+                new_session.mount("https://", adapter)
+                new_session.mount("http://", adapter)
+                _session = new_session
+    return _session
+
+
+def post(url, **kwargs) -> requests.Response:
+    kwargs.setdefault("timeout", TIMEOUT)
+    return session().post(url, **kwargs)
+
+
+def _origin(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}/"
+
+
+def _connect(origin):
+    start = time.perf_counter()
+    try:
+        # any answer leaves an open connection in the pool, even an error status
+        session().head(origin, timeout=TIMEOUT)
+    except requests.RequestException:
+        return None
+    return time.perf_counter() - start
+
+
+def warm_up(urls, connections: int = 1):
+    """
+    Open `connections` connections to the host of each url ahead of the first order, in parallel. Return the
+    seconds the first connection to each host took (None if unreachable), what the first order would have waited.
+    """
+    origins = list(dict.fromkeys(_origin(url) for url in urls if url))
+    connections = min(connections, POOL_CONNECTIONS_PER_HOST)
+    with ThreadPoolExecutor(max_workers=max(1, len(origins) * connections)) as threads:
+        timings = list(threads.map(_connect, [origin for origin in origins for _ in range(connections)]))
+    return {origin: timings[i * connections] for i, origin in enumerate(origins)}
@@ -0,0 +1,304 @@
+import argparse
+import asyncio
+import heapq
+import itertools
+import json
+import random
+import time
+import base58
+import websockets
+from solders.pubkey import Pubkey
+
+INITIAL_VIRTUAL_SOL = 30.0  # pump.fun bonding curve reserves at creation
+INITIAL_VIRTUAL_TOKENS = 1_073_000_000.0
+TOTAL_SUPPLY = 1_000_000_000
+MAX_BACKLOG = 10_000  # frames queued per client before new ones are dropped
+REPORT_INTERVAL = 5.0  # seconds between two throughput reports
+
+_CREATE, _TRADE = range(2)
+
+
+class _Token:
+    __slots__ = ("mint", "dev", "bonding_curve", "v_sol", "v_tokens", "dev_tokens", "buy_probability", "interval",
+                 "end", "burst_left")
+
+    def __init__(self, mint, dev, bonding_curve, buy_probability, interval, end):
+        self.mint = mint
+        self.dev = dev
+        self.bonding_curve = bonding_curve
+        self.v_sol = INITIAL_VIRTUAL_SOL
+        self.v_tokens = INITIAL_VIRTUAL_TOKENS
+        self.dev_tokens = 0.0
+        self.buy_probability = buy_probability
+        self.interval = interval  # mean seconds between two trades outside of bursts
+        self.end = end
+        self.burst_left = 0
+
+    @property
+    def market_cap(self):
+        return self.v_sol / self.v_tokens * TOTAL_SUPPLY
+
+
+class Market:
+    """
+    A synthetic pump.fun market producing the create and trade messages of the PumpPortal data feed.
+
+    Tokens are created at `create_rate` per second and trade for `lifetime` seconds on average, `trades_per_token`
+    times on average. A `hot_fraction` of them trades `hot_multiplier` times faster, and any trade starts a burst of
+    `burst_size` trades 20x faster with probability `burst_probability`. Prices follow each token's bonding curve:
+    every token gets a buy probability drawn around `buy_bias` (with `bias_spread`), and the SOL amounts are
+    exponential around `avg_sol`. The dev sells their initial buy with probability `dev_sell_probability` per
+    trade. The same `seed` produces the same market.
+    """
+
+    def __init__(self, create_rate: float = 1.0, trades_per_token: float = 60, lifetime: float = 60.0,
+                 hot_fraction: float = 0.1, hot_multiplier: float = 10.0, burst_probability: float = 0.02,
+                 burst_size: int = 20, buy_bias: float = 0.5, bias_spread: float = 0.1, avg_sol: float = 0.5,
+                 dev_sell_probability: float = 0.01, seed: int = 7):
+        self.create_rate = create_rate
+        self.trades_per_token = trades_per_token
+        self.lifetime = lifetime
+        self.hot_fraction = hot_fraction
+        self.hot_multiplier = hot_multiplier
+        self.burst_probability = burst_probability
+        self.burst_size = burst_size
+        self.buy_bias = buy_bias
+        self.bias_spread = bias_spread
+        self.avg_sol = avg_sol
+        self.dev_sell_probability = dev_sell_probability
+        self.rng = random.Random(seed)
+        self.sequence = itertools.count()
+        self.events = [(self.rng.expovariate(create_rate), next(self.sequence), _CREATE, None)]
+        self.created = 0
+        self.traded = 0
+
+    def _key(self):
+        """A random public key, valid for the trade and RPC endpoints (e.g. mock_solana.py)."""
+        return str(Pubkey(self.rng.randbytes(32)))
+
+    def _signature(self):
+        return base58.b58encode(self.rng.randbytes(64)).decode()
+
+    def next_time(self):
+        """Market time of the next message."""
+        return self.events[0][0]
+
+    def messages_until(self, until: float):
+        """The messages of the market up to time `until` (seconds since the start), in order."""
+        messages = []
+        while self.events[0][0] <= until:
+            now, _, kind, token = heapq.heappop(self.events)
+            if kind == _CREATE:
+                messages.append(self._create(now))
+                heapq.heappush(self.events, (now + self.rng.expovariate(self.create_rate), next(self.sequence),
+                                             _CREATE, None))
+            else:
+                messages.append(self._trade(token))
+                self._schedule_trade(now, token)
+        return messages
+
+    def _schedule_trade(self, now, token):
+        interval = token.interval
+        if token.burst_left:
+            token.burst_left -= 1
+            interval /= 20
+        elif self.rng.random() < self.burst_probability:
+            token.burst_left = self.burst_size
+        trade_time = now + self.rng.expovariate(1 / interval)
+        if trade_time < token.end:
+            heapq.heappush(self.events, (trade_time, next(self.sequence), _TRADE, token))
+
+    def _create(self, now):
+        rng = self.rng
+        self.created += 1
+        lifetime = rng.expovariate(1 / self.lifetime)
+        interval = self.lifetime / max(self.trades_per_token, 1e-9)
+        if rng.random() < self.hot_fraction:
+            interval /= self.hot_multiplier
+        buy_probability = min(0.95, max(0.05, rng.gauss(self.buy_bias, self.bias_spread)))
+        token = _Token(self._key(), self._key(), self._key(), buy_probability, interval, now + lifetime)
+        initial_buy = rng.expovariate(1 / self.avg_sol)
+        token.dev_tokens = self._buy(token, initial_buy)
+        self._schedule_trade(now, token)
+        return {"signature": self._signature(), "mint": token.mint, "traderPublicKey": token.dev, "txType": "create",
+                "initialBuy": token.dev_tokens, "solAmount": initial_buy, "bondingCurveKey": token.bonding_curve,
+                "vTokensInBondingCurve": token.v_tokens, "vSolInBondingCurve": token.v_sol,
+                "marketCapSol": token.market_cap, "name": token.mint[:8], "symbol": token.mint[:4].upper(),
+                "uri": f"https://ipfs.io/ipfs/{self._key()}", "pool": "pump"}
+
+    def _buy(self, token, sol):
+        tokens = token.v_tokens - token.v_sol * token.v_tokens / (token.v_sol + sol)
+        token.v_sol += sol
+        token.v_tokens -= tokens
+        return tokens
+
+    def _sell(self, token, tokens):
+        sol = token.v_sol - token.v_sol * token.v_tokens / (token.v_tokens + tokens)
+        token.v_sol -= sol
+        token.v_tokens += tokens
+        return sol
+
+    def _trade(self, token):
+        rng = self.rng
+        self.traded += 1
+        trader = self._key()
+        if token.dev_tokens and rng.random() < self.dev_sell_probability:
+            trader, tx_type = token.dev, "sell"
+            tokens, token.dev_tokens = token.dev_tokens, 0.0
+            sol = self._sell(token, tokens)
+        else:
+            sol = rng.expovariate(1 / self.avg_sol)
+            # the curve only holds the SOL bought into it, a sell larger than that becomes a buy
+            if rng.random() < token.buy_probability or token.v_sol - sol < INITIAL_VIRTUAL_SOL:
+                tx_type, tokens = "buy", self._buy(token, sol)
+            else:
+                tx_type = "sell"
+                tokens = token.v_sol * token.v_tokens / (token.v_sol - sol) - token.v_tokens
+                sol = self._sell(token, tokens)
+        return {"signature": self._signature(), "mint": token.mint, "traderPublicKey": trader, "txType": tx_type,
+                "tokenAmount": tokens, "solAmount": sol, "newTokenBalance": tokens if tx_type == "buy" else 0,
+                "bondingCurveKey": token.bonding_curve, "vTokensInBondingCurve": token.v_tokens,
+                "vSolInBondingCurve": token.v_sol, "marketCapSol": token.market_cap, "pool": "pump"}
+
+
+class _Client:
+    """A connected websocket, its subscriptions and the frames waiting to be sent to it."""
+
+    def __init__(self, websocket, max_backlog):
+        self.websocket = websocket
+        self.new_tokens = False
+        self.keys = set()
+        self.queue = asyncio.Queue(max_backlog)
+        self.sent = 0
+        self.dropped = 0
+
+    def push(self, raw):
+        try:
+            self.queue.put_nowait(raw)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def send_loop(self):
+        while True:
+            raw = await self.queue.get()
+            await self.websocket.send(raw)
+            self.sent += 1
+
+
+class MockPumpPortal:
+    """
+    Websocket server speaking the PumpPortal data feed protocol over a synthetic `Market`.
+
+    Clients send `subscribeNewToken`, `unsubscribeNewToken`, `subscribeTokenTrade` and `unsubscribeTokenTrade`
+    requests, each acknowledged with a `{"message": ...}` frame like PumpPortal does, and receive the creations and
+    the trades of their keys as they happen. Every client has its own queue of at most `max_backlog` frames, a
+    client too slow to keep up gets frames dropped (counted in the reports) instead of slowing down the market.
+    """
+
+    def __init__(self, market: Market, max_backlog: int = MAX_BACKLOG):
+        self.market = market
+        self.max_backlog = max_backlog
+        self.clients = set()
+        self.published = 0
+
+    async def handler(self, websocket):
+        client = _Client(websocket, self.max_backlog)
+        self.clients.add(client)
+        sender = asyncio.create_task(client.send_loop())
+        try:
+            async for raw in websocket:
+                client.push(json.dumps(self._request(client, raw)))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self.clients.discard(client)
+            sender.cancel()
+
+    @staticmethod
+    def _request(client, raw):
+        try:
+            request = json.loads(raw)
+            method = request["method"]
+        except (ValueError, KeyError, TypeError):
+            return {"errors": "Invalid message"}
+        if method == "subscribeNewToken":
+            client.new_tokens = True
+            return {"message": "Successfully subscribed to token creation events."}
+        if method == "unsubscribeNewToken":
+            client.new_tokens = False
+            return {"message": "Unsubscribed from token creation events."}
+        if method == "subscribeTokenTrade":
+            client.keys.update(request.get("keys", ()))
+            return {"message": "Successfully subscribed to keys."}
+        if method == "unsubscribeTokenTrade":
+            client.keys.difference_update(request.get("keys", ()))
+            return {"message": "Unsubscribed from keys."}
+        return {"errors": f"Unsupported method: {method}"}
+
+    def publish(self, message):
+        raw = None
+        is_create = message["txType"] == "create"
+        for client in self.clients:
+            if client.new_tokens if is_create else message["mint"] in client.keys:
+                raw = raw or json.dumps(message)
+                client.push(raw)
+                self.published += 1
+
+    async def run_market(self):
+        """Release the market messages in real time."""
+        start = time.monotonic()
+        while True:
+            for message in self.market.messages_until(time.monotonic() - start):
+                self.publish(message)
+            await asyncio.sleep(max(0.0, self.market.next_time() - (time.monotonic() - start)))
+
+    async def report(self):
+        market = self.market
+        last = (time.monotonic(), market.created + market.traded, self.published)
+        while True:
+            await asyncio.sleep(REPORT_INTERVAL)
+            now, generated, published = time.monotonic(), market.created + market.traded, self.published
+            elapsed = now - last[0]
+            backlog = max((client.queue.qsize() for client in self.clients), default=0)
+            print(f"market {(generated - last[1]) / elapsed:,.0f} msgs/sec | sent {(published - last[2]) / elapsed:,.0f}"
+                  f" msgs/sec to {len(self.clients)} clients | dropped "
+                  f"{sum(client.dropped for client in self.clients):,} | max backlog {backlog:,}")
+            last = (now, generated, published)
+
+
+async def serve(server: MockPumpPortal, host: str, port: int):
+    async with websockets.serve(server.handler, host, port):
+        print(f"Mock PumpPortal feed on ws://{host}:{port}, point the engine at it with "
+              f"GEM_FINDER_WS_URI=ws://{host}:{port} or --uri")
+        await asyncio.gather(server.run_market(), server.report())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local websocket server imitating the PumpPortal data feed")
+    parser.add_argument("--host", help="Interface to listen on", default="127.0.0.1", type=str)
+    parser.add_argument("--port", help="Port to listen on", default=8765, type=int)
+    parser.add_argument("--create_rate", help="Tokens created per second", default=1.0, type=float)
+    parser.add_argument("--trades_per_token", help="Average trades of a token over its lifetime", default=60,
+                        type=float)
+    parser.add_argument("--lifetime", help="Average seconds a token trades for", default=60.0, type=float)
+    parser.add_argument("--hot_fraction", help="Fraction of the tokens trading faster", default=0.1, type=float)
+    parser.add_argument("--hot_multiplier", help="How much faster the hot tokens trade", default=10.0, type=float)
+    parser.add_argument("--burst_probability", help="Chance that a trade starts a burst", default=0.02, type=float)
+    parser.add_argument("--burst_size", help="Trades in a burst", default=20, type=int)
+    parser.add_argument("--buy_bias", help="Average probability that a trade is a buy", default=0.5, type=float)
+    parser.add_argument("--bias_spread", help="Standard deviation of the buy probability across tokens", default=0.1,
+                        type=float)
+    parser.add_argument("--avg_sol", help="Average SOL amount of a trade", default=0.5, type=float)
+    parser.add_argument("--dev_sell_probability", help="Chance per trade that the dev sells", default=0.01, type=float)
+    parser.add_argument("--max_backlog", help="Frames queued per client before dropping", default=MAX_BACKLOG,
+                        type=int)
+    parser.add_argument("--seed", help="Seed of the market", default=7, type=int)
+    args = parser.parse_args()
+
+    market = Market(args.create_rate, args.trades_per_token, args.lifetime, args.hot_fraction, args.hot_multiplier,
+                    args.burst_probability, args.burst_size, args.buy_bias, args.bias_spread, args.avg_sol,
+                    args.dev_sell_probability, args.seed)
+    try:
+        asyncio.run(serve(MockPumpPortal(market, args.max_backlog), args.host, args.port))
+    except KeyboardInterrupt:
+        pass
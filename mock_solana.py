@@ -0,0 +1,423 @@
+import argparse
+import base64
+import datetime
+import ipaddress
+import json
+import os
+import random
+import ssl
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+import base58
+from solders.hash import Hash
+from solders.pubkey import Pubkey
+from solders.transaction import VersionedTransaction
+from pump_transactions import (INITIAL_VIRTUAL_SOL_RESERVES, INITIAL_VIRTUAL_TOKEN_RESERVES, TOKEN_UNITS,
+                               buy_cost, parse_trade, sell_quote, trade_transaction)
+
+TRADE_FIELDS = ("publicKey", "action", "mint", "amount", "denominatedInSol", "slippage", "priorityFee", "pool")
+SLOT_TIME = 0.4  # seconds per slot, the blockhash changes with it
+BLOCKHASH_VALIDITY = 150  # slots a blockhash can be used for
+MAX_SIGNATURE_STATUSES = 256  # signatures per getSignatureStatuses request
+REPORT_INTERVAL = 5.0
+
+
+def parse_latency(spec: str):
+    """
+    A latency sampler, in seconds, from "fixed:MS", "uniform:MIN_MS,MAX_MS", "exp:MEAN_MS" or
+    "lognormal:MEDIAN_MS,SIGMA".
+    """
+    kind, _, values = spec.partition(":")
+    try:
+        numbers = [float(value) for value in values.split(",")] if values else []
+    except ValueError:
+        numbers = None
+    shapes = {"fixed": 1, "uniform": 2, "exp": 1, "lognormal": 2}
+    if kind not in shapes or numbers is None or len(numbers) != shapes[kind]:
+        raise ValueError(f"Invalid latency {spec!r}, expected fixed:MS, uniform:MIN_MS,MAX_MS, exp:MEAN_MS or "
+                         f"lognormal:MEDIAN_MS,SIGMA")
+    if kind == "fixed":
+        return lambda rng: numbers[0] / 1000
+    if kind == "uniform":
+        return lambda rng: rng.uniform(numbers[0], numbers[1]) / 1000
+    if kind == "exp":
+        return lambda rng: rng.expovariate(1000 / numbers[0]) if numbers[0] > 0 else 0.0
+    return lambda rng: rng.lognormvariate(0, numbers[1]) * numbers[0] / 1000
+
+
+class RateLimiter:
+    """Token bucket of `rate` requests per second with bursts of up to `burst`, unlimited for a rate of 0."""
+
+    def __init__(self, rate: float, burst: float = None):
+        self.rate = rate
+        self.burst = burst or max(rate, 1)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def allow(self):
+        if not self.rate:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class Endpoint:
+    """The behaviour of one mocked endpoint: its latency, failure rate and rate limit, and what it served."""
+
+    def __init__(self, name, latency="fixed:0", error_rate: float = 0.0, rate_limit: float = 0.0, seed: int = 7):
+        self.name = name
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.limiter = RateLimiter(rate_limit)
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {"requests": 0, "errors": 0, "limited": 0}
+
+    def admit(self):
+        """Sleep for the sampled latency, then return "limited", "error" or None for a normal response."""
+        with self.lock:
+            delay = self.latency(self.rng)
+            failed = self.rng.random() < self.error_rate
+            self.counts["requests"] += 1
+        time.sleep(delay)
+        if not self.limiter.allow():
+            outcome = "limited"
+        elif failed:
+            outcome = "error"
+        else:
+            return None
+        with self.lock:
+            self.counts["errors" if outcome == "error" else "limited"] += 1
+        return outcome
+
+
+class Chain:
+    """
+    The little of a Solana cluster the trading path sees: a slot advancing every `SLOT_TIME`, its blockhash, the
+    balance of every wallet and the transactions sent, confirmed `confirmation_slots` slots after being received.
+    The pump trades sent move the bonding curve of their mint and the tokens held, a trade beyond its slippage
+    bound fails.
+    """
+
+    def __init__(self, balance: float = 10.0, confirmation_slots: int = 2, seed: int = 7):
+        self.start = time.monotonic()
+        self.balance = int(balance * 1_000_000_000)
+        self.confirmation_slots = confirmation_slots
+        self.seed = seed
+        self.lock = threading.Lock()
+        self.transactions = dict()  # signature -> (slot received, error)
+        self.curves = dict()  # mint -> [virtual SOL reserves, virtual token reserves]
+        self.holdings = dict()  # (owner, mint) -> token units
+
+    def slot(self):
+        return int((time.monotonic() - self.start) / SLOT_TIME)
+
+    def blockhash(self, slot=None):
+        slot = self.slot() if slot is None else slot
+        return Hash(random.Random(f"{self.seed}:{slot}").randbytes(32))
+
+    def is_valid_blockhash(self, blockhash):
+        slot = self.slot()
+        return any(self.blockhash(past) == blockhash for past in range(max(0, slot - BLOCKHASH_VALIDITY), slot + 1))
+
+    def curve(self, mint):
+        with self.lock:
+            return tuple(self.curves.get(mint, (INITIAL_VIRTUAL_SOL_RESERVES, INITIAL_VIRTUAL_TOKEN_RESERVES)))
+
+    def holding(self, owner, mint):
+        with self.lock:
+            return self.holdings.get((owner, mint), 0)
+
+    def _execute(self, trade):
+        action, owner, mint, tokens, sol_limit = trade
+        curve = self.curves.setdefault(mint, [INITIAL_VIRTUAL_SOL_RESERVES, INITIAL_VIRTUAL_TOKEN_RESERVES])
+        if action == "buy":
+            lamports = buy_cost(tokens, *curve)
+            if lamports > sol_limit:
+                return {"InstructionError": [3, {"Custom": 6002}]}  # too much SOL required
+            curve[0], curve[1] = curve[0] + lamports, curve[1] - tokens
+            self.holdings[(owner, mint)] = self.holdings.get((owner, mint), 0) + tokens
+        else:
+            lamports = sell_quote(tokens, *curve)
+            if tokens > self.holdings.get((owner, mint), 0):
+                return {"InstructionError": [2, {"Custom": 1}]}  # insufficient funds
+            if lamports < sol_limit:
+                return {"InstructionError": [2, {"Custom": 6003}]}  # too little SOL received
+            curve[0], curve[1] = curve[0] - lamports, curve[1] + tokens
+            self.holdings[(owner, mint)] -= tokens
+        return None
+
+    def receive(self, tx):
+        """Record `tx`, a pump trade is executed the first time it is received."""
+        trade = parse_trade(tx)
+        with self.lock:
+            signature = str(tx.signatures[0])
+            if signature not in self.transactions:
+                self.transactions[signature] = (self.slot(), self._execute(trade) if trade is not None else None)
+
+    def status(self, signature):
+        with self.lock:
+            received, error = self.transactions.get(signature, (None, None))
+        if received is None:
+            return None
+        result = {"slot": received, "err": error, "status": {"Err": error} if error else {"Ok": None}}
+        confirmations = self.slot() - received
+        if confirmations < self.confirmation_slots:
+            return dict(result, confirmations=confirmations, confirmationStatus="processed")
+        return dict(result, confirmations=None,
+                    confirmationStatus="finalized" if confirmations >= 32 else "confirmed")
+
+
+def build_trade_transaction(fields, chain):
+    """
+    An unsigned `VersionedTransaction` for a trade-local request, built with `pump_transactions` on the curve of the
+    mint on `chain`. It is encoded like the local builds, so it is no reference for them: their encoding is checked
+    against `tests/fixtures/pump_trades.json`.
+    """
+    payer = Pubkey.from_string(fields["publicKey"])
+    mint = Pubkey.from_string(fields["mint"])
+    amount = fields["amount"]
+    in_sol = fields["denominatedInSol"] == "true"
+    if amount.endswith("%"):  # of the tokens held
+        amount = chain.holding(payer, mint) * float(amount[:-1]) / 100 / TOKEN_UNITS
+        if not amount:
+            raise ValueError("No tokens to sell")
+        in_sol = False
+    virtual_sol_reserves, virtual_token_reserves = chain.curve(mint)
+    return trade_transaction(payer, mint, fields["action"], float(amount), in_sol, float(fields["slippage"]),
+                             float(fields["priorityFee"]), chain.blockhash(), virtual_sol_reserves,
+                             virtual_token_reserves)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real endpoints
+    disable_nagle_algorithm = True  # headers and body are separate writes, a kept-alive socket would delay the body
+    endpoint: Endpoint = None
+    chain: Chain = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body: bytes, content_type="application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.handle_request(body)
+
+    def handle_request(self, body):
+        raise NotImplementedError
+
+
+class _TradeHandler(_Handler):
+    """pumpportal.fun/api/trade-local: form fields in, serialized unsigned transaction out."""
+
+    def handle_request(self, body):
+        outcome = self.endpoint.admit()
+        if outcome == "limited":
+            return self._reply(429, b"Too Many Requests", "text/plain")
+        if outcome == "error":
+            return self._reply(500, b"Internal Server Error", "text/plain")
+        fields = {key: values[0] for key, values in parse_qs(body.decode()).items()}
+        missing = [field for field in TRADE_FIELDS if field not in fields]
+        if missing:
+            return self._reply(400, f"Missing fields: {', '.join(missing)}".encode(), "text/plain")
+        try:
+            tx = build_trade_transaction(fields, self.chain)
+        except ValueError as e:
+            return self._reply(400, str(e).encode(), "text/plain")
+        self._reply(200, bytes(tx), "application/octet-stream")
+
+
+class _RpcHandler(_Handler):
+    """The JSON-RPC methods of the trading path: sendTransaction, getBalance, getLatestBlockhash and friends."""
+
+    def _result(self, request_id, result=None, error=None, status=200):
+        response = {"jsonrpc": "2.0", "id": request_id}
+        response.update({"error": error} if error else {"result": result})
+        self._reply(status, json.dumps(response).encode())
+
+    def handle_request(self, body):
+        try:
+            request = json.loads(body)
+            request_id, method, params = request.get("id"), request["method"], request.get("params", [])
+        except (ValueError, KeyError, AttributeError):
+            return self._result(None, error={"code": -32700, "message": "Parse error"})
+        outcome = self.endpoint.admit()
+        if outcome == "limited":
+            return self._result(request_id, error={"code": 429, "message": "Too many requests for a specific RPC "
+                                                   "call"}, status=429)
+        if outcome == "error":
+            return self._result(request_id, error={"code": -32005, "message": "Node is behind"})
+        handler = getattr(self, f"rpc_{method}", None)
+        if handler is None:
+            return self._result(request_id, error={"code": -32601, "message": "Method not found"})
+        try:
+            result = handler(*params)
+        except (ValueError, TypeError, IndexError) as e:
+            return self._result(request_id, error={"code": -32602, "message": f"Invalid params: {e}"})
+        if isinstance(result, dict) and "error" in result:
+            return self._result(request_id, error=result["error"])
+        self._result(request_id, result)
+
+    def _context(self, value):
+        return {"context": {"slot": self.chain.slot()}, "value": value}
+
+    def rpc_getHealth(self):
+        return "ok"
+
+    def rpc_getSlot(self, config=None):
+        return self.chain.slot()
+
+    def rpc_getBalance(self, pubkey, config=None):
+        Pubkey.from_string(pubkey)
+        return self._context(self.chain.balance)
+
+    def rpc_getLatestBlockhash(self, config=None):
+        slot = self.chain.slot()
+        return self._context({"blockhash": str(self.chain.blockhash(slot)),
+                              "lastValidBlockHeight": slot + BLOCKHASH_VALIDITY})
+
+    def rpc_sendTransaction(self, encoded, config=None):
+        encoding = (config or {}).get("encoding", "base58")
+        raw = base64.b64decode(encoded) if encoding == "base64" else base58.b58decode(encoded)
+        tx = VersionedTransaction.from_bytes(raw)
+        if not all(tx.verify_with_results()):
+            return {"error": {"code": -32003, "message": "Transaction signature verification failure"}}
+        if not self.chain.is_valid_blockhash(tx.message.recent_blockhash):
+            return {"error": {"code": -32002, "message": "Transaction simulation failed: Blockhash not found"}}
+        self.chain.receive(tx)
+        return str(tx.signatures[0])
+
+    def rpc_getSignatureStatuses(self, signatures, config=None):
+        if len(signatures) > MAX_SIGNATURE_STATUSES:
+            return {"error": {"code": -32602, "message": f"Too many inputs provided; max {MAX_SIGNATURE_STATUSES}"}}
+        return self._context([self.chain.status(signature) for signature in signatures])
+
+
+def self_signed_certificate(directory, host="127.0.0.1"):
+    """Write a certificate for `host` and its key into `directory`, return their paths. Clients must trust it."""
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, host)])
+    try:
+        alternative_name = x509.IPAddress(ipaddress.ip_address(host))
+    except ValueError:
+        alternative_name = x509.DNSName(host)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    certificate = (x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key())
+                   .serial_number(x509.random_serial_number())
+                   .not_valid_before(now - datetime.timedelta(minutes=1)).not_valid_after(now + datetime.timedelta(days=1))
+                   .add_extension(x509.SubjectAlternativeName([alternative_name]), critical=False)
+                   .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+                   .sign(key, hashes.SHA256()))
+    cert_path, key_path = os.path.join(directory, "mock.crt"), os.path.join(directory, "mock.key")
+    with open(cert_path, "wb") as f:
+        f.write(certificate.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                  serialization.NoEncryption()))
+    return cert_path, key_path
+
+
+def start_server(handler, endpoint: Endpoint, chain: Chain, host: str, port: int, certificate=None):
+    """
+    Serve `endpoint` on a background thread, over TLS with a `(cert_path, key_path)` certificate. Return the server
+    (its address is `server.server_address`).
+    """
+    handler = type(handler.__name__, (handler,), {"endpoint": endpoint, "chain": chain})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    if certificate is not None:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(*certificate)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, name=f"mock-{endpoint.name}", daemon=True).start()
+    return server
+
+
+def start_rpc(chain, endpoint=None, host="127.0.0.1", port=0, certificate=None):
+    """Start an RPC mock on `chain`, e.g. another node of the cluster of `start_mock`, return `(rpc_url, server)`."""
+    server = start_server(_RpcHandler, endpoint or Endpoint("rpc"), chain, host, port, certificate)
+    scheme = "https" if certificate is not None else "http"
+    return f"{scheme}://{host}:{server.server_address[1]}/", server
+
+
+def start_mock(host="127.0.0.1", trade_port=0, rpc_port=0, trade=None, rpc=None, chain=None, certificate=None):
+    """
+    Start the trade-local and RPC mocks on one `Chain`, return `(trade_url, rpc_url, trade_server, rpc_server)`.
+    Port 0 picks a free one, with a `certificate` (see `self_signed_certificate`) they serve HTTPS.
+    """
+    chain = chain or Chain()
+    trade_server = start_server(_TradeHandler, trade or Endpoint("trade"), chain, host, trade_port, certificate)
+    rpc_url, rpc_server = start_rpc(chain, rpc, host, rpc_port, certificate)
+    scheme = "https" if certificate is not None else "http"
+    trade_url = f"{scheme}://{host}:{trade_server.server_address[1]}/api/trade-local"
+    return trade_url, rpc_url, trade_server, rpc_server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the PumpPortal trade-local API and a Solana RPC")
+    parser.add_argument("--host", help="Interface to listen on", default="127.0.0.1", type=str)
+    parser.add_argument("--trade_port", help="Port of the trade-local mock", default=8766, type=int)
+    parser.add_argument("--rpc_port", help="Port of the RPC mock", default=8899, type=int)
+    parser.add_argument("--trade_latency", help="Latency of trade-local: fixed:MS, uniform:MIN_MS,MAX_MS, exp:MEAN_MS "
+                        "or lognormal:MEDIAN_MS,SIGMA", default="lognormal:120,0.4", type=str)
+    parser.add_argument("--rpc_latency", help="Latency of the RPC, same forms as --trade_latency",
+                        default="lognormal:80,0.5", type=str)
+    parser.add_argument("--trade_error_rate", help="Fraction of trade-local requests failing with a 500", default=0.0,
+                        type=float)
+    parser.add_argument("--rpc_error_rate", help="Fraction of RPC requests failing with a node error", default=0.0,
+                        type=float)
+    parser.add_argument("--trade_rate_limit", help="Trade-local requests per second before 429s, 0 for no limit",
+                        default=0.0, type=float)
+    parser.add_argument("--rpc_rate_limit", help="RPC requests per second before 429s, 0 for no limit", default=0.0,
+                        type=float)
+    parser.add_argument("--balance", help="SOL balance reported for every wallet", default=10.0, type=float)
+    parser.add_argument("--confirmation_slots", help="Slots until a sent transaction is confirmed", default=2,
+                        type=int)
+    parser.add_argument("--seed", help="Seed of the latencies, errors and blockhashes", default=7, type=int)
+    parser.add_argument("--tls", help="Serve HTTPS with a self-signed certificate, to include the TLS handshakes",
+                        action="store_true")
+    args = parser.parse_args()
+
+    try:
+        trade = Endpoint("trade", args.trade_latency, args.trade_error_rate, args.trade_rate_limit, args.seed)
+        rpc = Endpoint("rpc", args.rpc_latency, args.rpc_error_rate, args.rpc_rate_limit, args.seed + 1)
+    except ValueError as e:
+        parser.error(str(e))
+    chain = Chain(args.balance, args.confirmation_slots, args.seed)
+    certificate = None
+    if args.tls:
+        certificate = self_signed_certificate(tempfile.mkdtemp(prefix="mock-solana-"), args.host)
+    trade_url, rpc_url, *_ = start_mock(args.host, args.trade_port, args.rpc_port, trade, rpc, chain, certificate)
+    print(f"Mock trade-local on {trade_url}, mock RPC on {rpc_url}")
+    if certificate is not None:
+        print(f"Trust its certificate with REQUESTS_CA_BUNDLE={certificate[0]}")
+    print(f"Point the trading path at them with GEM_FINDER_TRADE_URL={trade_url} GEM_FINDER_RPC_URL={rpc_url}")
+    try:
+        while True:
+            time.sleep(REPORT_INTERVAL)
+            print(" | ".join(f"{endpoint.name}: " + ", ".join(f"{count:,} {name}"
+                                                               for name, count in endpoint.counts.items())
+                             for endpoint in (trade, rpc)))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,86 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+MAX_ORDERS_IN_FLIGHT = 4
+
+
+def loop_loggers(loggers):
+    """
+    Loggers usable from the order threads: the messages are logged on the event loop, where the GUI's can touch
+    their widgets.
+    """
+    loop = asyncio.get_running_loop()
+    return SimpleNamespace(
+        log_general_message=lambda msg: loop.call_soon_threadsafe(loggers.log_general_message, msg),
+        log_transaction_message=lambda msg: loop.call_soon_threadsafe(loggers.log_transaction_message, msg))
+
+
+class OrderExecutor:
+    """
+    Runs blocking order submissions (HTTP calls to build, sign and send a transaction) off the event loop.
+
+    `submit` returns at once: the order waits in the queue until one of the `max_in_flight` slots is free, then runs
+    on a worker thread, and its result is handed back to `on_done` (or the exception to `on_error`) on the event
+    loop, so the callbacks can update the engine state without locks. There is at most one order per mint at a
+    time, a second one submitted while the first is queued or running is dropped. A cancelled order calls
+    `on_error` with the `CancelledError`, a running one may still complete on its thread.
+    """
+
+    def __init__(self, max_in_flight: int = MAX_ORDERS_IN_FLIGHT):
+        self.max_in_flight = max_in_flight
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._threads = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="order")
+        self._orders = dict()  # mint -> task of its queued or running order
+        self.in_flight = 0
+        self.submitted = 0
+        self.deduplicated = 0
+        self.failed = 0
+
+    def pending(self, mint) -> bool:
+        return mint in self._orders
+
+    @property
+    def queued(self) -> int:
+        return len(self._orders) - self.in_flight
+
+    def submit(self, mint, order, on_done, on_error) -> bool:
+        """Queue `order()`, return False if the mint already has an order queued or running."""
+        if mint in self._orders:
+            self.deduplicated += 1
+            return False
+        self.submitted += 1
+        self._orders[mint] = asyncio.create_task(self._run(mint, order, on_done, on_error))
+        return True
+
+    async def _run(self, mint, order, on_done, on_error):
+        try:
+            async with self._slots:
+                self.in_flight += 1
+                try:
+                    result = await asyncio.get_running_loop().run_in_executor(self._threads, order)
+                finally:
+                    self.in_flight -= 1
+        except asyncio.CancelledError:
+            self._orders.pop(mint, None)
+            on_error(asyncio.CancelledError("the order was cancelled"))
+            raise
+        except Exception as e:
+            self.failed += 1
+            self._orders.pop(mint, None)
+            on_error(e)
+        else:
+            self._orders.pop(mint, None)
+            on_done(result)
+
+    async def drain(self):
+        """Wait for the queued and running orders, and their callbacks, to complete."""
+        while self._orders:
+            await asyncio.gather(*self._orders.values(), return_exceptions=True)
+
+    def close(self):
+        """Drop the queued orders, the running ones complete on their threads without calling `on_done`."""
+        for task in self._orders.values():
+            task.cancel()
+        self._orders = dict()
+        self._threads.shutdown(wait=False)
@@ -0,0 +1,87 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import http_pool
+
+ARM_PROXIMITY = 1.0  # see `CompiledConditions.near_miss`: by default armed when all the sub-conditions hold but one
+PREFETCH_TTL = 5.0  # seconds a prefetched transaction is used for, its slippage bound is from when it was built
+MAX_PREFETCHED = 8  # transactions prefetched at once, the tokens armed beyond it are not prefetched
+MAX_PREFETCHES_IN_FLIGHT = 2
+
+
+class TransactionPrefetcher:
+    """
+    Builds and signs the buy transaction of "armed" tokens, the ones about to satisfy an enter condition, ahead of
+    time, so their order only has to send it: the trade-local round trip is off the critical path.
+
+    `prefetch` starts building a transaction on a worker thread, `take` hands it to the order, waiting for it if it
+    is still being built. A transaction not taken within `ttl` seconds is thrown away, the price it was built for
+    is outdated by then.
+    """
+
+    def __init__(self, ttl: float = PREFETCH_TTL, max_prefetched: int = MAX_PREFETCHED):
+        self.ttl = ttl
+        self.max_prefetched = max_prefetched
+        self._threads = ThreadPoolExecutor(max_workers=MAX_PREFETCHES_IN_FLIGHT, thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        self._transactions = dict()  # mint -> (expiry, future of the signed transaction)
+        self.prefetched = 0
+        self.used = 0
+        self.expired = 0
+        self.failed = 0
+
+    def _discard_expired(self, now):
+        for mint in [mint for mint, (expiry, _) in self._transactions.items() if expiry <= now]:
+            _, future = self._transactions.pop(mint)
+            future.cancel()
+            self.expired += 1
+
+    def armed(self, mint) -> bool:
+        """Whether a transaction of `mint` is prefetched and still fresh."""
+        with self._lock:
+            entry = self._transactions.get(mint)
+            return entry is not None and entry[0] > time.monotonic()
+
+    def prefetch(self, mint, build) -> bool:
+        """Run `build()`, which returns the signed transaction, in the background. False if it is not prefetched."""
+        now = time.monotonic()
+        with self._lock:
+            self._discard_expired(now)
+            if mint in self._transactions or len(self._transactions) >= self.max_prefetched:
+                return False
+            self._transactions[mint] = (now + self.ttl, self._threads.submit(build))
+            self.prefetched += 1
+            return True
+
+    def take(self, mint):
+        """The fresh prefetched transaction of `mint`, or None. Blocks while it is being built."""
+        with self._lock:
+            expiry, future = self._transactions.pop(mint, (None, None))
+        if future is None:
+            return None
+        if expiry <= time.monotonic():
+            future.cancel()
+            with self._lock:
+                self.expired += 1
+            return None
+        try:
+            transaction = future.result(timeout=http_pool.TIMEOUT)
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            return None
+        with self._lock:
+            self.used += 1
+        return transaction
+
+    def close(self):
+        with self._lock:
+            for _, future in self._transactions.values():
+                future.cancel()
+            self.expired += len(self._transactions)
+            self._transactions = dict()
+        self._threads.shutdown(wait=False)
+
+    def summary(self):
+        return (f"Prefetched {self.prefetched} buy transactions: {self.used} used, {self.expired} expired, "
+                f"{self.failed} failed")
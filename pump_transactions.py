@@ -0,0 +1,239 @@
+import struct
+import threading
+import time
+from functools import lru_cache
+import requests
+from solders.compute_budget import set_compute_unit_limit, set_compute_unit_price
+from solders.hash import Hash
+from solders.instruction import AccountMeta, Instruction
+from solders.keypair import Keypair
+from solders.message import MessageV0
+from solders.pubkey import Pubkey
+from solders.signature import Signature
+from solders.transaction import VersionedTransaction
+import http_pool
+
+PUMP_PROGRAM_ID = Pubkey.from_string("6EF8rrecthR5Dkzon8Nwu78hRvfCKubJ14M5uBEwF6P")
+PUMP_FEE_RECIPIENT = Pubkey.from_string("CebN5WGQ4jvEPvsVU4EoHEpgzq1VV7AbicfhtW4xC9iM")
+SYSTEM_PROGRAM_ID = Pubkey.from_string("11111111111111111111111111111111")
+TOKEN_PROGRAM_ID = Pubkey.from_string("TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA")
+ASSOCIATED_TOKEN_PROGRAM_ID = Pubkey.from_string("ATokenGPvbdGVxr1b2hvZbsiqW5xWH25efTNsLJA8knL")
+RENT_SYSVAR_ID = Pubkey.from_string("SysvarRent111111111111111111111111111111111")
+PUMP_GLOBAL = Pubkey.find_program_address([b"global"], PUMP_PROGRAM_ID)[0]
+PUMP_EVENT_AUTHORITY = Pubkey.find_program_address([b"__event_authority"], PUMP_PROGRAM_ID)[0]
+BUY_DISCRIMINATOR = bytes([102, 6, 61, 18, 1, 218, 235, 234])
+SELL_DISCRIMINATOR = bytes([51, 230, 133, 164, 1, 127, 131, 173])
+CREATE_IDEMPOTENT = bytes([1])  # associated token program instruction
+COMPUTE_UNIT_LIMIT = 100_000
+FEE_BASIS_POINTS = 100  # pump's trading fee, 1%
+LAMPORTS_PER_SOL = 1_000_000_000
+TOKEN_UNITS = 1_000_000  # pump tokens have 6 decimals
+INITIAL_VIRTUAL_SOL_RESERVES = 30 * LAMPORTS_PER_SOL
+INITIAL_VIRTUAL_TOKEN_RESERVES = 1_073_000_000 * TOKEN_UNITS
+BLOCKHASH_REFRESH = 2.0  # seconds between two refreshes of the cached blockhash
+BLOCKHASH_MAX_AGE = 30.0  # seconds a cached blockhash is used for, it is valid for about 60
+
+
+@lru_cache(maxsize=4096)
+def associated_token_address(owner: Pubkey, mint: Pubkey) -> Pubkey:
+    return Pubkey.find_program_address([bytes(owner), bytes(TOKEN_PROGRAM_ID), bytes(mint)],
+                                       ASSOCIATED_TOKEN_PROGRAM_ID)[0]
+
+
+@lru_cache(maxsize=4096)
+def bonding_curve_accounts(mint: Pubkey):
+    """The bonding curve of `mint` and the token account holding its tokens."""
+    bonding_curve = Pubkey.find_program_address([b"bonding-curve", bytes(mint)], PUMP_PROGRAM_ID)[0]
+    return bonding_curve, associated_token_address(bonding_curve, mint)
+
+
+def buy_quote(lamports: int, virtual_sol_reserves: int, virtual_token_reserves: int) -> int:
+    """Token units bought for `lamports`, the fee included, on a curve with these virtual reserves."""
+    lamports = lamports * 10_000 // (10_000 + FEE_BASIS_POINTS)
+    return virtual_token_reserves * lamports // (virtual_sol_reserves + lamports)
+
+
+def buy_cost(tokens: int, virtual_sol_reserves: int, virtual_token_reserves: int) -> int:
+    """Lamports, the fee included, to buy `tokens` units."""
+    lamports = virtual_sol_reserves * tokens // (virtual_token_reserves - tokens) + 1
+    return lamports + lamports * FEE_BASIS_POINTS // 10_000
+
+
+def sell_quote(tokens: int, virtual_sol_reserves: int, virtual_token_reserves: int) -> int:
+    """Lamports received for `tokens` units, the fee deducted."""
+    lamports = virtual_sol_reserves * tokens // (virtual_token_reserves + tokens)
+    return lamports - lamports * FEE_BASIS_POINTS // 10_000
+
+
+def _trade_instruction(discriminator, payer, mint, tokens, sol_limit, programs):
+    bonding_curve, associated_bonding_curve = bonding_curve_accounts(mint)
+    accounts = [AccountMeta(PUMP_GLOBAL, False, False), AccountMeta(PUMP_FEE_RECIPIENT, False, True),
+                AccountMeta(mint, False, False), AccountMeta(bonding_curve, False, True),
+                AccountMeta(associated_bonding_curve, False, True),
+                AccountMeta(associated_token_address(payer, mint), False, True), AccountMeta(payer, True, True)]
+    accounts += [AccountMeta(program, False, False) for program in programs]
+    accounts += [AccountMeta(PUMP_EVENT_AUTHORITY, False, False), AccountMeta(PUMP_PROGRAM_ID, False, False)]
+    return Instruction(PUMP_PROGRAM_ID, discriminator + struct.pack("<QQ", tokens, sol_limit), accounts)
+
+
+def trade_transaction(payer: Pubkey, mint: Pubkey, action: str, amount: float, denominated_in_sol: bool,
+                      slippage: float, priority_fee: float, blockhash: Hash, virtual_sol_reserves: int,
+                      virtual_token_reserves: int) -> VersionedTransaction:
+    """
+    The unsigned transaction of a pump bonding-curve trade, like the trade-local API builds it: the priority fee as
+    compute budget, the buyer's token account created if missing, then the buy or sell with its slippage bound.
+
+    `amount` is in SOL or in tokens, the virtual reserves (lamports and token units) are the curve's, the price of
+    the trade. The accounts follow the bonding curve program's original interface, any change of it on chain has to
+    be mirrored here.
+    """
+    if action not in ("buy", "sell"):
+        raise ValueError(f"Invalid action {action!r}")
+    if action == "buy":
+        if denominated_in_sol:
+            lamports = round(amount * LAMPORTS_PER_SOL)
+            tokens = buy_quote(lamports, virtual_sol_reserves, virtual_token_reserves)
+        else:
+            tokens = round(amount * TOKEN_UNITS)
+            lamports = buy_cost(tokens, virtual_sol_reserves, virtual_token_reserves)
+        sol_limit = int(lamports * (1 + slippage / 100))  # most SOL spent
+        instructions = [Instruction(ASSOCIATED_TOKEN_PROGRAM_ID, CREATE_IDEMPOTENT, [
+                            AccountMeta(payer, True, True),
+                            AccountMeta(associated_token_address(payer, mint), False, True),
+                            AccountMeta(payer, False, False), AccountMeta(mint, False, False),
+                            AccountMeta(SYSTEM_PROGRAM_ID, False, False), AccountMeta(TOKEN_PROGRAM_ID, False, False)]),
+                        _trade_instruction(BUY_DISCRIMINATOR, payer, mint, tokens, sol_limit,
+                                           (SYSTEM_PROGRAM_ID, TOKEN_PROGRAM_ID, RENT_SYSVAR_ID))]
+    else:
+        if denominated_in_sol:
+            raise ValueError("Sells are denominated in tokens")
+        tokens = round(amount * TOKEN_UNITS)
+        sol_limit = int(sell_quote(tokens, virtual_sol_reserves, virtual_token_reserves) * (1 - slippage / 100))
+        instructions = [_trade_instruction(SELL_DISCRIMINATOR, payer, mint, tokens, sol_limit,
+                                           (SYSTEM_PROGRAM_ID, ASSOCIATED_TOKEN_PROGRAM_ID, TOKEN_PROGRAM_ID))]
+    micro_lamports = int(priority_fee * LAMPORTS_PER_SOL * 1_000_000 / COMPUTE_UNIT_LIMIT)
+    message = MessageV0.try_compile(payer, [set_compute_unit_limit(COMPUTE_UNIT_LIMIT),
+                                            set_compute_unit_price(micro_lamports)] + instructions, [], blockhash)
+    return VersionedTransaction.populate(message, [Signature.default()])
+
+
+def parse_trade(tx: VersionedTransaction):
+    """`(action, payer, mint, token units, SOL limit in lamports)` of a pump trade transaction, or None."""
+    message = tx.message
+    keys = message.account_keys
+    for instruction in message.instructions:
+        if keys[instruction.program_id_index] != PUMP_PROGRAM_ID:
+            continue
+        data = bytes(instruction.data)
+        action = {BUY_DISCRIMINATOR: "buy", SELL_DISCRIMINATOR: "sell"}.get(data[:8])
+        if action is None or len(data) < 24:
+            continue
+        tokens, sol_limit = struct.unpack_from("<QQ", data, 8)
+        return action, keys[instruction.accounts[6]], keys[instruction.accounts[2]], tokens, sol_limit
+    return None
+
+
+class BlockhashCache:
+    """
+    The latest blockhash of an RPC endpoint, refreshed every `interval` seconds on a background thread so building
+    a transaction does not wait for it. `get` only fetches one itself when the cached one is too old.
+    """
+
+    def __init__(self, rpc_url, interval: float = BLOCKHASH_REFRESH):
+        self.rpc_url = rpc_url  # an url or a callable returning one, e.g. the best ranked endpoint
+        self.interval = interval
+        self._blockhash = None
+        self._fetched = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _fetch(self):
+        rpc_url = self.rpc_url() if callable(self.rpc_url) else self.rpc_url
+        response = http_pool.post(rpc_url, json={"jsonrpc": "2.0", "id": 1, "method": "getLatestBlockhash",
+                                                 "params": [{"commitment": "confirmed"}]})
+        blockhash = Hash.from_string(response.json()["result"]["value"]["blockhash"])
+        with self._lock:
+            self._blockhash, self._fetched = blockhash, time.monotonic()
+        return blockhash
+
+    def _refresh(self):
+        while not self._stop.is_set():
+            try:
+                self._fetch()
+            except (requests.RequestException, ValueError, KeyError, TypeError):
+                pass  # `get` fetches it if the cached one gets too old
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._refresh, name="blockhash", daemon=True)
+            self._thread.start()
+        return self
+
+    def get(self) -> Hash:
+        with self._lock:
+            blockhash, fetched = self._blockhash, self._fetched
+        if blockhash is None or time.monotonic() - fetched > BLOCKHASH_MAX_AGE:
+            return self._fetch()
+        return blockhash
+
+    def close(self):
+        self._stop.set()
+
+
+class LocalBuilder:
+    """
+    Builds and signs pump bonding-curve trades locally instead of asking the trade-local API, saving its round trip:
+    the blockhash comes from a `BlockhashCache`, the price from the virtual reserves of the data feed.
+
+    A sell needs the exact amount held, only known for the tokens bought through this builder: the caller records
+    a buy with `bought` once its transaction went through, and drops the holdings with `forget` once they are sold.
+    The other tokens, like the ones of migrated pools, are left to the trade-local API.
+    """
+
+    def __init__(self, keypair: Keypair, blockhashes: BlockhashCache):
+        self.keypair = keypair
+        self.payer = keypair.pubkey()
+        self.blockhashes = blockhashes
+        self._holdings = dict()  # mint -> token units bought and not sold yet
+        self._lock = threading.Lock()
+        self.built = 0
+
+    def _sign(self, tx):
+        self.built += 1
+        return VersionedTransaction(tx.message, [self.keypair])
+
+    def buy(self, mint: str, sol_amount: float, slippage, priority_fee, virtual_sol_reserves: float,
+            virtual_token_reserves: float) -> VersionedTransaction:
+        """The signed buy of `sol_amount` SOL of `mint`, the virtual reserves in SOL and tokens as in the feed."""
+        tx = trade_transaction(self.payer, Pubkey.from_string(mint), "buy", sol_amount, True, float(slippage),
+                               float(priority_fee), self.blockhashes.get(),
+                               round(virtual_sol_reserves * LAMPORTS_PER_SOL),
+                               round(virtual_token_reserves * TOKEN_UNITS))
+        return self._sign(tx)
+
+    def bought(self, mint: str, tx: VersionedTransaction):
+        """Add the tokens of `tx`, a buy from `buy` that went through, to the holdings of `mint`."""
+        tokens = parse_trade(tx)[3]
+        mint = Pubkey.from_string(mint)
+        with self._lock:
+            self._holdings[mint] = self._holdings.get(mint, 0) + tokens
+
+    def sell(self, mint: str, slippage, priority_fee, virtual_sol_reserves: float, virtual_token_reserves: float):
+        """The signed sell of all the tokens of `mint` recorded with `bought`, or None if there are none."""
+        mint = Pubkey.from_string(mint)
+        with self._lock:
+            tokens = self._holdings.get(mint, 0)
+        if not tokens:
+            return None
+        tx = trade_transaction(self.payer, mint, "sell", tokens / TOKEN_UNITS, False, float(slippage),
+                               float(priority_fee), self.blockhashes.get(),
+                               round(virtual_sol_reserves * LAMPORTS_PER_SOL),
+                               round(virtual_token_reserves * TOKEN_UNITS))
+        return self._sign(tx)
+
+    def forget(self, mint: str):
+        """Drop the holdings of `mint`, once they are sold."""
+        with self._lock:
+            self._holdings.pop(Pubkey.from_string(mint), None)
@@ -0,0 +1,159 @@
+import gzip
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+SESSION_FORMAT = 1
+CHUNK_FRAMES = 4096  # max. frames compressed into one gzip member
+FLUSH_INTERVAL = 1.0  # seconds, a chunk is written at least this often while frames arrive
+POLL_INTERVAL = 0.02  # seconds the writer thread sleeps when it has nothing to write
+QUEUE_SIZE = 100_000  # frames buffered between the event loop and the writer thread
+MAX_FILE_BYTES = 64 * 1024 * 1024  # compressed bytes per session file before rotating
+MAX_FILE_SECONDS = 3600  # seconds per session file before rotating
+COMPRESS_LEVEL = 6
+RECORDINGS_DIRECTORY = "recordings"  # where the GUI records its sessions
+
+
+class SessionRecorder:
+    """
+    Append-only recorder of raw websocket frames.
+
+    `record` only timestamps the frame and appends it to a deque that a background thread drains, so it takes no lock
+    and never blocks the event loop. When the bounded buffer is full the frame is dropped and counted in `dropped`.
+    The writer thread compresses up to `chunk_frames` frames into one gzip member and appends it to the current file.
+    Concatenated gzip members are a valid gzip stream, so a file can be read while it is being written, and a crash
+    loses at most the last chunk.
+    Files rotate after `max_bytes` compressed bytes or `max_seconds` seconds.
+
+    Every file starts with a header line `# {json}` holding the format version and the wall clock at the monotonic
+    origin. It is followed by one `monotonic_timestamp<TAB>raw_frame` line per frame.
+    """
+
+    def __init__(self, directory, max_bytes=MAX_FILE_BYTES, max_seconds=MAX_FILE_SECONDS, chunk_frames=CHUNK_FRAMES,
+                 queue_size=QUEUE_SIZE, compress_level=COMPRESS_LEVEL):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.chunk_frames = chunk_frames
+        self.compress_level = compress_level
+        self.queue_size = queue_size
+        self.frames = deque()
+        self.recorded = 0
+        self.dropped = 0
+        self.files = list()
+        self.error = None
+        self._file = None
+        self._file_bytes = 0
+        self._file_opened = 0
+        self._thread = None
+        self._stopping = False
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._writer, name="session-recorder", daemon=True)
+        self._thread.start()
+        return self
+
+    def record(self, raw):
+        if len(self.frames) < self.queue_size:
+            self.frames.append((time.monotonic(), raw))
+        else:
+            self.dropped += 1
+
+    def close(self):
+        """Write the buffered frames and stop the writer thread."""
+        if self._thread is None:
+            return
+        self._stopping = True
+        self._thread.join()
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # === Writer thread ===
+
+    def _open(self):
+        name = f"session-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{len(self.files):04d}.log.gz"
+        path = os.path.join(self.directory, name)
+        self._file = open(path, "ab")
+        self._file_bytes = 0
+        self._file_opened = time.monotonic()
+        self.files.append(path)
+        header = {"format": SESSION_FORMAT, "wall_time": time.time(), "monotonic": time.monotonic()}
+        self._write(f"# {json.dumps(header)}\n")
+
+    def _write(self, text):
+        member = gzip.compress(text.encode("utf-8"), compresslevel=self.compress_level)
+        self._file.write(member)
+        self._file.flush()
+        self._file_bytes += len(member)
+
+    def _rotate_if_needed(self):
+        if (self._file is None or self._file_bytes >= self.max_bytes
+                or time.monotonic() - self._file_opened >= self.max_seconds):
+            if self._file is not None:
+                self._file.close()
+            self._open()
+
+    def _write_chunk(self, chunk):
+        lines = []
+        for ts, raw in chunk:
+            if isinstance(raw, bytes):
+                raw = raw.decode("utf-8")
+            if "\n" in raw:
+                raw = raw.replace("\n", " ")  # JSON escapes newlines inside strings, these are whitespace
+            lines.append(f"{ts:.6f}\t{raw}\n")
+        self._rotate_if_needed()
+        self._write("".join(lines))
+        self.recorded += len(chunk)
+
+    def _writer(self):
+        frames = self.frames
+        chunk = []
+        chunk_started = 0
+        try:
+            while True:
+                stopping = self._stopping  # read before draining, frames recorded before close() are not lost
+                while frames and len(chunk) < self.chunk_frames:
+                    if not chunk:
+                        chunk_started = time.monotonic()
+                    chunk.append(frames.popleft())
+                if chunk and (stopping or len(chunk) >= self.chunk_frames
+                              or time.monotonic() - chunk_started >= FLUSH_INTERVAL):
+                    self._write_chunk(chunk)
+                    chunk = []
+                    continue
+                if stopping and not frames:
+                    break
+                time.sleep(POLL_INTERVAL)
+        except Exception as e:
+            self.error = e
+            print(f"Session recorder stopped: {e}")
+        finally:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def read_session(path):
+    """Return the header of a recorded session file and an iterator over its `(monotonic_timestamp, raw)` frames."""
+    f = gzip.open(path, "rt", encoding="utf-8")
+    header = json.loads(f.readline()[2:])
+
+    def frames():
+        with f:
+            try:
+                for line in f:
+                    ts, raw = line.rstrip("\n").split("\t", 1)
+                    yield float(ts), raw
+            except EOFError:
+                pass  # the last chunk was cut short, e.g. the recording process was killed
+
+    return header, frames()
@@ -0,0 +1,151 @@
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import base
+import engine
+import headless
+from base import VirtualClock
+from recorder import read_session
+
+_TX_TYPE = re.compile(r'"txType"\s*:\s*"(\w+)"')
+_MINT = re.compile(r'"mint"\s*:\s*"(\w+)"')
+
+
+class ReplayFinished(Exception):
+    """Raised by `ReplaySocket.recv` once every recorded frame has been delivered."""
+
+
+def session_frames(paths):
+    """Frames of the given session files in order, with their monotonic timestamps mapped back to the wall clock."""
+    for path in paths:
+        header, frames = read_session(path)
+        offset = header["wall_time"] - header["monotonic"]
+        for ts, raw in frames:
+            yield ts + offset, raw
+
+
+class ReplaySocket:
+    """
+    Stand-in for the PumpPortal websocket that plays recorded session files back through `subscribe`.
+
+    Only the frames the engine subscribed to are delivered: token creations while subscribed to new tokens and the
+    trades of the subscribed mints. Before each frame the virtual clock is advanced to the frame's receive time, and
+    the previous frame is left to `processor` first, so every decision sees the same clock as it did live.
+
+    `speed` is the replay speed relative to real time, 0 replays as fast as possible.
+    """
+
+    def __init__(self, paths, clock: VirtualClock, speed: float = 0):
+        self.frames = session_frames(paths)
+        self.clock = clock
+        self.speed = speed
+        self.new_tokens = False
+        self.mints = set()
+        self.delivered = 0
+        self.skipped = 0
+        self.start_time = clock.time()
+        self._last_frame_time = None
+        self._last_wall_time = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+    async def send(self, message):
+        payload = json.loads(message)
+        method = payload["method"]
+        if method == "subscribeNewToken":
+            self.new_tokens = True
+        elif method == "unsubscribeNewToken":
+            self.new_tokens = False
+        elif method == "subscribeTokenTrade":
+            self.mints.update(payload["keys"])
+        elif method == "unsubscribeTokenTrade":
+            self.mints.difference_update(payload["keys"])
+
+    async def ping(self):
+        pass
+
+    def _subscribed(self, raw):
+        """Whether the engine subscribed to a frame, read from the raw text as most frames are not delivered."""
+        tx_type = _TX_TYPE.search(raw)
+        if tx_type is not None and tx_type.group(1) == "create":
+            return self.new_tokens
+        mint = _MINT.search(raw)
+        return mint is not None and mint.group(1) in self.mints
+
+    async def recv(self):
+        while engine.queue.qsize():  # let processor handle the previous frame at its own time
+            await asyncio.sleep(0)
+        await asyncio.sleep(0)  # and the tasks it started (e.g. a trade finalization) take their first step
+        for frame_time, raw in self.frames:
+            if not self._subscribed(raw):
+                self.skipped += 1
+                continue
+            if self.speed > 0 and self._last_frame_time is not None:
+                delay = (frame_time - self._last_frame_time) / self.speed - (time.monotonic() - self._last_wall_time)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            self._last_frame_time = frame_time
+            self._last_wall_time = time.monotonic()
+            await self.clock.advance(frame_time)
+            self.delivered += 1
+            return raw
+        self.clock.run_free()
+        raise ReplayFinished(f"Replay finished after {self.delivered} frames")
+
+
+async def replay(paths, enter_conditions, exit_conditions, cfg, loggers, speed: float = 0, seed: int | None = None):
+    """
+    Run `subscribe` on recorded sessions under a virtual clock and return the replay socket for its counters.
+
+    With the same `seed`, the simulated trade finalization times are drawn identically and so are the decisions.
+    """
+    if seed is not None:
+        random.seed(seed)
+    first_frame_time = next(session_frames(paths[:1]), (0.0, None))[0]
+    clock = VirtualClock(first_frame_time)
+    previous_clock = base.clock
+    base.set_clock(clock)
+    socket = ReplaySocket(paths, clock, speed)
+    engine.reset_globals()
+    try:
+        await engine.subscribe(enter_conditions, exit_conditions, loggers, cfg, connect=lambda uri: socket)
+    except ReplayFinished:
+        pass
+    finally:
+        base.set_clock(previous_clock)
+    return socket
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded sessions through a Gem-Finder strategy")
+    parser.add_argument("--strategy", help="Strategy JSON exported from the GUI", required=True, type=str)
+    parser.add_argument("--sessions", help="Session files recorded with --record", required=True, nargs="+", type=str)
+    parser.add_argument("--speed", help="Replay speed relative to real time, 0 replays as fast as possible",
+                        default=0, type=float)
+    parser.add_argument("--seed", help="Seed of the simulated trade finalization times", default=7, type=int)
+    parser.add_argument("--log_file", help="Write the logs to this file instead of stdout", default=None, type=str)
+    args = parser.parse_args()
+
+    headless.setup_logging(args.log_file)
+    strategy = headless.load_strategy(args.strategy)
+    try:
+        enter_conditions, exit_conditions = headless.validate_strategy(strategy)
+    except ValueError as e:
+        headless.log_general_message(f"Warning: Invalid strategy! {e}")
+        raise SystemExit(1)
+
+    cfg = headless.build_config(strategy)
+    start = time.perf_counter()
+    socket = asyncio.run(replay(args.sessions, enter_conditions, exit_conditions, cfg, headless.loggers,
+                                args.speed, args.seed))
+    elapsed = time.perf_counter() - start
+    headless.report(cfg.sol_balance_widget, strategy["sol_balance"], socket.clock.time() - socket.start_time)
+    headless.log_general_message(f"Replayed {socket.delivered} frames ({socket.skipped} not subscribed) "
+                                 f"in {elapsed:.2f}s")
@@ -0,0 +1,201 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import headless
+
+RESULTS_VERSION = 1  # bump when a change to the simulation changes the results of an unchanged strategy
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+READ_CHUNK = 1024 * 1024
+SIMULATORS = ("event", "vector")  # backtest.py and vector_backtest.py, their results do not have the same shape
+
+# the strategy fields that make the decisions, the rest of an exported strategy (e.g. its name) is left out
+STRATEGY_FIELDS = ("enter_conditions", "exit_conditions", "buy_size", "max_slippage", "priority_fee", "sol_balance",
+                   "batch_reset_size", "inactivity_reset_time")
+
+
+def sessions_fingerprint(paths):
+    """Hash of the content of recorded session files, in order: the same data gives the same fingerprint."""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            while chunk := f.read(READ_CHUNK):
+                digest.update(chunk)
+        digest.update(b"\0")  # two files are not the same as their concatenation
+    return digest.hexdigest()
+
+
+def _canonical(value):
+    """Numbers as floats so that `8` and `8.0`, which the conditions compare the same way, hash the same."""
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _canonical(item) for key, item in value.items()}
+    raise TypeError(f"Unsupported strategy value: {value!r}")
+
+
+def _digest(value):
+    return hashlib.sha256(json.dumps(_canonical(value), sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+def strategy_hash(strategy):
+    return _digest({field: strategy[field] for field in STRATEGY_FIELDS})
+
+
+def conditions_hash(conditions):
+    """Hash of a list of enter or exit conditions alone, e.g. to share what only depends on the enter conditions."""
+    return _digest(conditions)
+
+
+def result_key(strategy, fingerprint: str, seed: int, stop_loss=None, simulator: str = "event"):
+    """Content address of the results of a strategy on a dataset with one of the `SIMULATORS` and its seed."""
+    if simulator not in SIMULATORS:
+        raise ValueError(f"Unknown simulator {simulator!r}")
+    payload = json.dumps([RESULTS_VERSION, simulator, strategy_hash(strategy), fingerprint, seed,
+                          None if stop_loss is None else float(stop_loss)])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def evict_least_recent(entries, max_bytes: int):
+    """Remove the least recently used of `(path, size, mtime)` files until they fit in `max_bytes`, return how many."""
+    entries = sorted(entries, key=lambda entry: entry[2])
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for path, size, _ in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
+
+
+class ResultCache:
+    """
+    Backtest results on disk, addressed by `result_key`.
+
+    Entries are grouped in one directory per dataset fingerprint, so the results of a dataset can be dropped at
+    once. Each hit refreshes the modification time of its entry, and `evict` removes the least recently used
+    entries until the cache fits in `max_bytes`. Writes go through a temporary file and a rename, so several
+    processes can share a cache.
+    """
+
+    def __init__(self, directory, max_bytes: int = MAX_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, fingerprint, key):
+        return os.path.join(self.directory, fingerprint[:16], f"{key}.json")
+
+    def get(self, fingerprint, key):
+        path = self._path(fingerprint, key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                results = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        # JSON has no tuples, the transcript is stored as lists
+        results["strategy_transcript"] = {mint: tuple(conditions)
+                                          for mint, conditions in results["strategy_transcript"].items()}
+        return results
+
+    def put(self, fingerprint, key, results, evict: bool = True):
+        path = self._path(fingerprint, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(results, f)
+        os.replace(tmp_path, path)
+        if evict:
+            self.evict()
+
+    def entries(self):
+        """`(path, size, mtime)` of every entry."""
+        entries = []
+        if os.path.isdir(self.directory):
+            for group in os.scandir(self.directory):
+                if group.is_dir():
+                    for entry in os.scandir(group.path):
+                        if entry.name.endswith(".json"):
+                            stat = entry.stat()
+                            entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits in `max_bytes`, return how many."""
+        return evict_least_recent(self.entries(), self.max_bytes)
+
+    def invalidate(self, fingerprint, key=None):
+        """Drop one entry, or every result of a dataset without `key`. Return how many entries were removed."""
+        if key is not None:
+            try:
+                os.remove(self._path(fingerprint, key))
+                return 1
+            except OSError:
+                return 0
+        group = os.path.join(self.directory, fingerprint[:16])
+        count = len([name for name in os.listdir(group) if name.endswith(".json")]) if os.path.isdir(group) else 0
+        shutil.rmtree(group, ignore_errors=True)
+        return count
+
+    def clear(self):
+        count = len(self.entries())
+        shutil.rmtree(self.directory, ignore_errors=True)
+        return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or invalidate the cache of backtest results")
+    parser.add_argument("--cache", help="Directory of the result cache", required=True, type=str)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("stats", help="Number of entries and size of the cache")
+    subparsers.add_parser("clear", help="Remove every cached result")
+    invalidate_parser = subparsers.add_parser("invalidate", help="Remove the cached results of some sessions")
+    invalidate_parser.add_argument("--sessions", help="Session files the results were computed on", required=True,
+                                   nargs="+", type=str)
+    invalidate_parser.add_argument("--strategy", help="Only remove the results of this strategy", default=None,
+                                   type=str)
+    invalidate_parser.add_argument("--seed", help="Seed of the results to remove (with --strategy)", default=7,
+                                   type=int)
+    invalidate_parser.add_argument("--stop_loss", help="Stop loss of the results to remove (with --strategy)",
+                                   default=None, type=float)
+    invalidate_parser.add_argument("--simulator", help="Backtest of the results to remove (with --strategy): event "
+                                   "for backtest.py, vector for vector_backtest.py and sweep.py", default="event",
+                                   choices=SIMULATORS)
+    evict_parser = subparsers.add_parser("evict", help="Remove the least recently used results above a size")
+    evict_parser.add_argument("--max_mb", help="Size to fit in", default=MAX_CACHE_BYTES / 1024 / 1024, type=float)
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        cache = ResultCache(args.cache)
+        entries = cache.entries()
+        print(f"{len(entries)} results, {sum(size for _, size, _ in entries) / 1024 / 1024:.1f} MB")
+    elif args.command == "clear":
+        print(f"Removed {ResultCache(args.cache).clear()} results")
+    elif args.command == "invalidate":
+        cache = ResultCache(args.cache)
+        fingerprint = sessions_fingerprint(args.sessions)
+        key = None
+        if args.strategy:
+            key = result_key(headless.load_strategy(args.strategy), fingerprint, args.seed, args.stop_loss,
+                             args.simulator)
+        print(f"Removed {cache.invalidate(fingerprint, key)} results")
+    elif args.command == "evict":
+        print(f"Removed {ResultCache(args.cache, int(args.max_mb * 1024 * 1024)).evict()} results")
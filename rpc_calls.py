@@ -1,36 +1,57 @@
+import os
 import time
 
-import requests
-import json
-from solana.rpc.api import Client
+import http_pool
+from confirmations import CONFIRMED
+from rpc_endpoints import parse_rpc_urls, rpc_endpoints
 from solders.pubkey import Pubkey
-from solders.solders import Keypair
+from solders.keypair import Keypair
 from solders.transaction import VersionedTransaction
 from solders.commitment_config import CommitmentLevel
 from solders.rpc.requests import SendVersionedTransaction
 from solders.rpc.config import RpcSendTransactionConfig
 
+PUMPPORTAL_TRADE_URL = "https://pumpportal.fun/api/trade-local"
+MAINNET_RPC_URL = "https://api.mainnet-beta.solana.com/"
+# point the trading path at other endpoints, e.g. mock_solana.py
+TRADE_URL_VARIABLE = "GEM_FINDER_TRADE_URL"
+RPC_URL_VARIABLE = "GEM_FINDER_RPC_URL"
+MAX_RETRIES = 5  # a trade failing this many more times is given up
+RETRY_DELAY = 3  # seconds
+
+
+def trade_url():
+    """The trade-local endpoint building the transactions, PumpPortal's unless overridden by GEM_FINDER_TRADE_URL."""
+    return os.environ.get(TRADE_URL_VARIABLE) or PUMPPORTAL_TRADE_URL
+
+
+def default_rpc_url():
+    """The RPC used when none is configured, mainnet's unless overridden by GEM_FINDER_RPC_URL."""
+    return os.environ.get(RPC_URL_VARIABLE) or MAINNET_RPC_URL
+
+
+def rpc_urls(rpc_url=""):
+    """The RPC endpoints of a `rpc_url` setting (one or several urls), the default one if it has none."""
+    return parse_rpc_urls(rpc_url) or [default_rpc_url()]
+
 
-client = Client("https://api.mainnet-beta.solana.com/")
 TOKEN_PROGRAM_ID = Pubkey.from_string("TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA")
 
 
-def get_balance(keypair: Keypair) -> float:
-    response = client.get_balance(keypair.pubkey())
-    data = response.to_json()
-    data = json.loads(data)
+def get_balance(keypair: Keypair, rpc_url="") -> float:
+    response = http_pool.post(rpc_endpoints(rpc_urls(rpc_url)).best(), json={
+        "jsonrpc": "2.0", "id": 1, "method": "getBalance", "params": [str(keypair.pubkey())]
+    })
+    data = response.json()
     sol_balance = data["result"]["value"] / 10 ** 9
 
     return sol_balance
 
 
-def complete_official_transaction(action: str, mint: str, keypair: Keypair, slippage, priority_fee,
-                                  denominated_in_sol: str, pool: str, amount=0.01,
-                                  rpc_url="https://api.mainnet-beta.solana.com/", loggers=None):
-    retries = 0
-    if rpc_url == "" or not rpc_url:
-        rpc_url = "https://api.mainnet-beta.solana.com/"
-    response = requests.post(url="https://pumpportal.fun/api/trade-local", data={
+def build_transaction(action: str, mint: str, keypair: Keypair, slippage, priority_fee, denominated_in_sol: str,
+                      pool: str, amount=0.01) -> VersionedTransaction:
+    """The transaction of a trade, built by the trade-local endpoint and signed with `keypair`."""
+    response = http_pool.post(url=trade_url(), data={
         "publicKey": str(keypair.pubkey()),
         "action": action,  # "buy" or "sell"
         "mint": mint,  # contract address of the token you want to trade
@@ -40,23 +61,41 @@ def complete_official_transaction(action: str, mint: str, keypair: Keypair, slip
         "priorityFee": priority_fee,  # amount to use as priority fee
         "pool": pool  # exchange to trade on. "pump", "raydium", "pump-amm" or "auto"
     })
-    tx = VersionedTransaction(VersionedTransaction.from_bytes(response.content).message, [keypair])
+    return VersionedTransaction(VersionedTransaction.from_bytes(response.content).message, [keypair])
+
+
+def complete_official_transaction(action: str, mint: str, keypair: Keypair, slippage, priority_fee,
+                                  denominated_in_sol: str, pool: str, amount=0.01,
+                                  rpc_url="", loggers=None, rpc_fanout=0, tx=None, confirmations=None):
+    """
+    Build (unless `tx`, signed ahead of time, is given), sign and send a trade. Returns the retries it took, raises
+    `RuntimeError` when the trade still failed after `MAX_RETRIES` of them.
+
+    With a `ConfirmationTracker` as `confirmations`, the trade only succeeds once its transaction is confirmed, one
+    failing or expiring is retried like one the RPC endpoints rejected. This blocks the calling thread, call it from
+    an order thread (see `OrderExecutor`), not from the event loop.
+    """
     config = RpcSendTransactionConfig(preflight_commitment=CommitmentLevel.Confirmed)
-    response = requests.post(
-        url=rpc_url,  # https://mainnet.helius-rpc.com/?api-key=<your-api-key>  // better with helius (more reliable)
-        headers={"Content-Type": "application/json"},
-        data=SendVersionedTransaction(tx, config).to_json()
-    )
-    try:
-        loggers.log_general_message(f"SUCCESS: {action.upper()} | {amount} | {mint} | {pool} | https://solscan.io/tx/{response.json()['result']}")
-    except KeyError:
-        if retries == 5:
-            loggers.log_general_message(f"FINAL FAILURE TO {action.upper()} {amount} of {mint} in pool '{pool}' after {retries} retries.")
+    for retries in range(MAX_RETRIES + 1):
+        if tx is None:
+            tx = build_transaction(action, mint, keypair, slippage, priority_fee, denominated_in_sol, pool, amount)
+        # sent to every endpoint (or the best `rpc_fanout`), e.g. https://mainnet.helius-rpc.com/?api-key=<your-api-key>
+        reply = rpc_endpoints(rpc_urls(rpc_url)).send_transaction(SendVersionedTransaction(tx, config).to_json(),
+                                                                   rpc_fanout)
+        signature = reply.get('result')
+        if signature is not None and confirmations is not None:
+            outcome, error = confirmations.track(signature).result()
+            if outcome != CONFIRMED:
+                loggers.log_general_message(f"{action.upper()} {amount} of {mint} {outcome}: https://solscan.io/tx/{signature}"
+                                            + (f" ({error})" if error is not None else ""))
+                signature = None
+        if signature is not None:
+            loggers.log_general_message(f"SUCCESS: {action.upper()} | {amount} | {mint} | {pool} | https://solscan.io/tx/{signature}")
             return retries
         loggers.log_general_message(f"FAILED TO {action.upper()} {amount} of {mint} in pool '{pool}'")
-        time.sleep(3)
-        loggers.log_general_message("Retrying...")
-        complete_official_transaction(action, mint, keypair, slippage, priority_fee, denominated_in_sol, pool, amount,
-                                      rpc_url, loggers)
-        retries += 1
-    return retries
+        if retries < MAX_RETRIES:
+            time.sleep(RETRY_DELAY)
+            loggers.log_general_message("Retrying...")
+            tx = None  # rebuilt, with a new blockhash and price
+    loggers.log_general_message(f"FINAL FAILURE TO {action.upper()} {amount} of {mint} in pool '{pool}' after {MAX_RETRIES} retries.")
+    raise RuntimeError(f"{action} of {mint} failed after {MAX_RETRIES} retries")
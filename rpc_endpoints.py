@@ -0,0 +1,236 @@
+import asyncio
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import requests
+import http_pool
+
+LATENCY_SMOOTHING = 0.2  # weight of the latest request in the moving average of an endpoint's latency
+MIN_SUCCESS_RATE = 0.1  # floor of the success rate when ranking, an endpoint that always fails still gets retried
+PROBE_INTERVAL = 5.0  # seconds between two probes of the endpoints
+MAX_SLOT_LAG = 10  # slots an endpoint can be behind the most recent one seen before it is ranked last
+
+
+def parse_rpc_urls(rpc_url):
+    """The RPC endpoints of a `rpc_url` setting: a list, or a string of urls separated by whitespace or commas."""
+    if isinstance(rpc_url, str):
+        rpc_url = re.split(r"[\s,]+", rpc_url)
+    return list(dict.fromkeys(url.strip() for url in rpc_url if url and url.strip()))
+
+
+class EndpointStats:
+    """What sending transactions to one RPC endpoint gave so far."""
+
+    def __init__(self, url):
+        self.url = url
+        self.sent = 0
+        self.accepted = 0  # answered with a signature
+        self.rejected = 0  # answered with a JSON-RPC error
+        self.failed = 0  # no usable answer: connection error, timeout, HTTP error status
+        self.first = 0  # accepted before the other endpoints the transaction was sent to
+        self.latency = None  # moving average of the seconds to an answer, None until one came
+        self.probes = 0
+        self.probe_errors = 0
+        self.probe_latency = None  # moving average of the seconds to answer a probe
+        self.slot = None  # last slot the endpoint reported
+        self.last_error = None
+
+    @property
+    def answered(self):
+        return self.accepted + self.rejected + self.failed
+
+    @property
+    def success_rate(self):
+        attempts = self.answered + self.probes
+        return (self.accepted + self.probes - self.probe_errors) / attempts if attempts else 1.0
+
+    def score(self):
+        """
+        Expected seconds to an accepted transaction, the lower the better: the latency of the transactions sent, or
+        of the probes until one was, over the success rate. Unmeasured endpoints come first, the ones that never
+        answered at all last.
+        """
+        latency = self.latency if self.latency is not None else self.probe_latency
+        if latency is None:
+            return float("inf") if self.answered or self.probes else 0.0
+        return latency / max(self.success_rate, MIN_SUCCESS_RATE)
+
+    def record(self, outcome, latency, error=None):
+        setattr(self, outcome, getattr(self, outcome) + 1)
+        if error is not None:
+            self.last_error = error
+        if outcome != "failed":  # a timeout says little about how fast the endpoint answers
+            self.latency = _smooth(self.latency, latency)
+
+    def record_probe(self, slot, latency, error=None):
+        self.probes += 1
+        if slot is None:
+            self.probe_errors += 1
+            self.last_error = error
+        else:
+            self.slot = slot
+            self.probe_latency = _smooth(self.probe_latency, latency)
+
+    def summary(self):
+        latency = "n/a" if self.latency is None else f"{self.latency * 1000:.0f} ms"
+        probe_latency = "n/a" if self.probe_latency is None else f"{self.probe_latency * 1000:.0f} ms"
+        return (f"{self.url} | sent {self.sent} | accepted {self.accepted} ({self.first} first) | "
+                f"rejected {self.rejected} | failed {self.failed} | avg latency {latency} | "
+                f"probes {self.probes} ({self.probe_errors} failed) | avg probe latency {probe_latency}")
+
+
+def _smooth(average, value):
+    return value if average is None else (1 - LATENCY_SMOOTHING) * average + LATENCY_SMOOTHING * value
+
+
+class RpcEndpoints:
+    """
+    Sends each signed transaction to several RPC endpoints at once and takes the first signature any of them returns.
+
+    A slow node or one dropping transactions then only delays an order when all the endpoints do. With a `fanout`
+    the transaction only goes to that many endpoints, the best ranked by their past latency and success rate
+    (endpoints not measured yet are tried first). Requests not started when a signature arrives are cancelled, the
+    ones already sent cannot be taken back and complete in the background, still counting in the statistics.
+
+    `start_probing` measures the endpoints in the background, so the ranking is known before the first order and
+    follows an endpoint that slows down or falls behind between two orders.
+    """
+
+    def __init__(self, urls):
+        self.urls = list(urls)
+        self.stats = {url: EndpointStats(url) for url in self.urls}
+        self.latest_slot = None
+        self._lock = threading.Lock()
+        self._threads = ThreadPoolExecutor(max_workers=len(self.urls) * http_pool.POOL_CONNECTIONS_PER_HOST,
+                                           thread_name_prefix="rpc")
+        self._probing = None
+
+    def slot_lag(self, url):
+        slot = self.stats[url].slot
+        return None if slot is None else self.latest_slot - slot
+
+    def ranked(self):
+        """The endpoints, best first. The ones behind the rest of the cluster come last, they drop transactions."""
+        with self._lock:
+            return sorted(self.urls, key=lambda url: ((self.slot_lag(url) or 0) > MAX_SLOT_LAG,
+                                                      self.stats[url].score()))
+
+    def best(self):
+        return self.ranked()[0]
+
+    def _send(self, url, payload):
+        start = time.perf_counter()
+        error = None
+        try:
+            response = http_pool.post(url, headers={"Content-Type": "application/json"}, data=payload)
+            reply = response.json()
+        except (requests.RequestException, ValueError) as e:
+            reply, error = None, e
+        latency = time.perf_counter() - start
+        if reply is not None and "result" in reply:
+            outcome = "accepted"
+        elif isinstance(reply, dict) and "error" in reply and response.status_code == 200:
+            outcome, error = "rejected", reply["error"]
+        else:
+            outcome, error = "failed", error or f"HTTP {response.status_code}"
+        with self._lock:
+            self.stats[url].record(outcome, latency, error)
+        return outcome, reply, error
+
+    def send_transaction(self, payload: str, fanout: int = 0):
+        """
+        Send a `sendTransaction` request to the endpoints, return the first reply holding a signature, or else the
+        last JSON-RPC error. Raises the last exception when no endpoint answered.
+        """
+        targets = self.ranked()[:fanout] if fanout else list(self.urls)
+        with self._lock:
+            for url in targets:
+                self.stats[url].sent += 1
+        pending = {self._threads.submit(self._send, url, payload): url for url in targets}
+        rejection, exception = None, None
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                url = pending.pop(future)
+                outcome, reply, error = future.result()
+                if outcome == "accepted":
+                    with self._lock:
+                        self.stats[url].first += 1
+                    for other in pending:
+                        other.cancel()
+                    return reply
+                if reply is not None:
+                    rejection = reply
+                elif isinstance(error, Exception):
+                    exception = error
+        if rejection is not None:
+            return rejection
+        raise exception
+
+    def summary(self):
+        with self._lock:
+            return [self.stats[url].summary() for url in self.urls]
+
+    def _probe(self, url):
+        start = time.perf_counter()
+        try:
+            response = http_pool.post(url, json={"jsonrpc": "2.0", "id": 1, "method": "getSlot"},
+                                      timeout=PROBE_INTERVAL)
+            slot, error = int(response.json()["result"]), None
+        except (requests.RequestException, ValueError, KeyError, TypeError) as e:
+            slot, error = None, e
+        latency = time.perf_counter() - start
+        with self._lock:
+            self.stats[url].record_probe(slot, latency, error)
+            if slot is not None and (self.latest_slot is None or slot > self.latest_slot):
+                self.latest_slot = slot
+
+    async def probe(self):
+        """Measure the latency, errors and slot of every endpoint with a `getSlot` each, off the event loop."""
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self._threads, self._probe, url) for url in self.urls))
+
+    async def _probe_forever(self, interval):
+        while True:
+            await self.probe()
+            await asyncio.sleep(interval)
+
+    def start_probing(self, interval: float = PROBE_INTERVAL) -> bool:
+        """Probe the endpoints every `interval` seconds from now on, return False if they already are."""
+        if self._probing is not None and not self._probing.done():
+            return False
+        self._probing = asyncio.create_task(self._probe_forever(interval))
+        return True
+
+    def stop_probing(self):
+        if self._probing is not None:
+            self._probing.cancel()
+            self._probing = None
+
+    def close(self):
+        """Stop probing and release the worker threads, the requests already sent still complete."""
+        self.stop_probing()
+        self._threads.shutdown(wait=False)
+
+
+_endpoints = dict()  # tuple of urls -> RpcEndpoints, their statistics last until `release_rpc_endpoints`
+_endpoints_lock = threading.Lock()
+
+
+def rpc_endpoints(urls) -> RpcEndpoints:
+    """The shared `RpcEndpoints` of these urls."""
+    key = tuple(urls)
+    with _endpoints_lock:
+        if key not in _endpoints:
+            _endpoints[key] = RpcEndpoints(key)
+        return _endpoints[key]
+
+
+def release_rpc_endpoints(endpoints: RpcEndpoints):
+    """Close `endpoints` and drop it from the shared ones once its urls are replaced, requesting them starts over."""
+    key = tuple(endpoints.urls)
+    with _endpoints_lock:
+        if _endpoints.get(key) is endpoints:
+            del _endpoints[key]
+    endpoints.close()
@@ -0,0 +1,360 @@
+import argparse
+import csv
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import headless
+from engine import TRANSACTION_FEE
+from result_cache import ResultCache, result_key
+from vector_backtest import Dataset, vector_backtest
+
+RESULT_FIELDS = ("pnl", "sol_balance", "trades", "profitable_trades", "avg_pnl", "avg_time_in_trade", "stopped",
+                 "pruned")
+REPORT_INTERVAL = 5.0  # seconds between two leaderboards while the sweep runs
+PRUNE_CHECKPOINTS = 20  # points of the data where a running configuration is compared to the top ones
+PRUNE_MARGIN = 5.0  # PnL points (in %) a configuration may be behind the top ones at a checkpoint
+PRUNE_PATIENCE = 3  # checkpoints in a row a configuration has to be too far behind to be pruned
+
+_dataset = None  # the dataset of a worker process, loaded once by `_load_dataset`
+_results_cache = None  # the `ResultCache` of a worker process, if the sweep has one
+_pnl_floor = None  # `(times, pnls, patience)` of `PnlFloor`, shared with the main process when the sweep prunes
+
+
+def load_sweep(path):
+    """
+    Read a sweep definition: a strategy template and the values to try for each of its parameters.
+
+    The template is a strategy as exported from the GUI where any value can be a "$name" placeholder, e.g.
+    `["buys", ">", "$min_buys"]` or `"buy_size": "$buy_size"`. Each parameter is a list of values, a range
+    `{"min": 1, "max": 2, "step": 0.5}` (for random search the step is optional) or a single fixed value.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        definition = json.load(f)
+    template, parameters = definition["strategy"], definition["parameters"]
+    placeholders = set(_placeholders(template))
+    if placeholders != set(parameters):
+        missing, unused = placeholders - set(parameters), set(parameters) - placeholders
+        raise ValueError(f"Parameters and template placeholders differ (missing: {sorted(missing)}, "
+                         f"unused: {sorted(unused)})")
+    return template, parameters
+
+
+def _placeholders(value):
+    if isinstance(value, str) and value.startswith("$"):
+        yield value[1:]
+    elif isinstance(value, list):
+        for item in value:
+            yield from _placeholders(item)
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _placeholders(item)
+
+
+def render(value, params):
+    """The template with its placeholders replaced by the parameter values."""
+    if isinstance(value, str) and value.startswith("$"):
+        return params[value[1:]]
+    if isinstance(value, list):
+        return [render(item, params) for item in value]
+    if isinstance(value, dict):
+        return {key: render(item, params) for key, item in value.items()}
+    return value
+
+
+def _is_range(domain):
+    return isinstance(domain, dict) and "min" in domain and "max" in domain
+
+
+def grid_values(domain):
+    if isinstance(domain, list):
+        return domain
+    if _is_range(domain):
+        if "step" not in domain:
+            raise ValueError(f"A grid needs a step for the range {domain}")
+        lo, hi, step = domain["min"], domain["max"], domain["step"]
+        count = math.floor((hi - lo) / step + 1e-9) + 1
+        values = [lo + i * step for i in range(count)]
+        # no float noise like 0.30000000000000004 in the results
+        return values if all(isinstance(v, int) for v in (lo, hi, step)) else [round(v, 10) for v in values]
+    return [domain]
+
+
+def sample_value(domain, rng: random.Random):
+    if isinstance(domain, list):
+        return rng.choice(domain)
+    if _is_range(domain):
+        if "step" in domain:
+            return rng.choice(grid_values(domain))
+        if isinstance(domain["min"], int) and isinstance(domain["max"], int):
+            return rng.randint(domain["min"], domain["max"])
+        return rng.uniform(domain["min"], domain["max"])
+    return domain
+
+
+def grid(parameters):
+    """Every combination of the parameter values."""
+    names = list(parameters)
+    for values in itertools.product(*(grid_values(parameters[name]) for name in names)):
+        yield dict(zip(names, values))
+
+
+def random_search(parameters, count: int, seed: int):
+    """`count` combinations drawn at random, the same ones for the same `seed`."""
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield {name: sample_value(domain, rng) for name, domain in parameters.items()}
+
+
+def _load_dataset(directory, results_cache_directory, pnl_floor):
+    global _dataset, _results_cache, _pnl_floor
+    _dataset = Dataset.load(directory)  # memory-mapped, the workers share the page cache
+    if results_cache_directory:
+        _results_cache = ResultCache(results_cache_directory)
+    _pnl_floor = pnl_floor
+
+
+def checkpoint_times(dataset, count: int = PRUNE_CHECKPOINTS):
+    """`count` times evenly spread over the data of a dataset, where the partial results are compared."""
+    end = max(dataset.trades["time"][-1] if len(dataset.trades["time"]) else dataset.start_time,
+              dataset.creates["time"][-1] if len(dataset.creates["time"]) else dataset.start_time)
+    span = float(end) - dataset.start_time
+    return [dataset.start_time + span * (i + 1) / (count + 1) for i in range(count)]
+
+
+def pnl_curve(backtest, times, strategy, dataset):
+    """
+    PnL (in %) of a backtest of `strategy` before each of `times`, the trades open then marked at the last price of
+    their token in `dataset`, as `vector_backtest` does.
+    """
+    curve, realized, ledger = [], 0.0, backtest["ledger"]
+    trades, buy_size = iter(ledger), strategy["buy_size"]
+    trade = next(trades, None)
+    for checkpoint in times:
+        while trade is not None and trade["exit_time"] < checkpoint:
+            realized += trade["sol_received"] - trade["sol_spent"]
+            trade = next(trades, None)
+        profit = realized
+        for held in ledger:
+            if held["enter_time"] < checkpoint <= held["exit_time"]:
+                token_amount = buy_size / (held["enter_mcap"] / 1000000000)
+                mcap = dataset.mark_mcap(held["mint"], checkpoint)
+                profit += float(token_amount * ((mcap + buy_size) / 1000000000)) - TRANSACTION_FEE - held["sol_spent"]
+        curve.append(profit / strategy["sol_balance"] * 100)
+    return curve
+
+
+def _summary(backtest, curve=None):
+    result = {field: backtest["statistics"][field] for field in RESULT_FIELDS if field not in ("stopped", "pruned")}
+    result["stopped"] = backtest["stopped"]
+    result["pruned"] = backtest.get("pruned", False)  # not in the results cached before pruning existed
+    result["curve"] = curve
+    return result
+
+
+def _run_shard(shard, template, seed, stop_loss):
+    results = []
+    for index, params in shard:
+        try:
+            strategy = headless.parse_strategy(render(template, params))
+            backtest = vector_backtest(strategy, _dataset, seed, stop_loss, _pnl_floor)
+            if _results_cache and not backtest["pruned"]:
+                # the main process evicts once the sweep is done, not every worker after every result
+                key = result_key(strategy, _dataset.fingerprint, seed, stop_loss, "vector")
+                _results_cache.put(_dataset.fingerprint, key, backtest, evict=False)
+            curve = pnl_curve(backtest, _pnl_floor[0], strategy, _dataset) if _pnl_floor else None
+            results.append((index, params, _summary(backtest, curve), None))
+        except ValueError as e:
+            results.append((index, params, None, str(e)))
+    return results
+
+
+class PnlFloor:
+    """
+    The PnL a running configuration has to keep at each checkpoint to stay in the race for the top `top`.
+
+    The complete results are ranked by PnL, and the floor at a checkpoint is the lowest PnL the best `top` of them
+    had at that point of the data, less `margin`: a configuration below it at `patience` checkpoints in a row is
+    clearly behind every one of them and is stopped. The floor lives in shared memory, the workers read it as their
+    backtests go.
+    """
+
+    def __init__(self, times, top: int, margin: float = PRUNE_MARGIN, patience: int = PRUNE_PATIENCE):
+        self.times = times
+        self.top = top
+        self.margin = margin
+        self.patience = patience
+        self.best = []  # (pnl, curve) of the best `top` complete results
+        self.pnls = multiprocessing.Array("d", [-math.inf] * len(times))
+
+    def add(self, result):
+        if result is None or result["stopped"] or result["curve"] is None:
+            return
+        self.best.append((result["pnl"], result["curve"]))
+        self.best.sort(key=lambda entry: -entry[0])
+        del self.best[self.top:]
+        if len(self.best) == self.top:
+            self.pnls[:] = [min(curve[i] for _, curve in self.best) - self.margin for i in range(len(self.times))]
+
+
+def sweep(template, configurations, dataset_directory, workers=None, seed: int = 7, stop_loss=None,
+          shard_size=None, results_cache=None, prune_top=None):
+    """
+    Backtest every configuration of a template on a saved `Dataset` and yield `(index, params, result, error)` as
+    the shards complete.
+
+    The configurations are split into shards run by a pool of `workers` processes (all the cores by default), each
+    loading the dataset once when it starts. `stop_loss` stops the configurations losing more than that (in %)
+    early, their results only cover the data up to that point. With `prune_top`, a configuration is also stopped
+    (and `pruned`) once it is more than `PRUNE_MARGIN` behind each of the best `prune_top` complete results at
+    `PRUNE_PATIENCE` of the `PRUNE_CHECKPOINTS` points of the data in a row, open trades marked at their price.
+    Which ones get pruned depends on the order the results come in. With a
+    `results_cache` directory, the configurations backtested before on the same data are yielded first without
+    running them again, the pruned ones are not cached.
+    """
+    configurations = list(enumerate(configurations))
+    floor = None
+    if results_cache or prune_top:
+        dataset = Dataset.load(dataset_directory)
+        fingerprint = dataset.fingerprint
+        if prune_top:
+            floor = PnlFloor(checkpoint_times(dataset), prune_top)
+    if results_cache:
+        cache = ResultCache(results_cache)
+        pending = []
+        for index, params in configurations:
+            try:
+                strategy = headless.parse_strategy(render(template, params))
+            except ValueError:
+                pending.append((index, params))  # reported by the worker
+                continue
+            backtest = cache.get(fingerprint, result_key(strategy, fingerprint, seed, stop_loss, "vector"))
+            if backtest is None:
+                pending.append((index, params))
+            else:
+                curve = pnl_curve(backtest, floor.times, strategy, dataset) if floor else None
+                result = _summary(backtest, curve)
+                if floor:
+                    floor.add(result)
+                yield index, params, result, None
+        configurations = pending
+        if not configurations:
+            return
+    dataset = None  # not needed anymore, the workers load their own
+    workers = workers or os.cpu_count() or 1
+    if shard_size is None:
+        # several shards per worker, so that one slow shard does not leave the other cores idle at the end
+        shard_size = max(1, math.ceil(len(configurations) / (workers * 8)))
+    shards = [configurations[i:i + shard_size] for i in range(0, len(configurations), shard_size)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_load_dataset,
+                             initargs=(dataset_directory, results_cache,
+                                       (floor.times, floor.pnls, floor.patience) if floor else None)) as executor:
+        futures = [executor.submit(_run_shard, shard, template, seed, stop_loss) for shard in shards]
+        for future in as_completed(futures):
+            for entry in future.result():
+                if floor:
+                    floor.add(entry[2])
+                yield entry
+    if results_cache:
+        cache.evict()
+
+
+class Leaderboard:
+    """Results ranked by PnL as they come in, stopped configurations last."""
+
+    def __init__(self):
+        self.results = []
+        self.errors = []
+
+    def add(self, index, params, result, error):
+        if error is not None:
+            self.errors.append((index, params, error))
+        else:
+            self.results.append((index, params, result))
+
+    def ranked(self):
+        return sorted(self.results, key=lambda entry: (entry[2]["stopped"], -entry[2]["pnl"], entry[0]))
+
+    def format(self, top: int):
+        lines = [f"{'rank':>4} {'pnl %':>9} {'trades':>6} {'win %':>6} {'balance':>9}  parameters"]
+        for rank, (_, params, result) in enumerate(self.ranked()[:top], start=1):
+            win_rate = result["profitable_trades"] / result["trades"] * 100 if result["trades"] else 0
+            stopped = " (pruned)" if result["pruned"] else " (stopped)" if result["stopped"] else ""
+            lines.append(f"{rank:>4} {result['pnl']:>+9.2f} {result['trades']:>6} {win_rate:>6.1f} "
+                         f"{result['sol_balance']:>9.4f}  {json.dumps(params)}{stopped}")
+        return "\n".join(lines)
+
+
+def write_ranking(leaderboard, path, parameter_names):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["rank", *parameter_names, *RESULT_FIELDS])
+        for rank, (_, params, result) in enumerate(leaderboard.ranked(), start=1):
+            writer.writerow([rank, *(params[name] for name in parameter_names),
+                             *(result[field] for field in RESULT_FIELDS)])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep the parameters of a Gem-Finder strategy over recorded sessions")
+    parser.add_argument("--sweep", help="Sweep definition, a strategy template and its parameters", required=True,
+                        type=str)
+    parser.add_argument("--sessions", help="Session files recorded with --record", required=True, nargs="+", type=str)
+    parser.add_argument("--random", help="Try this many random combinations instead of the full grid", default=0,
+                        type=int)
+    parser.add_argument("--seed", help="Seed of the random search and of the simulated trade finalization times",
+                        default=7, type=int)
+    parser.add_argument("--workers", help="Worker processes, all the cores by default", default=None, type=int)
+    parser.add_argument("--stop_loss", help="Stop a configuration early once it lost this many percent",
+                        default=None, type=float)
+    parser.add_argument("--prune_top", help="Stop a configuration once it falls behind each of the best N complete "
+                        "ones at the same point of the data", default=None, type=int)
+    parser.add_argument("--cache", help="Keep the parsed sessions in this directory and reuse them on the next runs",
+                        default=None, type=str)
+    parser.add_argument("--top", help="Configurations shown in the leaderboard", default=20, type=int)
+    parser.add_argument("--output", help="Write every result, ranked, into this CSV file", default=None, type=str)
+    parser.add_argument("--results_cache", help="Reuse the results of configurations already backtested on the same "
+                        "sessions, stored in this directory", default=None, type=str)
+    args = parser.parse_args()
+
+    try:
+        template, parameters = load_sweep(args.sweep)
+    except (ValueError, KeyError) as e:
+        print(f"Warning: Invalid sweep! {e}")
+        raise SystemExit(1)
+    if args.random:
+        configurations = list(random_search(parameters, args.random, args.seed))
+    else:
+        configurations = list(grid(parameters))
+
+    with tempfile.TemporaryDirectory() as directory:
+        dataset_directory = args.cache or directory
+        start = time.perf_counter()
+        dataset = Dataset.cached(args.sessions, dataset_directory)
+        print(f"Dataset of {dataset.frames:,} frames ready in {time.perf_counter() - start:.2f}s")
+        del dataset
+
+        leaderboard = Leaderboard()
+        start = last_report = time.perf_counter()
+        for entry in sweep(template, configurations, dataset_directory, args.workers, args.seed, args.stop_loss,
+                           results_cache=args.results_cache, prune_top=args.prune_top):
+            leaderboard.add(*entry)
+            if time.perf_counter() - last_report >= REPORT_INTERVAL:
+                last_report = time.perf_counter()
+                done = len(leaderboard.results) + len(leaderboard.errors)
+                print(f"\n[{done}/{len(configurations)}] after {last_report - start:.0f}s")
+                print(leaderboard.format(args.top))
+        elapsed = time.perf_counter() - start
+
+    print(f"\n{len(configurations)} configurations in {elapsed:.2f}s "
+          f"({len(configurations) / elapsed:.1f}/s)")
+    print(leaderboard.format(args.top))
+    for index, params, error in leaderboard.errors:
+        print(f"Invalid configuration {json.dumps(params)}: {error}")
+    if args.output:
+        write_ranking(leaderboard, args.output, list(parameters))
+        print(f"Results written to {args.output}")
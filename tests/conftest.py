@@ -0,0 +1,34 @@
+import os
+import sys
+import pytest
+
+# the modules live at the root of the repository, next to this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks import write_synthetic_session  # noqa: E402
+
+STRATEGY = {"sol_balance": 10, "max_slippage": 30, "priority_fee": 0.0001, "buy_size": 0.3,
+            "batch_reset_size": 10, "inactivity_reset_time": 4,
+            "enter_conditions": [[["buys", ">", 8], ["buy/sell ratio", ">", 1.5]],
+                                 [["mcap slope", ">", 0.3], ["trend strength", ">", 0.6]],
+                                 [["buys (last 10s)", ">", 6], ["mcap slope (last 30s)", ">", 0.2]]],
+            "exit_conditions": [[["PnL", ">", 25]], [["PnL", "<", -10]], [["sells (last 10s)", ">", 6]],
+                                [["time elapsed", ">", 20]]]}
+
+
+@pytest.fixture(scope="session")
+def session(tmp_path_factory):
+    """Path and frame count of 5 minutes of synthetic PumpPortal traffic, in the recorder's format."""
+    path = str(tmp_path_factory.mktemp("sessions") / "session.log.gz")
+    return path, write_synthetic_session(path, 300)
+
+
+@pytest.fixture(scope="session")
+def mock_solana():
+    """`(chain, trade_url, rpc_url)` of `mock_solana` servers, shared by the tests."""
+    from mock_solana import Chain, start_mock
+
+    chain = Chain()
+    trade_url, rpc_url, trade_server, rpc_server = start_mock(chain=chain)
+    yield chain, trade_url, rpc_url
+    trade_server.shutdown()
+    rpc_server.shutdown()
@@ -0,0 +1,77 @@
+import random
+import pytest
+from base import TokenStats
+from helper import CompiledConditions, SubconditionProfile, evaluate_conditions
+
+CONDITIONS = [[["buys", ">", 8], ["buy/sell ratio", ">", 1.5]],
+              [["mcap", ">=", 60], ["transaction/sec", "<", 5]],
+              [["PnL", "<", -10]],
+              [["time elapsed", ">", 20], ["sells", "!=", 0]]]
+
+
+def _random_token(rng):
+    token = TokenStats()
+    token.buys = rng.randint(0, 20)
+    token.sells = rng.randint(0, 20)
+    token.buys_sells_ratio = token.buys / token.sells if token.sells else 1
+    token.current_mcap = rng.uniform(20, 100)
+    return token
+
+
+def test_matches_the_interpreted_evaluation():
+    rng = random.Random(3)
+    compiled = CompiledConditions(CONDITIONS)
+    for _ in range(2000):
+        token = _random_token(rng)
+        pnl, time_elapsed = rng.uniform(-50, 50), rng.uniform(0, 40)
+        assert compiled.evaluate(token, pnl=pnl, time_elapsed=time_elapsed) == \
+            evaluate_conditions(token, CONDITIONS, pnl=pnl, time_elapsed=time_elapsed)
+
+
+def test_first_satisfied_condition_wins():
+    compiled = CompiledConditions(CONDITIONS)
+    token = TokenStats()
+    token.buys, token.buys_sells_ratio, token.current_mcap = 10, 2.0, 70
+    assert compiled.evaluate(token, pnl=0, time_elapsed=0) == (True, 1)
+    token.buys = 0
+    assert compiled.evaluate(token, pnl=-20, time_elapsed=0) == (True, 2)
+    token.current_mcap = 30
+    assert compiled.evaluate(token, pnl=-20, time_elapsed=0) == (True, 3)
+    assert compiled.evaluate(token, pnl=0, time_elapsed=0) == (False, None)
+
+
+def test_referenced_props():
+    assert CompiledConditions(CONDITIONS).referenced_props == \
+        {"buys", "buys_sells_ratio", "current_mcap", "tx_sec", "pnl", "time_elapsed", "sells"}
+
+
+@pytest.mark.parametrize("conditions", [[[["unknown", ">", 1]]], [[["buys", "=>", 1]]], [[["buys", ">"]]]])
+def test_invalid_conditions_are_rejected(conditions):
+    with pytest.raises(ValueError):
+        CompiledConditions(conditions)
+
+
+def test_reordering_checks_the_failing_subcondition_first():
+    conditions = [[["mcap", ">", 0], ["buys", ">", 100]], [["sells", ">", 100]]]
+    compiled = CompiledConditions(conditions, profile_every=1)
+    token = TokenStats()
+    token.current_mcap = 30
+    for _ in range(256):
+        assert compiled.evaluate(token) == (False, None)
+    assert compiled.order[0] == [1, 0]
+    assert "token.buys > v" in compiled.source.splitlines()[1].split(" and ")[0]
+    token.buys = token.sells = 200
+    assert compiled.evaluate(token) == (True, 1)  # condition numbers are unchanged
+    rows = compiled.profile_rows()
+    assert [row[:2] for row in rows] == [(1, "mcap > 0"), (1, "buys > 100"), (2, "sells > 100")]
+    assert rows[0][3] == 1.0 and rows[1][5] > 0
+
+
+def test_subconditions_are_ranked_by_time_per_failure():
+    cheap, slow = SubconditionProfile(), SubconditionProfile()
+    for profile, passes, time_ns in ((cheap, 90, 100), (slow, 10, 400)):
+        profile.evaluations, profile.passes, profile.timings, profile.time_ns = 100, passes, 10, time_ns * 10
+    assert cheap.short_circuit_cost() == pytest.approx(100 / 0.1)
+    assert slow.short_circuit_cost() == pytest.approx(400 / 0.9)
+    # the slow one fails often enough to be checked first
+    assert slow.short_circuit_cost() < cheap.short_circuit_cost()
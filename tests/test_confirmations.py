@@ -0,0 +1,83 @@
+import socket
+import pytest
+from solders.keypair import Keypair
+from solders.transaction import VersionedTransaction
+import confirmations
+from confirmations import CONFIRMED, EXPIRED, FAILED, ConfirmationTracker
+from mock_solana import Chain, Endpoint, start_rpc
+from pump_transactions import INITIAL_VIRTUAL_SOL_RESERVES, INITIAL_VIRTUAL_TOKEN_RESERVES, trade_transaction
+
+
+@pytest.fixture(scope="module")
+def chain_rpc():
+    chain = Chain(confirmation_slots=0)
+    rpc_url, server = start_rpc(chain, Endpoint("confirmations"))
+    yield chain, rpc_url
+    server.shutdown()
+
+
+def _land(chain, slippage=20):
+    """Have `chain` receive a signed buy, failing beyond its slippage bound when `slippage` is negative."""
+    keypair = Keypair()
+    tx = trade_transaction(keypair.pubkey(), Keypair().pubkey(), "buy", 0.1, True, slippage, 0.0001,
+                           chain.blockhash(), INITIAL_VIRTUAL_SOL_RESERVES, INITIAL_VIRTUAL_TOKEN_RESERVES)
+    tx = VersionedTransaction(tx.message, [keypair])
+    chain.receive(tx)
+    return str(tx.signatures[0])
+
+
+def test_landed_transactions_are_resolved(chain_rpc):
+    chain, rpc_url = chain_rpc
+    tracker = ConfirmationTracker(rpc_url, timeout=60)
+    confirmed, failed = tracker.track(_land(chain)), tracker.track(_land(chain, slippage=-50))
+    unknown = tracker.track(str(Keypair().pubkey()))
+    tracker.poll()
+    assert confirmed.result(0) == (CONFIRMED, None)
+    outcome, error = failed.result(0)
+    assert outcome == FAILED and error is not None
+    assert not unknown.done()  # looked up again at the next poll
+    assert (tracker.tracked, tracker.confirmed, tracker.failed, tracker.expired) == (3, 1, 1, 0)
+    tracker.close()
+    assert unknown.cancelled()
+
+
+def test_unseen_transactions_expire(chain_rpc):
+    tracker = ConfirmationTracker(chain_rpc[1], timeout=0)
+    futures = [tracker.track(str(Keypair().pubkey())) for _ in range(2)]
+    tracker.poll()
+    assert all(future.result(0) == (EXPIRED, None) for future in futures)
+    assert tracker.expired == 2
+
+
+def test_statuses_are_batched(chain_rpc, monkeypatch):
+    chain, rpc_url = chain_rpc
+    monkeypatch.setattr(confirmations, "MAX_SIGNATURES_PER_REQUEST", 2)
+    tracker = ConfirmationTracker(rpc_url)
+    signatures = [_land(chain) for _ in range(5)]
+    futures = [tracker.track(signature) for signature in signatures]
+    assert tracker.track(signatures[0]) is futures[0]
+    tracker.poll()
+    assert tracker.requests == 3
+    assert all(future.result(0) == (CONFIRMED, None) for future in futures)
+
+
+def test_request_errors_are_retried(chain_rpc):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        unreachable = f"http://127.0.0.1:{s.getsockname()[1]}/"
+    chain, rpc_url = chain_rpc
+    urls = [unreachable, rpc_url]
+    tracker = ConfirmationTracker(lambda: urls.pop(0))
+    future = tracker.track(_land(chain))
+    tracker.poll()
+    assert tracker.request_errors == 1 and not future.done()
+    tracker.poll()
+    assert future.result(0) == (CONFIRMED, None)
+
+
+def test_polls_in_the_background(chain_rpc):
+    chain, rpc_url = chain_rpc
+    tracker = ConfirmationTracker(rpc_url, interval=0.01).start()
+    assert tracker.track(_land(chain)).result(timeout=5) == (CONFIRMED, None)
+    tracker.close()
+    assert "1 confirmed" in tracker.summary()
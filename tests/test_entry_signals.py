@@ -0,0 +1,59 @@
+import copy
+import os
+import numpy as np
+import headless
+import vector_backtest
+from conftest import STRATEGY
+from vector_backtest import Dataset, EntrySignals, compare_results
+
+
+def _strategy(**changes):
+    strategy = copy.deepcopy(STRATEGY)
+    strategy.update(changes)
+    return headless.parse_strategy(strategy)
+
+
+def test_signals_are_reused_across_exit_conditions(session, tmp_path):
+    directory = str(tmp_path / "dataset")
+    Dataset.cached([session[0]], directory)
+    first = _strategy()
+    second = _strategy(exit_conditions=[[["PnL", ">", 10]], [["PnL", "<", -5]]])
+
+    fresh = {name: vector_backtest.vector_backtest(strategy, Dataset.from_sessions([session[0]]))
+             for name, strategy in (("first", first), ("second", second))}
+    vector_backtest.vector_backtest(first, Dataset.load(directory))
+    saved = os.listdir(os.path.join(directory, "entries"))
+    assert len(saved) == 1
+
+    # a new process: the signals come from the file, the results are the same
+    dataset = Dataset.load(directory)
+    signals = dataset.entry_signals(first["enter_conditions"])
+    assert signals.computed.any()
+    assert compare_results(vector_backtest.vector_backtest(second, dataset), fresh["second"]) == []
+    assert compare_results(vector_backtest.vector_backtest(first, dataset), fresh["first"]) == []
+    assert os.listdir(os.path.join(directory, "entries")) == saved
+
+
+def test_save_merges_and_evicts(tmp_path, monkeypatch):
+    bounds = np.array([0, 10, 20, 30])
+    path = str(tmp_path / "entries" / "a-1.npz")
+    first, second = EntrySignals(bounds, path), EntrySignals(bounds, path)
+    first.add(0, np.array([2, 5]), np.array([1, 2]))
+    first.save()
+    second.add(2, np.array([21]), np.array([1]))
+    second.save()  # keeps the mint saved by `first` meanwhile
+    merged = EntrySignals(bounds, path)
+    assert merged.get(1) is None
+    assert [list(part) for part in merged.get(0)] == [[2, 5], [1, 2]]
+    assert [list(part) for part in merged.get(2)] == [[21], [1]]
+
+    os.utime(path, (1, 1))
+    for name in "bcd":
+        signals = EntrySignals(bounds, str(tmp_path / "entries" / f"{name}-1.npz"))
+        signals.add(0, np.array([1]), np.array([1]))
+        signals.save()
+        os.utime(signals.path, (ord(name), ord(name)))  # in order of use, whatever the clock resolution
+        if name == "b":  # from now on there is only room for two files
+            monkeypatch.setattr(vector_backtest, "MAX_SIGNALS_BYTES",
+                                os.path.getsize(path) + os.path.getsize(signals.path))
+    assert sorted(os.listdir(tmp_path / "entries")) == ["c-1.npz", "d-1.npz"]
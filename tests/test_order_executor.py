@@ -0,0 +1,113 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+import engine
+from base import TokenStats
+from order_executor import OrderExecutor
+
+
+def test_orders_run_off_the_loop_with_bounded_concurrency():
+    async def main():
+        executor = OrderExecutor(max_in_flight=2)
+        loop_thread = threading.get_ident()
+        running, peak, done = [0], [0], []
+        lock = threading.Lock()
+
+        def order():
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.02)
+            with lock:
+                running[0] -= 1
+            return threading.get_ident()
+
+        def on_done(thread):
+            assert threading.get_ident() == loop_thread  # callbacks run on the loop
+            done.append(thread)
+
+        for i in range(6):
+            assert executor.submit(f"mint{i}", order, on_done, lambda e: None)
+        assert executor.queued + executor.in_flight == 6
+        await executor.drain()
+        executor.close()
+        assert len(done) == 6 and loop_thread not in done
+        assert peak[0] == 2
+        assert executor.submitted == 6 and not executor.pending("mint0")
+
+    asyncio.run(main())
+
+
+def test_one_order_per_mint():
+    async def main():
+        executor = OrderExecutor()
+        results = []
+        assert executor.submit("mint", lambda: time.sleep(0.01) or 1, results.append, results.append)
+        assert not executor.submit("mint", lambda: 2, results.append, results.append)
+        assert executor.pending("mint") and executor.deduplicated == 1
+        await executor.drain()
+        assert results == [1]
+        assert executor.submit("mint", lambda: 3, results.append, results.append)  # free again once done
+        await executor.drain()
+        executor.close()
+        assert results == [1, 3]
+
+    asyncio.run(main())
+
+
+def test_failures_and_cancellations_call_on_error():
+    async def main():
+        executor = OrderExecutor(max_in_flight=1)
+        done, errors = [], []
+
+        def fail():
+            raise RuntimeError("rejected")
+
+        executor.submit("failing", fail, done.append, errors.append)
+        await executor.drain()
+        assert isinstance(errors[0], RuntimeError) and executor.failed == 1
+
+        release = threading.Event()
+        executor.submit("running", release.wait, done.append, errors.append)
+        executor.submit("queued", lambda: 1, done.append, errors.append)
+        await asyncio.sleep(0.01)
+        executor.close()
+        await asyncio.sleep(0)
+        release.set()
+        assert done == []
+        assert [type(e) for e in errors[1:]] == [asyncio.CancelledError, asyncio.CancelledError]
+        assert not executor.pending("running") and not executor.pending("queued")
+
+    asyncio.run(main())
+
+
+def test_engine_unblocks_the_token_of_a_dropped_or_failed_order(monkeypatch):
+    def complete_official_transaction(*args, **kwargs):
+        time.sleep(0.01)
+        raise RuntimeError("FINAL FAILURE")
+
+    monkeypatch.setattr(engine, "complete_official_transaction", complete_official_transaction)
+    messages = []
+    loggers = SimpleNamespace(log_general_message=messages.append, log_transaction_message=messages.append)
+    cfg = SimpleNamespace(keypair=None, max_slippage=30, priority_fee=0, buy_size=0.3, rpc_url="", rpc_fanout=0)
+
+    async def main():
+        engine.reset_globals()
+        engine.order_executor = OrderExecutor()
+        first, second = TokenStats(), TokenStats()
+        first.mint = second.mint = "mint"
+        for token in (first, second):
+            token.executing_order = True  # as the callers do
+            engine.submit_order("buy", token, 1, cfg, loggers)
+        assert first.executing_order and not second.executing_order  # the second one was dropped
+        await engine.order_executor.drain()
+        engine.order_executor.close()
+        assert not first.executing_order and not first.trade_entered
+
+    try:
+        asyncio.run(main())
+    finally:
+        engine.reset_globals()
+    assert any("already in flight" in message for message in messages)
+    assert any("FINAL FAILURE" in message for message in messages)
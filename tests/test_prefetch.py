@@ -0,0 +1,65 @@
+import threading
+import time
+from base import TokenStats
+from helper import CompiledConditions
+from prefetch import TransactionPrefetcher
+
+
+def test_take_waits_for_the_transaction_being_built():
+    prefetcher = TransactionPrefetcher()
+    release = threading.Event()
+
+    def build():
+        release.wait()
+        return "signed"
+
+    assert prefetcher.prefetch("mint", build)
+    assert not prefetcher.prefetch("mint", build)  # already prefetched
+    assert prefetcher.armed("mint")
+    threading.Timer(0.05, release.set).start()
+    assert prefetcher.take("mint") == "signed"
+    assert prefetcher.take("mint") is None  # taken once
+    assert not prefetcher.armed("mint")
+    assert (prefetcher.prefetched, prefetcher.used) == (1, 1)
+    prefetcher.close()
+
+
+def test_expired_and_failed_transactions_are_not_used():
+    prefetcher = TransactionPrefetcher(ttl=0.05)
+    prefetcher.prefetch("stale", lambda: "signed")
+    time.sleep(0.1)
+    assert not prefetcher.armed("stale")
+    assert prefetcher.take("stale") is None
+    assert prefetcher.expired == 1
+
+    def fail():
+        raise RuntimeError("trade-local unreachable")
+
+    prefetcher.ttl = 5.0
+    prefetcher.prefetch("broken", fail)
+    assert prefetcher.take("broken") is None
+    assert prefetcher.failed == 1 and prefetcher.used == 0
+    prefetcher.close()
+
+
+def test_prefetches_are_capped_and_expire_to_make_room():
+    prefetcher = TransactionPrefetcher(ttl=0.05, max_prefetched=2)
+    assert prefetcher.prefetch("a", lambda: "a") and prefetcher.prefetch("b", lambda: "b")
+    assert not prefetcher.prefetch("c", lambda: "c")
+    time.sleep(0.1)
+    assert prefetcher.prefetch("c", lambda: "c")  # a and b expired meanwhile
+    assert prefetcher.expired == 2
+    prefetcher.close()
+    assert prefetcher.expired == 3 and prefetcher.take("c") is None
+
+
+def test_near_miss_arms_tokens_about_to_enter():
+    conditions = CompiledConditions([[["buys", ">", 8], ["buy/sell ratio", ">", 1.5], ["mcap", ">", 50]],
+                                     [["PnL", "<", -10]]])
+    token = TokenStats()
+    token.buys, token.buys_sells_ratio, token.current_mcap = 10, 2.0, 40
+    assert conditions.near_miss(token, pnl=-20) == 1  # single sub-conditions are never near misses
+    assert conditions.near_miss(token, proximity=0.0) == 1
+    token.buys = 0
+    assert conditions.near_miss(token) is None
+    assert conditions.near_miss(token, proximity=0.0) == 1  # any number of failures allowed
@@ -0,0 +1,103 @@
+import json
+import os
+import random
+import pytest
+from solders.hash import Hash
+from solders.keypair import Keypair
+from solders.pubkey import Pubkey
+from pump_transactions import (INITIAL_VIRTUAL_SOL_RESERVES, INITIAL_VIRTUAL_TOKEN_RESERVES, LAMPORTS_PER_SOL,
+                               TOKEN_UNITS, BlockhashCache, LocalBuilder, buy_cost, buy_quote, parse_trade,
+                               sell_quote, trade_transaction)
+
+CURVE = (INITIAL_VIRTUAL_SOL_RESERVES, INITIAL_VIRTUAL_TOKEN_RESERVES)
+
+
+def test_quotes_are_consistent():
+    rng = random.Random(5)
+    for _ in range(1000):
+        sol_reserves = rng.randint(INITIAL_VIRTUAL_SOL_RESERVES, 100 * LAMPORTS_PER_SOL)
+        token_reserves = INITIAL_VIRTUAL_SOL_RESERVES * INITIAL_VIRTUAL_TOKEN_RESERVES // sol_reserves
+        lamports = rng.randint(LAMPORTS_PER_SOL // 1000, 5 * LAMPORTS_PER_SOL)
+        tokens = buy_quote(lamports, sol_reserves, token_reserves)
+        assert 0 < tokens < token_reserves
+        # the quoted tokens cost at most what was paid, the program checks the cost against the SOL limit
+        assert lamports * 0.999 < buy_cost(tokens, sol_reserves, token_reserves) <= lamports
+        # selling them back right away loses the fees of both trades
+        sold = sell_quote(tokens, sol_reserves + lamports, token_reserves - tokens)
+        assert lamports * 0.97 < sold < lamports
+
+
+def test_trade_transaction_round_trips():
+    payer, mint = Keypair().pubkey(), Keypair().pubkey()
+    buy = trade_transaction(payer, mint, "buy", 0.5, True, 20, 0.0001, Hash.new_unique(), *CURVE)
+    tokens = buy_quote(LAMPORTS_PER_SOL // 2, *CURVE)
+    assert parse_trade(buy) == ("buy", payer, mint, tokens, int(LAMPORTS_PER_SOL // 2 * 1.2))
+    buy = trade_transaction(payer, mint, "buy", 1000.0, False, 0, 0.0001, Hash.new_unique(), *CURVE)
+    assert parse_trade(buy) == ("buy", payer, mint, 1000 * TOKEN_UNITS, buy_cost(1000 * TOKEN_UNITS, *CURVE))
+    sell = trade_transaction(payer, mint, "sell", 1000.0, False, 10, 0.0001, Hash.new_unique(), *CURVE)
+    assert parse_trade(sell) == ("sell", payer, mint, 1000 * TOKEN_UNITS,
+                                 int(sell_quote(1000 * TOKEN_UNITS, *CURVE) * 0.9))
+    assert sell.message.account_keys[0] == payer  # the fee payer
+
+
+def test_invalid_trades_are_refused():
+    payer, mint = Keypair().pubkey(), Keypair().pubkey()
+    with pytest.raises(ValueError, match="Invalid action"):
+        trade_transaction(payer, mint, "swap", 0.5, True, 20, 0.0001, Hash.new_unique(), *CURVE)
+    with pytest.raises(ValueError, match="denominated in tokens"):
+        trade_transaction(payer, mint, "sell", 0.5, True, 20, 0.0001, Hash.new_unique(), *CURVE)
+
+
+def _fixture():
+    with open(os.path.join(os.path.dirname(__file__), "fixtures", "pump_trades.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.mark.parametrize("index", [0, 1])
+def test_transactions_match_the_hand_encoded_fixture(index):
+    fixture = _fixture()
+    trade = fixture["trades"][index]
+    payer = Pubkey.from_string(fixture["payer"])
+    tx = trade_transaction(payer, Pubkey.from_string(fixture["mint"]), trade["action"], trade["amount"],
+                           trade["denominated_in_sol"], trade["slippage"], trade["priority_fee"],
+                           Hash.from_string(fixture["blockhash"]), *CURVE)
+    message = tx.message
+    keys = [str(key) for key in message.account_keys]
+    assert str(message.recent_blockhash) == fixture["blockhash"]
+    assert [{"program": keys[instruction.program_id_index],
+             "accounts": [keys[account] for account in instruction.accounts],
+             "data": bytes(instruction.data).hex()} for instruction in message.instructions] == \
+        [{"program": instruction["program"], "accounts": [account[0] for account in instruction["accounts"]],
+          "data": instruction["data"]} for instruction in trade["instructions"]]
+    # the message only keeps the flags of each account over all the instructions
+    header = message.header
+    signed = header.num_required_signatures
+    signers = set(keys[:signed])
+    writable = set(keys[:signed - header.num_readonly_signed_accounts])
+    writable |= set(keys[signed:len(keys) - header.num_readonly_unsigned_accounts])
+    accounts = [account for instruction in trade["instructions"] for account in instruction["accounts"]]
+    assert signers == {fixture["payer"]} == {key for key, signer, _ in accounts if signer}
+    assert writable == {key for key, _, is_writable in accounts if is_writable}
+
+
+def test_local_builder_tracks_its_holdings(mock_solana):
+    chain, _, rpc_url = mock_solana
+    keypair, mint = Keypair(), str(Keypair().pubkey())
+    blockhashes = BlockhashCache(rpc_url)
+    builder = LocalBuilder(keypair, blockhashes)
+    sol_reserves, token_reserves = chain.curve(mint)
+    buy = builder.buy(mint, 0.25, 15, 0.0002, sol_reserves / LAMPORTS_PER_SOL, token_reserves / TOKEN_UNITS)
+    assert all(buy.verify_with_results())
+    assert chain.is_valid_blockhash(buy.message.recent_blockhash)
+    assert parse_trade(buy) == ("buy", keypair.pubkey(), Pubkey.from_string(mint),
+                                buy_quote(LAMPORTS_PER_SOL // 4, *CURVE), int(LAMPORTS_PER_SOL // 4 * 1.15))
+
+    assert builder.sell(mint, 15, 0.0002, sol_reserves / LAMPORTS_PER_SOL, token_reserves / TOKEN_UNITS) is None
+    builder.bought(mint, buy)
+    builder.bought(mint, buy)
+    sell = builder.sell(mint, 15, 0.0002, sol_reserves / LAMPORTS_PER_SOL, token_reserves / TOKEN_UNITS)
+    assert parse_trade(sell)[3] == 2 * parse_trade(buy)[3]
+    builder.forget(mint)
+    assert builder.sell(mint, 15, 0.0002, sol_reserves / LAMPORTS_PER_SOL, token_reserves / TOKEN_UNITS) is None
+    assert builder.built == 2
+    blockhashes.close()
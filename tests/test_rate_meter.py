@@ -0,0 +1,28 @@
+import pytest
+from base import RateMeter
+
+
+def test_rate_over_the_window():
+    meter = RateMeter(window=1.0, buckets=10)
+    for i in range(20):
+        meter.record(100.0 + i * 0.05)  # 20 events over 1 second
+    assert meter.rate(100.95) == pytest.approx(20.0)
+    # the buckets of the first half second are gone half a second later
+    assert meter.rate(101.45) == pytest.approx(10.0)
+
+
+def test_silent_meter_decays_to_zero():
+    meter = RateMeter()
+    for i in range(50):
+        meter.record(10.0 + i * 0.01)
+    assert meter.rate(10.5) > 0
+    assert meter.rate(11.6) == 0
+    assert meter.rate(5000.0) == 0
+
+
+def test_memory_is_constant():
+    meter = RateMeter(window=2.0, buckets=20)
+    for i in range(100_000):
+        meter.record(i * 0.001)
+    assert len(meter.counts) == 20
+    assert meter.rate(99.9995) == pytest.approx(1000.0, rel=0.01)
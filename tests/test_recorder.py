@@ -0,0 +1,50 @@
+import json
+from recorder import SessionRecorder, read_session
+
+
+def test_frames_round_trip(tmp_path):
+    frames = [json.dumps({"mint": f"mint{i}", "txType": "buy", "solAmount": i / 10}) for i in range(1000)]
+    frames.append(b'{"message": "bytes are decoded"}')
+    frames.append('{"message":\n"newlines are whitespace"}')
+    with SessionRecorder(tmp_path, chunk_frames=64) as recorder:
+        for raw in frames:
+            recorder.record(raw)
+    assert (recorder.recorded, recorder.dropped, len(recorder.files)) == (len(frames), 0, 1)
+
+    header, recorded = read_session(recorder.files[0])
+    assert header["format"] == 1 and "wall_time" in header
+    recorded = list(recorded)
+    assert [raw for _, raw in recorded[:-2]] == frames[:-2]
+    assert recorded[-2][1] == '{"message": "bytes are decoded"}'
+    assert json.loads(recorded[-1][1]) == {"message": "newlines are whitespace"}
+    timestamps = [ts for ts, _ in recorded]
+    assert timestamps == sorted(timestamps)
+
+
+def test_full_buffer_drops_frames(tmp_path):
+    recorder = SessionRecorder(tmp_path, queue_size=10)  # not started, nothing drains the buffer
+    for i in range(15):
+        recorder.record(str(i))
+    assert (len(recorder.frames), recorder.dropped) == (10, 5)
+
+
+def test_rotation(tmp_path):
+    with SessionRecorder(tmp_path, max_bytes=1, chunk_frames=10) as recorder:
+        for i in range(30):
+            recorder.record(json.dumps({"i": i}))
+    assert len(recorder.files) >= 2
+    replayed = [raw for path in recorder.files for _, raw in read_session(path)[1]]
+    assert replayed == [json.dumps({"i": i}) for i in range(30)]
+
+
+def test_cut_session_reads_up_to_the_last_full_chunk(tmp_path):
+    with SessionRecorder(tmp_path, chunk_frames=5) as recorder:
+        for i in range(12):
+            recorder.record(str(i))
+    path = recorder.files[0]
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path, "wb") as f:
+        f.write(data[:-5])
+    raws = [raw for _, raw in read_session(path)[1]]
+    assert raws == [str(i) for i in range(len(raws))]
@@ -0,0 +1,52 @@
+import asyncio
+import engine
+import headless
+from backtest import backtest
+from base import VirtualClock
+from conftest import STRATEGY
+from replay import replay
+
+
+def test_virtual_clock_wakes_sleepers_in_deadline_order():
+    async def main():
+        clock = VirtualClock(100.0)
+        woken = []
+
+        async def sleeper(name, seconds):
+            await clock.sleep(seconds)
+            woken.append((name, clock.time()))
+
+        tasks = [asyncio.create_task(sleeper(name, seconds)) for name, seconds in (("a", 3), ("b", 1), ("c", 1))]
+        await asyncio.sleep(0)
+        await clock.advance(102.0)
+        assert woken == [("b", 101.0), ("c", 101.0)] and clock.time() == 102.0
+        clock.run_free()
+        await clock.advance(104.0)
+        assert woken[-1] == ("a", 103.0)
+        await asyncio.gather(*tasks)
+        await clock.sleep(30)  # returns at once once running free
+        assert clock.time() == 134.0
+
+    asyncio.run(main())
+
+
+def test_replay_delivers_only_the_subscribed_frames(session):
+    path, frames = session
+    strategy = headless.parse_strategy(STRATEGY)
+    enter_conditions, exit_conditions = headless.validate_strategy(strategy)
+    quiet = type("Loggers", (), {"log_general_message": staticmethod(lambda msg: None),
+                                 "log_transaction_message": staticmethod(lambda msg: None)})
+    socket = asyncio.run(replay([path], enter_conditions, exit_conditions, headless.build_config(strategy), quiet,
+                                seed=7))
+    assert socket.delivered + socket.skipped == frames
+    assert 0 < socket.delivered < frames
+    assert engine.tokens_created_since_start > 0
+
+
+def test_replay_is_deterministic(session):
+    strategy = headless.parse_strategy(STRATEGY)
+    first = backtest(strategy, [session[0]], seed=3)
+    second = backtest(strategy, [session[0]], seed=3)
+    assert first["statistics"]["trades"] > 0
+    assert first["strategy_transcript"] == second["strategy_transcript"]
+    assert first["ledger"] == second["ledger"]
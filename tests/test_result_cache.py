@@ -0,0 +1,65 @@
+import copy
+import os
+import pytest
+from conftest import STRATEGY
+from result_cache import ResultCache, result_key, sessions_fingerprint, strategy_hash
+
+
+def _results(size=0):
+    return {"strategy_transcript": {"mint": [1, 2]}, "statistics": {"pnl": 1.5}, "ledger": [], "stopped": False,
+            "padding": "x" * size}
+
+
+def test_keys():
+    strategy = copy.deepcopy(STRATEGY)
+    same = copy.deepcopy(STRATEGY)
+    same["buy_size"] = 0.30
+    same["enter_conditions"][0][0][2] = 8.0  # compared the same way as 8
+    same["name"] = "not part of the decisions"
+    assert strategy_hash(strategy) == strategy_hash(same)
+    other = copy.deepcopy(STRATEGY)
+    other["exit_conditions"][0][0][2] = 26
+    assert strategy_hash(other) != strategy_hash(strategy)
+    key = result_key(strategy, "data", 7)
+    assert key == result_key(same, "data", 7)
+    assert len({key, result_key(strategy, "data", 8), result_key(strategy, "other", 7),
+                result_key(strategy, "data", 7, stop_loss=5), result_key(strategy, "data", 7, simulator="vector")}) == 5
+    with pytest.raises(ValueError):
+        result_key(strategy, "data", 7, simulator="live")
+
+
+def test_sessions_fingerprint(tmp_path):
+    a, b = tmp_path / "a", tmp_path / "b"
+    a.write_bytes(b"first")
+    b.write_bytes(b"second")
+    assert sessions_fingerprint([a, b]) == sessions_fingerprint([a, b])
+    assert sessions_fingerprint([a, b]) != sessions_fingerprint([b, a])
+    b.write_bytes(b"changed")
+    assert sessions_fingerprint([a, b]) != sessions_fingerprint([a, tmp_path / "a"])
+
+
+def test_get_put_invalidate(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    assert cache.get("fingerprint", "key") is None
+    cache.put("fingerprint", "key", _results())
+    cache.put("fingerprint", "other", _results())
+    cache.put("another", "key", _results())
+    results = cache.get("fingerprint", "key")
+    assert results["strategy_transcript"] == {"mint": (1, 2)}  # tuples like the engine's transcript
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.invalidate("fingerprint", "key") == 1
+    assert cache.get("fingerprint", "key") is None
+    assert cache.invalidate("fingerprint") == 1
+    assert len(cache.entries()) == 1
+    assert cache.clear() == 1 and cache.entries() == []
+
+
+def test_evicts_the_least_recently_used(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=7_000)
+    for i in range(4):
+        cache.put("fingerprint", f"key{i}", _results(3000), evict=False)
+        os.utime(cache._path("fingerprint", f"key{i}"), (i, i))
+    cache.get("fingerprint", "key0")  # used again, now the most recent
+    assert cache.evict() == 2
+    assert cache.get("fingerprint", "key0") is not None and cache.get("fingerprint", "key3") is not None
+    assert cache.size() <= 7_000
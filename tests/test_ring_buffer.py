@@ -0,0 +1,58 @@
+import random
+from collections import deque
+import pytest
+from base import RingBuffer, RollingTrendRegression
+
+
+def test_behaves_like_a_bounded_deque():
+    rng = random.Random(2)
+    for capacity in (1, 3, 16, 100):
+        buffer, expected = RingBuffer(capacity), deque(maxlen=capacity)
+        for _ in range(2000):
+            if expected and rng.random() < 0.3:
+                assert buffer.popleft() == expected.popleft()
+            else:
+                value = rng.random()
+                buffer.append(value)
+                expected.append(value)
+            assert len(buffer) == len(expected)
+            assert list(buffer) == list(expected)
+            if expected:
+                assert buffer[0] == expected[0] and buffer[-1] == expected[-1]
+
+
+def test_memory_is_bounded_and_allocated_lazily():
+    buffer = RingBuffer(1024)
+    assert len(buffer.data) == 0
+    for value in range(10):
+        buffer.append(value)
+    assert len(buffer.data) == 16
+    for value in range(5000):
+        buffer.append(value)
+    assert len(buffer.data) == 1024
+    assert list(buffer) == list(range(5000 - 1024, 5000))
+
+
+def test_errors():
+    with pytest.raises(ValueError):
+        RingBuffer(0)
+    buffer = RingBuffer(4)
+    with pytest.raises(IndexError):
+        buffer.popleft()
+    buffer.append(1.0)
+    with pytest.raises(IndexError):
+        buffer[1]
+    buffer.clear()
+    assert len(buffer) == 0 and list(buffer) == []
+
+
+def test_slope_window_retention():
+    window = RollingTrendRegression(5.0, capacity=8)
+    for second in range(20):
+        window.add(float(second), 30.0 + second)
+    assert list(window.timestamps) == [14.0, 15.0, 16.0, 17.0, 18.0, 19.0]
+    assert list(window.values) == [44.0, 45.0, 46.0, 47.0, 48.0, 49.0]
+    for tenth in range(200, 220):  # 10 trades a second, more than the capacity within the window
+        window.add(tenth / 10, 2.0 * tenth)
+    assert list(window.timestamps) == [tenth / 10 for tenth in range(212, 220)]
+    assert window.slope == pytest.approx(20.0)
@@ -0,0 +1,65 @@
+import pytest
+import base
+from base import RollingTradeWindow, RollingTrendRegression, TokenStats, TrendRegression, VirtualClock
+
+
+@pytest.fixture
+def clock():
+    clock = VirtualClock(1000.0)
+    base.set_clock(clock)
+    yield clock
+    base.set_clock(base.SystemClock())
+
+
+def test_trade_window_expires_old_trades():
+    window = RollingTradeWindow(10.0)
+    window.add(0.0, True, 1.0)
+    window.add(1.0, False, 0.5)
+    window.add(5.0, True, 3.0)
+    assert (window.buys, window.sells, window.buy_volume) == (2, 1, 4.0)
+    assert window.avg_buy_amount == 2.0 and window.buys_sells_ratio == 2.0
+    window.add(10.5, True, 2.0)  # the trade at 0.0 is out of the window
+    assert (window.buys, window.sells, window.buy_volume) == (2, 1, 5.0)
+    window.expire(30.0)
+    assert (window.buys, window.sells, window.buy_volume) == (0, 0, 0.0)
+    assert window.avg_buy_amount == 0 and window.buys_sells_ratio == 1
+
+
+def test_rolling_trend_matches_a_fit_of_the_window():
+    rolling = RollingTrendRegression(30.0)
+    samples = [(float(t), 30.0 + (t % 7) * t) for t in range(0, 100, 3)]
+    for sample in samples:
+        rolling.add(*sample)
+    expected = TrendRegression()
+    for t, value in samples:
+        if t >= samples[-1][0] - 30.0:
+            expected.add(t, value)
+    assert rolling.slope == pytest.approx(expected.slope)
+
+
+def test_rolling_trend_refits_samples_left_at_one_timestamp():
+    rolling = RollingTrendRegression(30.0)
+    rolling.add(0.0, 10.0)
+    rolling.add(40.0, 30.0)
+    rolling.add(40.0, 31.0)
+    rolling.add(40.0, 35.0)
+    expected = TrendRegression()
+    for value in (30.0, 31.0, 35.0):
+        expected.add(40.0, value)
+    assert rolling.slope == expected.slope
+
+
+def test_token_indicators_expire_when_read(clock):
+    token = TokenStats()
+    token.trade_window.add(clock.time(), True, 1.5)
+    token.trade_window.add(clock.time(), False, 0.2)
+    for second in range(4):
+        token.slope_window.add(clock.time() + second, 30.0 + 2 * second)
+    clock.now += 3
+    assert (token.buys_10s, token.sells_10s, token.buy_volume_10s) == (1, 1, 1.5)
+    assert token.avg_buy_amount_10s == 1.5 and token.buys_sells_ratio_10s == 1.0
+    assert token.slope_30s == pytest.approx(2.0)
+    clock.now += 60  # no trade since, nothing is left in the windows
+    assert (token.buys_10s, token.sells_10s, token.buy_volume_10s) == (0, 0, 0.0)
+    assert token.buys_sells_ratio_10s == 1
+    assert token.slope_30s == 0.0
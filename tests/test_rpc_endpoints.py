@@ -0,0 +1,144 @@
+import asyncio
+import socket
+import time
+import pytest
+import requests
+from solders.commitment_config import CommitmentLevel
+from solders.hash import Hash
+from solders.keypair import Keypair
+from solders.rpc.config import RpcSendTransactionConfig
+from solders.rpc.requests import SendVersionedTransaction
+from solders.transaction import VersionedTransaction
+from mock_solana import Endpoint, start_rpc
+from pump_transactions import INITIAL_VIRTUAL_SOL_RESERVES, INITIAL_VIRTUAL_TOKEN_RESERVES, trade_transaction
+from rpc_endpoints import MAX_SLOT_LAG, RpcEndpoints, parse_rpc_urls, release_rpc_endpoints, rpc_endpoints
+
+
+def _payload(chain, blockhash=None):
+    keypair = Keypair()
+    tx = trade_transaction(keypair.pubkey(), Keypair().pubkey(), "buy", 0.1, True, 20, 0.0001,
+                           blockhash or chain.blockhash(), INITIAL_VIRTUAL_SOL_RESERVES,
+                           INITIAL_VIRTUAL_TOKEN_RESERVES)
+    tx = VersionedTransaction(tx.message, [keypair])
+    config = RpcSendTransactionConfig(preflight_commitment=CommitmentLevel.Confirmed)
+    return SendVersionedTransaction(tx, config).to_json(), str(tx.signatures[0])
+
+
+def _unreachable_url():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    return f"http://127.0.0.1:{port}/"  # nothing listens there anymore
+
+
+def _settle(endpoints, timeout=5.0):
+    """Wait for the requests still completing in the background to be counted."""
+    deadline = time.monotonic() + timeout
+    while any(stats.answered < stats.sent for stats in endpoints.stats.values()) and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_parse_rpc_urls():
+    assert parse_rpc_urls("https://a, https://b\nhttps://a  ") == ["https://a", "https://b"]
+    assert parse_rpc_urls(["https://a", "", " https://b "]) == ["https://a", "https://b"]
+    assert parse_rpc_urls("") == []
+
+
+def test_the_fastest_endpoint_wins(mock_solana):
+    chain = mock_solana[0]
+    slow, _ = start_rpc(chain, Endpoint("slow", "fixed:300"))
+    fast, _ = start_rpc(chain, Endpoint("fast", "fixed:0"))
+    endpoints = RpcEndpoints([slow, fast])
+    payload, signature = _payload(chain)
+    assert endpoints.send_transaction(payload)["result"] == signature
+    assert endpoints.stats[fast].first == 1 and endpoints.stats[slow].first == 0
+    assert endpoints.stats[slow].sent == endpoints.stats[fast].sent == 1
+
+
+def test_errors_of_one_endpoint_are_hedged(mock_solana):
+    chain = mock_solana[0]
+    failing, _ = start_rpc(chain, Endpoint("failing", error_rate=1.0))
+    working, _ = start_rpc(chain, Endpoint("working", "fixed:0"))
+    endpoints = RpcEndpoints([failing, _unreachable_url(), working])
+    for _ in range(3):
+        payload, signature = _payload(chain)
+        assert endpoints.send_transaction(payload)["result"] == signature
+    _settle(endpoints)
+    assert endpoints.stats[working].accepted == 3
+    assert endpoints.stats[failing].rejected == 3
+    # the failing endpoints answer first, ranked by their success rate they fall behind the working one
+    assert endpoints.best() == working
+    assert endpoints.ranked()[:1] == [working]
+
+
+def test_rejections_and_unreachable_endpoints(mock_solana):
+    chain, _, rpc_url = mock_solana
+    payload, _ = _payload(chain, blockhash=Hash.new_unique())  # not a blockhash of the chain
+    reply = RpcEndpoints([rpc_url, _unreachable_url()]).send_transaction(payload)
+    assert "Blockhash not found" in reply["error"]["message"]
+    with pytest.raises(requests.RequestException):
+        RpcEndpoints([_unreachable_url()]).send_transaction(payload)
+
+
+def test_fanout_sends_to_the_best_ranked(mock_solana):
+    chain = mock_solana[0]
+    urls = [start_rpc(chain, Endpoint(f"rpc{i}", f"fixed:{latency}"))[0] for i, latency in enumerate((80, 0, 40))]
+    endpoints = RpcEndpoints(urls)
+    for _ in range(3):  # measures every endpoint once
+        endpoints.send_transaction(_payload(chain)[0])
+    _settle(endpoints)
+    assert endpoints.ranked() == [urls[1], urls[2], urls[0]]
+    sent = {url: endpoints.stats[url].sent for url in urls}
+    endpoints.send_transaction(_payload(chain)[0], fanout=1)
+    assert endpoints.stats[urls[1]].sent == sent[urls[1]] + 1
+    assert all(endpoints.stats[url].sent == sent[url] for url in (urls[0], urls[2]))
+
+
+def test_probes_rank_lagging_endpoints_last(mock_solana):
+    chain = mock_solana[0]
+    urls = [start_rpc(chain, Endpoint(f"probed{i}", f"fixed:{latency}"))[0] for i, latency in enumerate((0, 30))]
+    unreachable = _unreachable_url()
+    endpoints = RpcEndpoints(urls + [unreachable])
+    asyncio.run(endpoints.probe())
+    assert all(endpoints.stats[url].probes == 1 and endpoints.stats[url].slot is not None for url in urls)
+    assert endpoints.stats[unreachable].probe_errors == 1
+    assert abs(endpoints.latest_slot - chain.slot()) <= 1
+    assert endpoints.ranked() == [urls[0], urls[1], unreachable]
+    endpoints.stats[urls[0]].slot = endpoints.latest_slot - MAX_SLOT_LAG - 1  # as if the node fell behind
+    assert endpoints.ranked() == [urls[1], unreachable, urls[0]]
+
+
+def test_probing_in_the_background(mock_solana):
+    chain = mock_solana[0]
+    urls = [start_rpc(chain, Endpoint(f"background{i}", f"fixed:{latency}"))[0] for i, latency in enumerate((30, 0))]
+    endpoints = RpcEndpoints(urls)
+
+    async def main():
+        assert endpoints.start_probing(interval=0.01)
+        assert not endpoints.start_probing()  # already probing
+        await asyncio.sleep(0.3)
+        endpoints.stop_probing()
+
+    asyncio.run(main())
+    assert all(endpoints.stats[url].probes >= 2 for url in urls)
+    assert endpoints.best() == urls[1]
+
+
+def test_released_endpoints_are_closed_and_forgotten(mock_solana):
+    urls = [mock_solana[2]]
+    endpoints = rpc_endpoints(urls)
+    assert rpc_endpoints(urls) is endpoints
+
+    async def main():
+        endpoints.start_probing(interval=0.01)
+        await asyncio.sleep(0.05)
+        release_rpc_endpoints(endpoints)
+        await asyncio.sleep(0)
+        probes = endpoints.stats[urls[0]].probes
+        await asyncio.sleep(0.05)
+        assert endpoints.stats[urls[0]].probes == probes
+
+    asyncio.run(main())
+    with pytest.raises(RuntimeError):  # its threads are released
+        endpoints.send_transaction(_payload(mock_solana[0])[0])
+    assert rpc_endpoints(urls) is not endpoints
@@ -0,0 +1,140 @@
+import copy
+import json
+import pytest
+import headless
+from backtest import backtest
+from conftest import STRATEGY
+from engine import TRANSACTION_FEE
+from result_cache import ResultCache, result_key, sessions_fingerprint
+from sweep import Leaderboard, PnlFloor, grid, load_sweep, pnl_curve, random_search, render, sweep
+from vector_backtest import Dataset, vector_backtest
+
+TEMPLATE = copy.deepcopy(STRATEGY)
+TEMPLATE["enter_conditions"] = [[["buys", ">", "$min_buys"], ["buy/sell ratio", ">", "$min_ratio"]]]
+TEMPLATE["exit_conditions"] = [[["PnL", ">", "$take_profit"]], [["PnL", "<", -10]], [["time elapsed", ">", 20]]]
+PARAMETERS = {"min_buys": [4, 8], "min_ratio": {"min": 1.0, "max": 2.0, "step": 0.5}, "take_profit": 25}
+
+
+def test_grid_and_random_search():
+    configurations = list(grid(PARAMETERS))
+    assert len(configurations) == 6
+    assert configurations[0] == {"min_buys": 4, "min_ratio": 1.0, "take_profit": 25}
+    assert {c["min_ratio"] for c in configurations} == {1.0, 1.5, 2.0}
+    assert list(random_search(PARAMETERS, 5, seed=1)) == list(random_search(PARAMETERS, 5, seed=1))
+    assert all(c in configurations for c in random_search(PARAMETERS, 20, seed=2))
+    strategy = render(TEMPLATE, configurations[-1])
+    assert strategy["enter_conditions"][0] == [["buys", ">", 8], ["buy/sell ratio", ">", 2.0]]
+
+
+def test_load_sweep_checks_the_placeholders(tmp_path):
+    path = tmp_path / "sweep.json"
+    path.write_text(json.dumps({"strategy": TEMPLATE, "parameters": PARAMETERS}))
+    assert load_sweep(path) == (TEMPLATE, PARAMETERS)
+    path.write_text(json.dumps({"strategy": TEMPLATE, "parameters": {"min_buys": [1]}}))
+    with pytest.raises(ValueError, match="missing"):
+        load_sweep(path)
+
+
+@pytest.fixture(scope="module")
+def dataset_directory(session, tmp_path_factory):
+    directory = str(tmp_path_factory.mktemp("dataset"))
+    Dataset.cached([session[0]], directory)
+    return directory
+
+
+def test_results_match_single_backtests(dataset_directory, tmp_path):
+    configurations = list(grid(PARAMETERS))
+    leaderboard = Leaderboard()
+    for entry in sweep(TEMPLATE, configurations, dataset_directory, workers=2, results_cache=str(tmp_path)):
+        leaderboard.add(*entry)
+    assert len(leaderboard.results) == len(configurations) and not leaderboard.errors
+    dataset = Dataset.load(dataset_directory)
+    for index, params, result in leaderboard.results:
+        expected = vector_backtest(headless.parse_strategy(render(TEMPLATE, params)), dataset)
+        assert result["pnl"] == expected["statistics"]["pnl"]
+        assert result["trades"] == expected["statistics"]["trades"]
+    pnls = [result["pnl"] for _, _, result in leaderboard.ranked()]
+    assert pnls == sorted(pnls, reverse=True)
+    # the second run only reads the cache
+    cached = sorted(sweep(TEMPLATE, configurations, dataset_directory, workers=2, results_cache=str(tmp_path)))
+    assert [entry[2]["pnl"] for entry in cached] == [result["pnl"] for _, _, result in sorted(leaderboard.results)]
+
+
+def test_pnl_floor():
+    floor = PnlFloor([1.0, 2.0], top=2, margin=0.5, patience=2)
+    floor.add({"pnl": 5, "stopped": False, "curve": [1.0, 4.0]})
+    assert list(floor.pnls) == [float("-inf")] * 2  # not enough complete results yet
+    floor.add({"pnl": 3, "stopped": True, "curve": [9.0, 9.0]})  # stopped ones are not complete
+    floor.add({"pnl": 8, "stopped": False, "curve": [2.0, 3.0]})
+    assert list(floor.pnls) == [0.5, 2.5]
+    floor.add({"pnl": 9, "stopped": False, "curve": [0.5, 6.0]})  # the 5% result falls out of the top 2
+    assert list(floor.pnls) == [0.0, 2.5]
+
+
+def test_pnl_curve_marks_open_trades(dataset_directory):
+    dataset = Dataset.load(dataset_directory)
+    strategy = headless.parse_strategy(render(TEMPLATE, {"min_buys": 4, "min_ratio": 1.0, "take_profit": 25}))
+    ledger = vector_backtest(strategy, dataset)["ledger"]
+    times = sorted(trade["enter_time"] + 1.0 for trade in ledger[:8])
+    buy_size, trades = strategy["buy_size"], dataset.trades
+    expected = []
+    for checkpoint in times:
+        profit = sum(trade["sol_received"] - trade["sol_spent"] for trade in ledger if trade["exit_time"] < checkpoint)
+        for trade in ledger:
+            if trade["enter_time"] < checkpoint <= trade["exit_time"]:
+                rows = (trades["mint"] == dataset.mints.index(trade["mint"])) & (trades["time"] < checkpoint)
+                mcap = trades["mcap"][rows][-1]
+                profit += buy_size / trade["enter_mcap"] * (mcap + buy_size) - TRANSACTION_FEE - trade["sol_spent"]
+        expected.append(profit / strategy["sol_balance"] * 100)
+    curve = pnl_curve({"ledger": ledger}, times, strategy, dataset)
+    assert curve == pytest.approx(expected, abs=1e-9)
+    realized = pnl_curve({"ledger": [trade for trade in ledger if trade["exit_time"] < times[-1]]}, times, strategy,
+                         dataset)
+    assert curve != pytest.approx(realized)  # the open trades are not counted at their cost
+    # the simulation marks them the same way
+    assert not vector_backtest(strategy, dataset, pnl_floor=(times, [pnl - 1e-9 for pnl in curve], 1))["pruned"]
+    assert vector_backtest(strategy, dataset, pnl_floor=(times, [pnl + 1e-6 for pnl in curve], 1))["pruned"]
+
+
+def test_pruned_configurations_fall_behind_the_top(dataset_directory):
+    dataset = Dataset.load(dataset_directory)
+    strategy = headless.parse_strategy(render(TEMPLATE, {"min_buys": 4, "min_ratio": 1.0, "take_profit": 25}))
+    results = vector_backtest(strategy, dataset)
+    times = [dataset.start_time + 60 * i for i in range(1, 5)]
+    curve = pnl_curve(results, times, strategy, dataset)
+    # a floor of its own curve is always reached, one just above it is not
+    assert not vector_backtest(strategy, dataset, pnl_floor=(times, [pnl - 1e-9 for pnl in curve], 1))["pruned"]
+    above = [pnl + 1e-6 for pnl in curve]
+    pruned = vector_backtest(strategy, dataset, pnl_floor=(times, above, 1))
+    assert pruned["pruned"] and pruned["stopped"]
+    assert pruned["ledger"] == [trade for trade in results["ledger"] if trade["exit_time"] < times[0]]
+    # only after `patience` checkpoints in a row below the floor
+    pruned = vector_backtest(strategy, dataset, pnl_floor=(times, above, 3))
+    assert pruned["pruned"]
+    assert pruned["ledger"] == [trade for trade in results["ledger"] if trade["exit_time"] < times[2]]
+    assert not vector_backtest(strategy, dataset, pnl_floor=(times, above, len(times) + 1))["pruned"]
+    alternating = [pnl + 1e-6 if i % 2 == 0 else pnl - 1e-9 for i, pnl in enumerate(curve)]
+    assert not vector_backtest(strategy, dataset, pnl_floor=(times, alternating, 2))["pruned"]
+
+
+def test_sweep_with_pruning(dataset_directory):
+    configurations = list(grid(PARAMETERS))
+    results = list(sweep(TEMPLATE, configurations, dataset_directory, workers=1, shard_size=1, prune_top=1))
+    assert len(results) == len(configurations)
+    assert all(result["stopped"] for _, _, result, _ in results if result["pruned"])
+    # the first configuration finishes before the floor exists, the best complete one is at least as good
+    first = vector_backtest(headless.parse_strategy(render(TEMPLATE, configurations[0])),
+                            Dataset.load(dataset_directory))
+    assert max(result["pnl"] for _, _, result, _ in results if not result["stopped"]) >= first["statistics"]["pnl"]
+
+
+def test_event_driven_results_are_not_read_by_the_sweep(session, dataset_directory, tmp_path):
+    configurations = [{"min_buys": 4, "min_ratio": 1.0, "take_profit": 25}]
+    strategy = headless.parse_strategy(render(TEMPLATE, configurations[0]))
+    fingerprint = sessions_fingerprint([session[0]])
+    assert fingerprint == Dataset.load(dataset_directory).fingerprint
+    ResultCache(str(tmp_path)).put(fingerprint, result_key(strategy, fingerprint, 7),
+                                   backtest(strategy, [session[0]], 7))
+    (_, _, result, error), = sweep(TEMPLATE, configurations, dataset_directory, workers=1,
+                                   results_cache=str(tmp_path))
+    assert error is None and not result["stopped"]
@@ -0,0 +1,60 @@
+import math
+import random
+import numpy as np
+import pytest
+from base import TrendRegression
+
+
+def _reference(samples):
+    """Slope and r² of the least-squares fit, as `scipy.stats.linregress` gives them."""
+    x = np.array([t for t, _ in samples]) - samples[0][0]
+    y = np.array([v for _, v in samples])
+    slope = np.polyfit(x, y, 1)[0]
+    return slope, np.corrcoef(x, y)[0, 1] ** 2 if y.std() > 0 else 0.0
+
+
+def test_matches_least_squares():
+    rng = random.Random(1)
+    trend = TrendRegression()
+    samples = []
+    t = 1_700_000_000.0
+    for _ in range(500):
+        t += rng.expovariate(5)
+        samples.append((t, 30 + rng.gauss(0, 2) + 0.1 * len(samples)))
+        trend.add(*samples[-1])
+        if len(samples) > 2:
+            slope, r_squared = _reference(samples)
+            assert trend.slope == pytest.approx(slope, rel=1e-7, abs=1e-9)
+            assert trend.r_squared == pytest.approx(r_squared, rel=1e-7, abs=1e-9)
+
+
+def test_remove_undoes_add():
+    trend = TrendRegression()
+    samples = [(float(t), 30.0 + t * t) for t in range(10)]
+    for sample in samples:
+        trend.add(*sample)
+    for sample in samples[:4]:
+        trend.remove(*sample)
+    assert len(trend) == 6
+    slope, r_squared = _reference([(t, v) for t, v in samples[4:]])
+    assert trend.slope == pytest.approx(slope)
+    assert trend.r_squared == pytest.approx(r_squared)
+
+
+def test_same_timestamp_shifts_the_last_sample():
+    trend = TrendRegression()
+    for value in (30.0, 31.0, 35.0):
+        trend.add(100.0, value)
+    # as if the last sample were 1s later than the others
+    slope, _ = _reference([(100.0, 30.0), (100.0, 31.0), (101.0, 35.0)])
+    assert trend.slope == pytest.approx(slope)
+    assert math.isfinite(trend.r_squared)
+
+
+def test_degenerate_fits_are_zero():
+    trend = TrendRegression()
+    assert trend.slope == 0.0 and trend.r_squared == 0.0
+    trend.add(5.0, 30.0)
+    assert trend.slope == 0.0 and trend.r_squared == 0.0
+    trend.add(6.0, 30.0)
+    assert trend.slope == 0.0 and trend.r_squared == 0.0  # flat
@@ -0,0 +1,71 @@
+import copy
+import numpy as np
+import pytest
+import headless
+import vector_backtest as vector_backtest_module
+from base import SLOPE_WINDOW, RollingTrendRegression
+from backtest import backtest
+from conftest import STRATEGY
+from vector_backtest import Dataset, compare_results, token_indicators, vector_backtest
+
+
+@pytest.fixture(scope="module")
+def dataset(session):
+    return Dataset.from_sessions([session[0]])
+
+
+@pytest.mark.parametrize("seed", [7, 11])
+def test_matches_the_event_driven_backtest(session, dataset, seed):
+    strategy = headless.parse_strategy(STRATEGY)
+    reference = backtest(strategy, [session[0]], seed=seed)
+    results = vector_backtest(strategy, dataset, seed)
+    assert reference["statistics"]["trades"] > 0
+    assert compare_results(results, reference) == []
+    assert not results["stopped"]
+
+
+def test_matches_with_a_single_indicator(session, dataset):
+    strategy = copy.deepcopy(STRATEGY)
+    strategy["enter_conditions"] = [[["transaction/sec", ">", 3], ["avg buy amount", ">", 0.5]]]
+    strategy["exit_conditions"] = [[["PnL", ">", 10]], [["PnL", "<", -5]], [["mcap", "<", 25]]]
+    strategy = headless.parse_strategy(strategy)
+    assert compare_results(vector_backtest(strategy, dataset), backtest(strategy, [session[0]])) == []
+
+
+def test_saved_dataset_gives_the_same_results(session, dataset, tmp_path):
+    dataset.save(str(tmp_path))
+    loaded = Dataset.load(str(tmp_path))
+    assert loaded.frames == dataset.frames == session[1]
+    strategy = headless.parse_strategy(STRATEGY)
+    assert compare_results(vector_backtest(strategy, loaded), vector_backtest(strategy, dataset)) == []
+
+
+def test_stop_loss_stops_early(dataset):
+    strategy = copy.deepcopy(STRATEGY)
+    strategy["exit_conditions"] = [[["PnL", "<", -1]]]
+    strategy = headless.parse_strategy(strategy)
+    full = vector_backtest(strategy, dataset)
+    stopped = vector_backtest(strategy, dataset, stop_loss=0.5)
+    assert stopped["stopped"] and not full["stopped"]
+    assert len(stopped["ledger"]) < len(full["ledger"])
+    assert stopped["ledger"] == full["ledger"][:len(stopped["ledger"])]
+
+
+def test_enter_conditions_cannot_use_pnl(dataset):
+    strategy = copy.deepcopy(STRATEGY)
+    strategy["enter_conditions"] = [[["PnL", ">", 1]]]
+    with pytest.raises(ValueError):
+        vector_backtest(headless.parse_strategy(strategy), dataset)
+
+
+def test_slope_window_keeps_the_last_samples_like_the_engine(monkeypatch):
+    monkeypatch.setattr(vector_backtest_module, "MCAP_LOG_CAPACITY", 8)
+    rng = np.random.default_rng(4)
+    time_ = np.cumsum(rng.uniform(0.0, 0.5, 200))
+    mcap = 30 + np.cumsum(rng.normal(0.0, 1.0, 200))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        columns = token_indicators(time_, mcap, np.ones(200), np.ones(200, bool), {"slope_30s"})
+    window = RollingTrendRegression(SLOPE_WINDOW, capacity=8)
+    for i, (t, value) in enumerate(zip(time_, mcap)):
+        window.add(t - time_[0], value - mcap[0])
+        assert columns["slope_30s"][i] == pytest.approx(window.slope, abs=1e-9)
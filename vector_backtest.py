@@ -0,0 +1,840 @@
+import argparse
+import heapq
+import itertools
+import json
+import math
+import os
+import random
+import shutil
+import tempfile
+import time
+import numpy as np
+import headless
+from backtest import print_results, write_results
+from base import MCAP_LOG_CAPACITY, SLOPE_WINDOW, TRADE_WINDOW
+from engine import TRANSACTION_FEE
+from helper import ops, props, simulate_trade_finalization_time
+from replay import session_frames
+from result_cache import ResultCache, conditions_hash, evict_least_recent, result_key, sessions_fingerprint
+
+DATASET_FORMAT = 3
+SIGNALS_FORMAT = 1  # bump when a change to the indicators changes where the enter conditions hold
+MAX_SIGNALS_BYTES = 256 * 1024 * 1024  # entry signals kept next to a dataset, the least recently used go first
+TRADE_COLUMNS = {"time": np.float64, "order": np.int64, "mint": np.int32, "is_buy": np.bool_, "mcap": np.float64,
+                 "sol": np.float64, "trader": np.int32}
+CREATE_COLUMNS = {"time": np.float64, "order": np.int64, "mint": np.int32, "dev": np.int32}
+SEGMENT_COLUMNS = ("rows", "bounds", "time", "order", "mcap", "sol", "is_buy")
+VECTOR_OPS = (">", "<", ">=", "<=", "==", "!=")
+STALE_CHECK_INTERVAL = 1.0  # seconds between two runs of the engine's `sell_stale_tokens`
+
+# sim events, timers sort before the frames received at the same time
+_TIMER, _FRAME = 0, 1
+_CREATE, _FIRST_TRADE, _ENTER, _EXIT, _FILL_BUY, _FILL_SELL, _DISCARD, _STALE = range(8)
+
+
+def _fingerprint(paths):
+    return [[os.path.abspath(path), os.path.getsize(path), os.path.getmtime(path)] for path in paths]
+
+
+class Dataset:
+    """
+    Recorded sessions as columns: one row per buy/sell and one per token creation, in receive order.
+
+    Parsing the frames is the slow part of a backtest and does not depend on the strategy, so a dataset can be
+    saved once as plain `.npy` files and loaded (memory-mapped) for every run. Rows of each mint made after its
+    creation, the only ones the engine can subscribe to, are also kept grouped by mint in the `segment_*` columns,
+    and saved too so that processes loading the same dataset share its pages.
+    """
+
+    def __init__(self, start_time, frames, mints, trades, creates, sessions=(), segments=None, fingerprint=None):
+        self.start_time = start_time  # receive time of the first frame, where the replay clock starts
+        self.frames = frames
+        self.fingerprint = fingerprint  # `sessions_fingerprint` of the recorded sessions
+        self.mints = mints
+        self.trades = trades
+        self.creates = creates
+        self.sessions = list(sessions)
+        self.directory = None  # where the dataset was saved or loaded from, the entry signals are kept there too
+        self._entry_signals = dict()
+        self._mint_index = None  # index of each mint in `mints`, made by `mark_mcap` when first needed
+        for name, column in (segments or self._group_segments()).items():
+            setattr(self, f"segment_{name}", column)
+
+    @classmethod
+    def from_sessions(cls, paths):
+        mint_ids, trader_ids = dict(), dict()
+        trades = {name: [] for name in TRADE_COLUMNS}
+        creates = {name: [] for name in CREATE_COLUMNS}
+        start_time = None
+        order = -1
+        for order, (frame_time, raw) in enumerate(session_frames(paths)):
+            if start_time is None:
+                start_time = frame_time
+            data = json.loads(raw)
+            tx_type = data.get("txType")
+            if tx_type not in ("create", "buy", "sell") or "mint" not in data:
+                continue
+            mint = mint_ids.setdefault(data["mint"], len(mint_ids))
+            trader = trader_ids.setdefault(data.get("traderPublicKey"), len(trader_ids))
+            if tx_type == "create":
+                for name, value in zip(CREATE_COLUMNS, (frame_time, order, mint, trader)):
+                    creates[name].append(value)
+            else:
+                for name, value in zip(TRADE_COLUMNS, (frame_time, order, mint, tx_type == "buy",
+                                                       data["marketCapSol"], data["solAmount"], trader)):
+                    trades[name].append(value)
+        return cls(start_time if start_time is not None else 0.0, order + 1, list(mint_ids),
+                   {name: np.array(trades[name], dtype) for name, dtype in TRADE_COLUMNS.items()},
+                   {name: np.array(creates[name], dtype) for name, dtype in CREATE_COLUMNS.items()},
+                   _fingerprint(paths), fingerprint=sessions_fingerprint(paths))
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        shutil.rmtree(os.path.join(directory, "entries"), ignore_errors=True)  # computed on the previous data
+        segments = {name: getattr(self, f"segment_{name}") for name in SEGMENT_COLUMNS}
+        for prefix, columns in (("trade", self.trades), ("create", self.creates), ("segment", segments)):
+            for name, column in columns.items():
+                np.save(os.path.join(directory, f"{prefix}_{name}.npy"), column)
+        with open(os.path.join(directory, "dataset.json"), "w", encoding="utf-8") as f:
+            json.dump({"format": DATASET_FORMAT, "start_time": self.start_time, "frames": self.frames,
+                       "sessions": self.sessions, "fingerprint": self.fingerprint, "mints": self.mints}, f)
+        self.directory = directory
+
+    @classmethod
+    def load(cls, directory, mmap: bool = True):
+        with open(os.path.join(directory, "dataset.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["format"] != DATASET_FORMAT:
+            raise ValueError(f"Unsupported dataset format {meta['format']} in {directory}")
+
+        def load_columns(prefix, names):
+            # plain arrays over the mapped pages, a `np.memmap` is slower to slice
+            return {name: np.load(os.path.join(directory, f"{prefix}_{name}.npy"),
+                                  mmap_mode="r" if mmap else None).view(np.ndarray) for name in names}
+
+        dataset = cls(meta["start_time"], meta["frames"], meta["mints"], load_columns("trade", TRADE_COLUMNS),
+                      load_columns("create", CREATE_COLUMNS), meta["sessions"],
+                      load_columns("segment", SEGMENT_COLUMNS), meta["fingerprint"])
+        dataset.directory = directory
+        return dataset
+
+    @classmethod
+    def cached(cls, paths, directory):
+        """Load the dataset of `paths` from `directory`, parsing the sessions only if they changed since saved."""
+        try:
+            dataset = cls.load(directory)
+            if dataset.sessions == _fingerprint(paths):
+                return dataset
+        except (OSError, ValueError, KeyError):
+            pass
+        dataset = cls.from_sessions(paths)
+        dataset.save(directory)
+        return dataset
+
+    def entry_signals(self, enter_conditions):
+        """The `EntrySignals` of some enter conditions, shared by every backtest of this dataset using them."""
+        key = conditions_hash(enter_conditions)
+        if key not in self._entry_signals:
+            path = None
+            if self.directory is not None:
+                path = os.path.join(self.directory, "entries", f"{key}-{SIGNALS_FORMAT}.npz")
+            self._entry_signals[key] = EntrySignals(self.segment_bounds, path)
+        return self._entry_signals[key]
+
+    def mark_mcap(self, mint, before):
+        """Market cap of `mint` at its last trade received before time `before`, where its open trades are marked."""
+        if self._mint_index is None:
+            self._mint_index = {mint: index for index, mint in enumerate(self.mints)}
+        index = self._mint_index[mint]
+        start, end = self.segment_bounds[index], self.segment_bounds[index + 1]
+        row = start + np.searchsorted(self.segment_time[start:end], before) - 1
+        return self.segment_mcap[max(row, start)]
+
+    def _group_segments(self):
+        trades, creates = self.trades, self.creates
+        created_at = np.full(len(self.mints), np.iinfo(np.int64).max, np.int64)
+        created_at[creates["mint"][::-1]] = creates["order"][::-1]  # the first creation wins
+        after_creation = np.flatnonzero(trades["order"] > created_at[trades["mint"]])
+        rows = after_creation[np.argsort(trades["mint"][after_creation], kind="stable")]
+        bounds = np.searchsorted(trades["mint"][rows], np.arange(len(self.mints) + 1))
+        # contiguous per-mint columns, sliced without copies by the kernel
+        segments = {name: trades[name][rows] for name in ("time", "order", "mcap", "sol", "is_buy")}
+        return dict(segments, rows=rows, bounds=bounds)
+
+
+class EntrySignals:
+    """
+    Where a set of enter conditions holds: the segment row of each such trade and the number of the first satisfied
+    condition, grouped by mint.
+
+    They only depend on the enter conditions and the data, not on the exit conditions or the trade settings, so
+    backtests that keep the enter conditions (e.g. a sweep over the exit conditions) reuse them instead of
+    computing the indicators and the enter conditions of every token again. Mints are added as the backtests
+    subscribe to them, and `save` writes them next to the dataset for the next runs, evicting the least recently
+    used signals of other enter conditions above `MAX_SIGNALS_BYTES`. The entry time and mcap of a signal are the
+    ones of its row in the dataset.
+    """
+
+    def __init__(self, bounds, path=None):
+        self.bounds = bounds
+        self.path = path
+        self.computed = np.zeros(len(bounds) - 1, np.bool_)
+        self.rows = np.zeros(0, np.int64)
+        self.conditions = np.zeros(0, np.int64)
+        self.added = dict()  # mint -> (rows, conditions) computed since the last save
+        if path is not None:
+            self._merge_saved()
+
+    def get(self, mint):
+        """`(rows, conditions)` of a mint, None if not computed yet."""
+        if mint in self.added:
+            return self.added[mint]
+        if not self.computed[mint]:
+            return None
+        lo, hi = np.searchsorted(self.rows, self.bounds[mint:mint + 2])
+        return self.rows[lo:hi], self.conditions[lo:hi]
+
+    def add(self, mint, rows, conditions):
+        self.added[mint] = (rows, conditions)
+
+    def _merge(self, computed, rows, conditions):
+        """Take the mints of `computed` not known yet, with their signals."""
+        new = computed & ~self.computed
+        if not new.any():
+            return
+        keep = new[np.searchsorted(self.bounds, rows, side="right") - 1]
+        order = np.argsort(np.concatenate((self.rows, rows[keep])), kind="stable")
+        self.rows = np.concatenate((self.rows, rows[keep]))[order]
+        self.conditions = np.concatenate((self.conditions, conditions[keep]))[order]
+        self.computed = self.computed | new
+
+    def _merge_saved(self):
+        try:
+            with np.load(self.path) as saved:
+                computed, rows, conditions = saved["computed"], saved["rows"], saved["conditions"]
+            os.utime(self.path)
+        except (OSError, ValueError, KeyError):
+            return
+        if len(computed) == len(self.computed):
+            self._merge(computed, rows, conditions)
+
+    def save(self):
+        """Write the signals computed since the last save, along with the ones saved meanwhile by other processes."""
+        if not self.added:
+            return
+        mints = np.fromiter(self.added, np.int64, len(self.added))
+        computed = np.zeros_like(self.computed)
+        computed[mints] = True
+        self._merge(computed, np.concatenate([rows for rows, _ in self.added.values()]),
+                    np.concatenate([conditions for _, conditions in self.added.values()]))
+        self.added = dict()
+        if self.path is None:
+            return
+        self._merge_saved()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, computed=self.computed, rows=self.rows, conditions=self.conditions)
+        os.replace(tmp_path, self.path)
+        entries = []
+        for entry in os.scandir(os.path.dirname(self.path)):
+            if entry.name.endswith(".npz") and entry.path != self.path:
+                stat = entry.stat()
+                entries.append((entry.path, stat.st_size, stat.st_mtime))
+        evict_least_recent(entries, MAX_SIGNALS_BYTES - os.path.getsize(self.path))
+
+
+def _regression(moments, x, y, lo, min_samples):
+    """
+    Slope and r² of the least-squares fit over rows `lo[i]..i`, for every row i, as `TrendRegression` gives them.
+
+    `moments` are the running sums of 1, x, y, x², y² and xy with a leading column of zeros. `lo` can stack several
+    windows, one per row of a 2D array. Rows with `min_samples` samples or fewer get 0 like the engine, which does
+    not update them below that.
+    """
+    sums = moments[:, 1:] if lo.ndim == 1 else moments[:, None, 1:]
+    n, sx, sy, sxx, syy, sxy = sums - moments[:, lo]
+    m2_x = sxx - sx * sx / n
+    # all samples at the same time: the last one is shifted by 1s
+    shifted = (m2_x <= 1e-9) & (n > 1)
+    if shifted.any():
+        sx = np.where(shifted, sx + 1, sx)
+        sxx = np.where(shifted, sxx + 2 * x + 1, sxx)
+        sxy = np.where(shifted, sxy + y, sxy)
+        m2_x = sxx - sx * sx / n
+    m2_y = syy - sy * sy / n
+    c_xy = sxy - sx * sy / n
+    valid = (n > min_samples) & (m2_x > 1e-9)
+    slope = np.where(valid, c_xy / m2_x, 0.0)
+    r = np.clip(c_xy / np.sqrt(m2_x * m2_y), -1.0, 1.0)
+    r_squared = np.where(valid & (m2_y > 0), r * r, 0.0)
+    return slope, r_squared
+
+
+def token_indicators(time_, mcap, sol, is_buy, needed):
+    """
+    The `TokenStats` properties in `needed` after each trade of a token, one array per property.
+
+    Same values `update_values` computes trade by trade, but for the whole life of the token at once. Divisions by
+    zero are masked out, call it under `np.errstate(divide="ignore", invalid="ignore")`.
+    """
+    count = len(time_)
+    rows = np.arange(count)
+    buys = np.cumsum(is_buy)
+    sells = rows + 1 - buys
+    columns = {"current_mcap": mcap, "buys": buys, "sells": sells, "total_trades": rows + 1}
+    trade_window = bool(needed & {"buys_10s", "sells_10s", "buy_volume_10s", "avg_buy_amount_10s",
+                                  "buys_sells_ratio_10s"})
+    if "avg_buy_amount" in needed or trade_window:
+        buy_volume = np.zeros(count + 1)
+        np.cumsum(np.where(is_buy, sol, 0.0), out=buy_volume[1:])
+        columns["avg_buy_amount"] = np.where(buys > 0, buy_volume[1:] / buys, 0.0)
+    if "buys_sells_ratio" in needed:
+        columns["buys_sells_ratio"] = np.where(sells > 0, buys / sells, 1.0)
+    if "tx_sec" in needed:
+        buckets = (time_ * 10.0).astype(np.int64)  # `RateMeter` buckets of 0.1s over a 1s window
+        columns["tx_sec"] = (rows - np.searchsorted(buckets, buckets - 9) + 1) / 1.0
+    if needed & {"slope", "trend_strength", "slope_30s"}:
+        x = time_ - time_[0]
+        y = mcap - mcap[0]
+        moments = np.zeros((6, count + 1))
+        np.cumsum(np.stack((np.ones(count), x, y, x * x, y * y, x * y)), axis=1, out=moments[:, 1:])
+        # all the samples so far for `trend` and the last 30s (at most `MCAP_LOG_CAPACITY` samples) for
+        # `slope_window`, fitted together when both are used
+        if "slope_30s" not in needed:
+            columns["slope"], columns["trend_strength"] = _regression(moments, x, y, np.zeros(count, np.int64), 2)
+        else:
+            window_start = np.maximum(np.searchsorted(time_, time_ - SLOPE_WINDOW), rows - MCAP_LOG_CAPACITY + 1)
+            lo = np.stack((np.zeros(count, np.int64), window_start))
+            slope, r_squared = _regression(moments, x, y, lo, 2)
+            columns.update(slope=slope[0], trend_strength=r_squared[0], slope_30s=slope[1])
+    if trade_window:
+        lo = np.searchsorted(time_, time_ - TRADE_WINDOW)
+        buys_10s = buys - np.concatenate(([0], buys))[lo]
+        sells_10s = rows + 1 - lo - buys_10s
+        buy_volume_10s = np.where(buys_10s > 0, buy_volume[1:] - buy_volume[lo], 0.0)
+        columns["avg_buy_amount_10s"] = np.where(buys_10s > 0, buy_volume_10s / buys_10s, 0.0)
+        columns["buys_sells_ratio_10s"] = np.where(sells_10s > 0, buys_10s / sells_10s, 1.0)
+        columns.update(buys_10s=buys_10s, sells_10s=sells_10s, buy_volume_10s=buy_volume_10s)
+    return columns
+
+
+class VectorConditions:
+    """
+    Strategy conditions evaluated over columns of indicators instead of one token at a time.
+
+    `evaluate` returns, for every row, the number of the first satisfied condition or 0, the same condition number
+    `CompiledConditions.evaluate` gives for that row. The `is`/`is not` operators compare object identities and
+    have no column equivalent, they raise ValueError like an unsupported operator.
+    """
+
+    def __init__(self, conditions):
+        self.conditions = []
+        for cond_no, cond in enumerate(conditions, start=1):
+            compiled = []
+            for subcond in cond:
+                if len(subcond) != 3:
+                    raise ValueError(f"Malformed sub-condition in condition {cond_no}: {subcond}")
+                prop_name, op, value = subcond
+                if prop_name not in props:
+                    raise ValueError(f"Unsupported property: {prop_name}")
+                if op not in VECTOR_OPS:
+                    raise ValueError(f"Unsupported operator in a vectorized backtest: {op}")
+                compiled.append((props[prop_name], ops[op], value))
+            self.conditions.append(compiled)
+        self.referenced_props = {prop for cond in self.conditions for prop, _, _ in cond}
+
+    def evaluate(self, columns, count):
+        numbers = np.zeros(count, np.int64)
+        for cond_no in range(len(self.conditions), 0, -1):  # the first satisfied condition wins
+            satisfied = True
+            for prop, op, value in self.conditions[cond_no - 1]:
+                satisfied = satisfied & op(columns[prop], value)
+            numbers[satisfied] = cond_no
+        return numbers
+
+
+class _Stopped(Exception):
+    """Raised by the simulation when the strategy lost more than its stop loss, or fell below its PnL floor."""
+
+    def __init__(self, pruned: bool = False):
+        super().__init__()
+        self.pruned = pruned
+
+
+class _Token:
+    """State of a subscribed token in the simulation, the subset of `TokenStats` the decisions depend on."""
+
+    __slots__ = ("mint", "index", "start", "end", "columns", "enter_rows", "enter_numbers", "exit_rows", "exit_numbers",
+                 "version", "subscribed", "unsubscribed_at", "trade_entered", "executing_order", "exhausted",
+                 "order_row", "order_mcap", "order_condition", "order_fees", "entering_time", "entering_mcap",
+                 "entering_condition", "entering_sol", "token_amount")
+
+    def __init__(self, mint, index, start, end):
+        self.mint = mint
+        self.index = index
+        self.start = start
+        self.end = end
+        self.columns = None
+        self.enter_rows = None
+        self.version = 0  # bumped to cancel the pending enter/exit candidate
+        self.subscribed = False
+        self.unsubscribed_at = None
+        self.trade_entered = False
+        self.executing_order = False
+        self.exhausted = False
+
+
+class _Simulation:
+    """
+    The engine's decisions on a `Dataset`, jumping from one candidate trade to the next.
+
+    Indicators and condition numbers are computed per token with NumPy, so only the trades where a condition holds
+    are visited. What depends on the order of events across tokens (the SOL balance, the batch subscriptions, the
+    inactivity and batch timers and the random finalization times) is replayed in the engine's order on a heap of
+    events, timers first at equal times, like `VirtualClock` wakes its sleepers before delivering a frame.
+    """
+
+    def __init__(self, strategy, dataset: Dataset, enter_conditions, exit_conditions, stop_balance=None,
+                 entry_signals=None, pnl_floor=None):
+        self.strategy = strategy
+        self.stop_balance = stop_balance
+        self.floor_times, self.floor_pnls, self.floor_patience = pnl_floor if pnl_floor is not None else ((), (), 1)
+        self.checkpoint = 0  # index of the next time of `floor_times`
+        self.failed_checkpoints = 0  # consecutive checkpoints where the PnL was below the floor
+        self.next_checkpoint = self.floor_times[0] if self.floor_times else math.inf
+        self.dataset = dataset
+        self.enter_conditions = enter_conditions
+        self.entry_signals = entry_signals if entry_signals is not None else EntrySignals(dataset.segment_bounds)
+        self.exit_conditions = exit_conditions
+        self.needed = enter_conditions.referenced_props | exit_conditions.referenced_props
+        self.exit_indicators = exit_conditions.referenced_props - {"pnl", "time_elapsed"}
+        self.sol_balance = strategy["sol_balance"]
+        self.heap = []
+        self.timer_sequence = itertools.count()
+        self.tokens = dict()
+        self.open_trades = 0
+        self.committed_sol = 0  # SOL spent on the open trades
+        self.realized_profit = 0.0  # summed in ledger order, so that `sweep.pnl_curve` gives the same floats
+        self.stale_deadline = dataset.start_time + STALE_CHECK_INTERVAL
+        self.stale_scheduled = False
+        self.subscribed = dict()
+        self.all_subscribed = []
+        self.subbed_tokens_count = 0
+        self.strategy_transcript = dict()
+        self.trade_ledger = list()
+        self.tokens_created = 0
+        self.tokens_evaluated = 0
+        self.trades = 0
+        self.profitable_trades = 0
+        self.pnl_sum = 0
+        self.time_in_trade_sum = 0
+        self.now = dataset.start_time
+        creates = dataset.creates["time"]
+        self.last_create_time = creates[-1] if len(creates) else -math.inf  # creations are always delivered
+
+    def _sleep(self, seconds, action, token=None):
+        deadline = self.now + max(0.0, seconds)
+        heapq.heappush(self.heap, (deadline, _TIMER, next(self.timer_sequence), action, token, 0, 0))
+
+    def _frame(self, row, action, token):
+        ds = self.dataset
+        heapq.heappush(self.heap, (ds.segment_time[row], _FRAME, ds.segment_order[row], action, token, token.version,
+                                   row))
+
+    def _columns(self, token):
+        if token.columns is None:
+            ds = self.dataset
+            s, e = token.start, token.end
+            # with its entry signals known, a token only needs the indicators of the exit conditions
+            needed = self.needed if token.enter_rows is None else self.exit_indicators
+            token.columns = token_indicators(ds.segment_time[s:e], ds.segment_mcap[s:e], ds.segment_sol[s:e],
+                                             ds.segment_is_buy[s:e], needed)
+        return token.columns
+
+    def _enter_signals(self, token):
+        if token.enter_rows is None:
+            signals = self.entry_signals.get(token.index)
+            if signals is None:
+                numbers = self.enter_conditions.evaluate(self._columns(token), token.end - token.start)
+                rows = np.flatnonzero(numbers)
+                signals = (rows + token.start, numbers[rows])
+                self.entry_signals.add(token.index, *signals)
+            token.enter_rows, token.enter_numbers = signals
+
+    def _next_enter(self, token, row):
+        self._enter_signals(token)
+        i = np.searchsorted(token.enter_rows, row)
+        token.version += 1
+        if i < len(token.enter_rows):
+            self._frame(token.enter_rows[i], _ENTER, token)
+
+    def _next_exit(self, token, row):
+        token.version += 1
+        i = np.searchsorted(token.exit_rows, row)
+        if i < len(token.exit_rows):
+            self._frame(token.exit_rows[i], _EXIT, token)
+
+    def _last_row(self, token, before, at_least):
+        """Last trade of the token received before time `before`, the one `tokens[mint].current_mcap` comes from."""
+        row = token.start + np.searchsorted(self.dataset.segment_time[token.start:token.end], before) - 1
+        return max(row, at_least)
+
+    def _delivers_after(self, deadline):
+        """Whether a frame is still delivered at or after `deadline`, the replay clock stops at the last one."""
+        if deadline <= self.last_create_time:
+            return True
+        times = self.dataset.segment_time
+        return any(token.end > token.start and times[token.end - 1] >= deadline for token in self.subscribed.values())
+
+    def _place_order(self, token, row, condition):
+        token.executing_order = True
+        token.order_row = row
+        token.order_mcap = self.dataset.segment_mcap[row]
+        token.order_condition = condition
+        delay, token.order_fees = simulate_trade_finalization_time(priority_fee=self.strategy["priority_fee"])
+        self._sleep(delay, _FILL_BUY if not token.trade_entered else _FILL_SELL, token)
+
+    def _enter_trade(self, token, row):
+        ds, buy_size = self.dataset, self.strategy["buy_size"]
+        token.trade_entered = True
+        token.executing_order = False
+        token.entering_time = self.now
+        token.entering_mcap = ds.segment_mcap[row]
+        token.entering_condition = token.order_condition
+        token.entering_sol = buy_size + TRANSACTION_FEE + token.order_fees
+        token.token_amount = buy_size / (token.entering_mcap / 1000000000)
+        self.sol_balance -= token.entering_sol
+        self.committed_sol += token.entering_sol
+        self.open_trades += 1
+        if not self.stale_scheduled:
+            self._schedule_stale()
+        self.strategy_transcript[token.mint] = (token.order_condition, 0)
+
+        s = row + 1
+        mcap, time_ = ds.segment_mcap[s:token.end], ds.segment_time[s:token.end]
+        columns = dict()
+        if self.exit_indicators:
+            indicators = self._columns(token)
+            columns = {prop: indicators[prop][s - token.start:] for prop in self.exit_indicators}
+        columns["pnl"] = ((mcap - token.entering_mcap) / token.entering_mcap) * 100
+        columns["time_elapsed"] = time_ - token.entering_time
+        token.exit_numbers = np.zeros(token.end - token.start, np.int64)
+        token.exit_numbers[s - token.start:] = self.exit_conditions.evaluate(columns, len(mcap))
+        token.exit_rows = np.flatnonzero(token.exit_numbers) + token.start
+        self._next_exit(token, s)
+
+    def _exit_trade(self, token, row, condition, fees=0):
+        current_mcap = self.dataset.segment_mcap[row]
+        current_price = (current_mcap + self.strategy["buy_size"]) / 1000000000
+        profit = (token.token_amount * current_price) - (TRANSACTION_FEE + fees)
+        self.sol_balance += profit
+        pnl = ((current_mcap - token.entering_mcap) / token.entering_mcap) * 100
+        token.exhausted = True
+        token.trade_entered = False
+        token.version += 1
+        self.open_trades -= 1
+        self.committed_sol -= token.entering_sol
+        self.realized_profit += float(profit) - token.entering_sol
+
+        self.trades += 1
+        self.time_in_trade_sum += self.now - token.entering_time
+        self.pnl_sum += pnl
+        if pnl > 0:
+            self.profitable_trades += 1
+        self.strategy_transcript[token.mint] = (token.entering_condition, condition)
+        self.trade_ledger.append({"mint": token.mint,
+                                  "enter_condition": token.entering_condition, "exit_condition": condition,
+                                  "enter_time": token.entering_time, "exit_time": self.now,
+                                  "enter_mcap": float(token.entering_mcap), "exit_mcap": float(current_mcap),
+                                  "sol_spent": token.entering_sol, "sol_received": float(profit), "pnl": float(pnl),
+                                  "sol_balance": float(self.sol_balance)})
+        if self.stop_balance is not None and self.sol_balance + self.committed_sol < self.stop_balance:
+            raise _Stopped()
+
+    def _marked_pnl(self, before):
+        """PnL (in %) at time `before`, the open trades marked at the last price of their token like `sweep.pnl_curve`."""
+        profit, buy_size = self.realized_profit, self.strategy["buy_size"]
+        for token in self.tokens.values():
+            if token.trade_entered:
+                mcap = self.dataset.segment_mcap[self._last_row(token, before, token.start)]
+                profit += float(token.token_amount * ((mcap + buy_size) / 1000000000)) - TRANSACTION_FEE \
+                    - token.entering_sol
+        return profit / self.strategy["sol_balance"] * 100
+
+    def _check_floor(self):
+        """Stop once the PnL was below the floor at `floor_patience` checkpoints in a row."""
+        while self.checkpoint < len(self.floor_times) and self.floor_times[self.checkpoint] <= self.now:
+            if self._marked_pnl(self.floor_times[self.checkpoint]) < self.floor_pnls[self.checkpoint]:
+                self.failed_checkpoints += 1
+                if self.failed_checkpoints >= self.floor_patience:
+                    raise _Stopped(pruned=True)
+            else:
+                self.failed_checkpoints = 0
+            self.checkpoint += 1
+        self.next_checkpoint = self.floor_times[self.checkpoint] if self.checkpoint < len(self.floor_times) \
+            else math.inf
+
+    def _on_create(self, token):
+        self.tokens_created += 1
+        if self.subbed_tokens_count < self.strategy["batch_reset_size"]:
+            self.subbed_tokens_count += 1
+            self.tokens_evaluated += 1
+            token.subscribed = True
+            self.subscribed[token.mint] = token
+            self.all_subscribed.append(token)
+            if token.end > token.start:
+                self._frame(token.start, _FIRST_TRADE, token)
+
+    def _on_enter(self, token, row):
+        if self.sol_balance > self.strategy["buy_size"]:
+            self._place_order(token, row, int(token.enter_numbers[np.searchsorted(token.enter_rows, row)]))
+        else:
+            self._next_enter(token, row + 1)
+
+    def _on_fill_buy(self, token):
+        row = self._last_row(token, self.now, token.order_row)
+        current_mcap = self.dataset.segment_mcap[row]
+        price_movement = ((current_mcap - token.order_mcap) / current_mcap) * 100
+        if price_movement < self.strategy["max_slippage"]:
+            self._enter_trade(token, row)
+        else:
+            token.executing_order = False
+            self._next_enter(token, row + 1)
+
+    def _on_fill_sell(self, token):
+        row = self._last_row(token, self.now, token.order_row)
+        current_mcap = self.dataset.segment_mcap[row]
+        price_movement = ((current_mcap - token.order_mcap) / current_mcap) * 100
+        if -1 * price_movement < self.strategy["max_slippage"]:
+            self._exit_trade(token, row, token.order_condition, token.order_fees)
+        else:
+            token.executing_order = False
+            self._next_exit(token, row + 1)
+
+    def _on_discard(self):
+        if self.subbed_tokens_count >= self.strategy["batch_reset_size"]:
+            if not any(token.trade_entered or (token.executing_order and not token.exhausted)
+                       for token in self.tokens.values()):
+                for token in self.tokens.values():
+                    token.subscribed = False
+                    token.unsubscribed_at = self.now
+                    token.version += 1
+                    del self.subscribed[token.mint]
+                self.tokens = dict()
+                self.subbed_tokens_count = 0
+        self._sleep(30, _DISCARD)
+
+    def _schedule_stale(self):
+        """
+        Put the tick of `sell_stale_tokens` back on the heap once a trade is open, it does nothing without one.
+
+        The ticks stay on the same grid as the engine's, the deadlines skipped in between are still added up one
+        interval at a time.
+        """
+        while self.stale_deadline <= self.now:
+            self.stale_deadline += STALE_CHECK_INTERVAL
+        heapq.heappush(self.heap, (self.stale_deadline, _TIMER, next(self.timer_sequence), _STALE, None, 0, 0))
+        self.stale_scheduled = True
+
+    def _on_stale(self):
+        ds, now = self.dataset, self.now
+        threshold = self.strategy["inactivity_reset_time"]
+        recent_bucket = int(now * 10.0) - 9  # first `RateMeter` bucket still counted in `tx_sec`
+        for token in self.tokens.values():
+            if token.trade_entered and not token.executing_order:
+                row = self._last_row(token, now, token.start)
+                last_trade_time = max(ds.segment_time[row], token.entering_time)
+                if now - last_trade_time >= threshold and int(ds.segment_time[row] * 10.0) < recent_bucket:
+                    self._exit_trade(token, row, 101)
+        self.stale_deadline = now + STALE_CHECK_INTERVAL
+        self.stale_scheduled = False
+        if self.open_trades:
+            self._schedule_stale()
+
+    def run(self, seed):
+        random.seed(seed)
+        ds = self.dataset
+        creates = ds.creates
+        for mint_id, order, created_time in zip(creates["mint"].tolist(), creates["order"].tolist(),
+                                                creates["time"].tolist()):
+            token = _Token(ds.mints[mint_id], mint_id, ds.segment_bounds[mint_id], ds.segment_bounds[mint_id + 1])
+            self.heap.append((created_time, _FRAME, order, _CREATE, token, 0, 0))
+        heapq.heapify(self.heap)
+        self._sleep(30, _DISCARD)
+
+        heap = self.heap
+        while heap:
+            event_time, kind, _, action, token, version, row = heap[0]
+            if kind == _TIMER and not self._delivers_after(event_time):
+                break
+            heapq.heappop(heap)
+            self.now = max(self.now, event_time)
+            if self.now >= self.next_checkpoint:
+                self._check_floor()
+            if kind == _FRAME and action != _CREATE and (version != token.version or not token.subscribed):
+                continue  # cancelled candidate
+            if action == _CREATE:
+                self._on_create(token)
+            elif action == _FIRST_TRADE:
+                self.tokens[token.mint] = token
+                self._next_enter(token, token.start + 1)
+            elif action == _ENTER:
+                self._on_enter(token, row)
+            elif action == _EXIT:
+                self._place_order(token, row, int(token.exit_numbers[row - token.start]))
+            elif action == _FILL_BUY:
+                self._on_fill_buy(token)
+            elif action == _FILL_SELL:
+                self._on_fill_sell(token)
+            elif action == _DISCARD:
+                self._on_discard()
+            elif action == _STALE:
+                self._on_stale()
+
+        # the replay ends on the last delivered frame, where `subscribe` sells the remaining open trades
+        end_time = self.last_create_time
+        for token in self.all_subscribed:
+            if token.end > token.start:
+                last = token.end if token.unsubscribed_at is None else \
+                    token.start + np.searchsorted(ds.segment_time[token.start:token.end], token.unsubscribed_at)
+                if last > token.start:
+                    end_time = max(end_time, ds.segment_time[last - 1])
+        self.now = max(self.now, end_time)
+        for token in self.tokens.values():
+            if token.trade_entered and not token.executing_order:
+                self._exit_trade(token, self._last_row(token, math.nextafter(self.now, math.inf), token.start), 100)
+
+
+def vector_backtest(strategy, dataset: Dataset, seed: int = 7, stop_loss: float | None = None, pnl_floor=None):
+    """
+    Backtest a strategy on a `Dataset` and return the same results as `backtest.backtest` on its sessions.
+
+    The decisions, the trade ledger and the statistics match the event-driven backtest with the same `seed`, up to
+    floating point rounding in the indicators.
+
+    With `stop_loss` (in %), the run stops as soon as the balance, open trades counted at their cost, is down by
+    more than that. The results then only cover the data up to that point and `stopped` is set. `pnl_floor`, sorted
+    times, PnLs (in %) and a patience, stops it the same way once its PnL, open trades marked at the last price of
+    their token, was below `pnls[i]` at `times[i]` for `patience` of the times in a row. `pruned` is then set too.
+    The floor is read as the run goes, it can be updated meanwhile.
+
+    The entry signals are reused from the previous backtests of the dataset with the same enter conditions, so
+    changing only the exit conditions skips the indicators of the tokens that are never traded.
+    """
+    headless.validate_strategy(strategy)
+    enter_conditions = VectorConditions(strategy["enter_conditions"])
+    exit_conditions = VectorConditions(strategy["exit_conditions"])
+    if enter_conditions.referenced_props & {"pnl", "time_elapsed"}:
+        raise ValueError("PnL and time elapsed can only be used in exit conditions")
+
+    start = time.perf_counter()
+    stop_balance = strategy["sol_balance"] * (1 - stop_loss / 100) if stop_loss is not None else None
+    entry_signals = dataset.entry_signals(strategy["enter_conditions"])
+    simulation = _Simulation(strategy, dataset, enter_conditions, exit_conditions, stop_balance, entry_signals,
+                             pnl_floor)
+    stopped = pruned = False
+    with np.errstate(divide="ignore", invalid="ignore"):
+        try:
+            simulation.run(seed)
+        except _Stopped as e:
+            stopped, pruned = True, e.pruned
+    entry_signals.save()
+    elapsed = time.perf_counter() - start
+
+    trades = simulation.trades
+    sol_balance = simulation.sol_balance
+    statistics = {
+        "tokens_created": simulation.tokens_created,
+        "tokens_evaluated": simulation.tokens_evaluated,
+        "trades": trades,
+        "profitable_trades": simulation.profitable_trades,
+        "avg_pnl": simulation.pnl_sum / trades if trades else 0,
+        "avg_time_in_trade": simulation.time_in_trade_sum / trades if trades else 0,
+        "pnl": ((sol_balance - strategy["sol_balance"]) / strategy["sol_balance"]) * 100,
+        "sol_balance": sol_balance,
+        "session_duration": simulation.now + 1 - dataset.start_time,  # `subscribe` waits 1s more to unsubscribe
+        "events": dataset.frames,
+        "events_per_minute": dataset.frames / elapsed * 60,
+    }
+    return {"strategy_transcript": simulation.strategy_transcript,
+            "statistics": statistics,
+            "ledger": simulation.trade_ledger,
+            "stopped": stopped,
+            "pruned": pruned}
+
+
+def compare_results(results, reference, rel_tol: float = 1e-9):
+    """Differences between two backtest results, ignoring the speed and float noise below `rel_tol`."""
+    differences = []
+
+    def same(a, b):
+        if isinstance(a, float) or isinstance(b, float):
+            return math.isclose(a, b, rel_tol=rel_tol, abs_tol=rel_tol)
+        return a == b
+
+    if results["strategy_transcript"] != reference["strategy_transcript"]:
+        differences.append("strategy transcripts differ")
+    if len(results["ledger"]) != len(reference["ledger"]):
+        differences.append(f"{len(results['ledger'])} trades instead of {len(reference['ledger'])}")
+    for i, (entry, expected) in enumerate(zip(results["ledger"], reference["ledger"])):
+        fields = [field for field in expected if not same(entry[field], expected[field])]
+        if fields:
+            differences.append(f"trade {i} ({expected['mint']}) differs in {', '.join(fields)}")
+            break
+    for key, expected in reference["statistics"].items():
+        if key != "events_per_minute" and not same(results["statistics"][key], expected):
+            differences.append(f"{key}: {results['statistics'][key]} instead of {expected}")
+    return differences
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest a Gem-Finder strategy on recorded sessions with NumPy")
+    parser.add_argument("--strategy", help="Strategy JSON exported from the GUI", required=True, type=str)
+    parser.add_argument("--sessions", help="Session files recorded with --record", required=True, nargs="+", type=str)
+    parser.add_argument("--seed", help="Seed of the simulated trade finalization times", default=7, type=int)
+    parser.add_argument("--cache", help="Keep the parsed sessions in this directory and reuse them on the next runs",
+                        default=None, type=str)
+    parser.add_argument("--output", help="Write transcript.json, statistics.json and ledger.csv into this directory",
+                        default=None, type=str)
+    parser.add_argument("--compare", help="Also run the event-driven backtest and check that the results match",
+                        action="store_true")
+    parser.add_argument("--results_cache", help="Reuse the results of identical backtests stored in this directory",
+                        default=None, type=str)
+    args = parser.parse_args()
+
+    strategy = headless.load_strategy(args.strategy)
+    start = time.perf_counter()
+    dataset = Dataset.cached(args.sessions, args.cache) if args.cache else Dataset.from_sessions(args.sessions)
+    print(f"Loaded {dataset.frames:,} frames in {time.perf_counter() - start:.2f}s")
+    results_cache = ResultCache(args.results_cache) if args.results_cache else None
+    key = result_key(strategy, dataset.fingerprint, args.seed, simulator="vector")
+    start = time.perf_counter()
+    results = results_cache.get(dataset.fingerprint, key) if results_cache else None
+    if results is not None:
+        print("Results found in the cache")
+    else:
+        try:
+            results = vector_backtest(strategy, dataset, args.seed)
+        except ValueError as e:
+            print(f"Warning: Invalid strategy! {e}")
+            raise SystemExit(1)
+        if results_cache:
+            results_cache.put(dataset.fingerprint, key, results)
+    elapsed = time.perf_counter() - start
+    print_results(results)
+    if args.output:
+        write_results(results, args.output)
+        print(f"Results written to {args.output}")
+    if args.compare:
+        from backtest import backtest
+        start = time.perf_counter()
+        reference = backtest(strategy, args.sessions, args.seed)
+        reference_elapsed = time.perf_counter() - start
+        differences = compare_results(results, reference)
+        for difference in differences:
+            print(f"Mismatch: {difference}")
+        print(f"Event-driven backtest: {reference_elapsed:.2f}s, vectorized: {elapsed:.3f}s "
+              f"({reference_elapsed / elapsed:.0f}x faster), {'identical' if not differences else 'different'} results")
+        if differences:
+            raise SystemExit(1)